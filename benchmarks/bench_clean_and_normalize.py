@@ -0,0 +1,139 @@
+"""
+Times clean_and_normalize on synthetic scrape results of 10k, 100k and 1M
+rows, next to the row-by-row version it replaced.
+
+    python benchmarks/bench_clean_and_normalize.py [--sizes 10000 100000] [--no-legacy]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sii_scraper.normalize import clean_and_normalize
+from sii_scraper.records import HEADERS
+
+
+def synthetic_frame(n: int, seed: int = 0, dst_edges: bool = True) -> pd.DataFrame:
+    """
+    n scraped rows shaped like scrape_all's output (every column a string),
+    including pending rows without date_accepted. With dst_edges the dates
+    cover three years, Santiago DST changes included; without, they stay
+    within one summer so the legacy code can digest them.
+    """
+    rng = np.random.default_rng(seed)
+
+    def amounts():
+        values = rng.integers(0, 50_000_000, n)
+        return pd.Series(values).map("{:,}".format).str.replace(",", ".", regex=False)
+
+    if dst_edges:
+        days = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365, n), unit="D")
+        # make sure the repeated hour of the April change shows up
+        days = days.where(rng.random(n) > 0.01, pd.Timestamp("2024-04-06"))
+    else:
+        days = pd.Timestamp("2023-10-01") + pd.to_timedelta(rng.integers(0, 180, n), unit="D")
+    seconds = pd.to_timedelta(rng.integers(0, 86_400, n), unit="s")
+    accepted = (days + seconds).strftime("%d/%m/%Y %H:%M:%S")
+
+    status = rng.choice(["accepted", "accepted_exempt", "pending", "pending_exempt"], n)
+    accepted = np.where(np.char.startswith(status.astype(str), "pending"), "", accepted)
+
+    df = pd.DataFrame({col: "" for col in HEADERS}, index=range(n))
+    df["type_purchase"] = "Del Giro"
+    df["supplier_id"] = pd.Series(rng.integers(1_000_000, 99_999_999, n)).map(
+        lambda r: f"{r:,}".replace(",", ".") + "-k")
+    df["supplier_name"] = rng.choice(["Arrocera S.A.", "Molino Ltda.", "Transportes S.p.A."], n)
+    df["number"] = rng.integers(1, 10_000_000, n).astype(str)
+    df["date"] = days.strftime("%d/%m/%Y")
+    df["date_accepted"] = accepted
+    df["type"] = rng.choice(["P", "", "C"], n)
+    for col in ["exent_total", "net_total", "iva", "total"]:
+        df[col] = amounts()
+    df["other_tax"] = np.where(rng.random(n) > 0.9, amounts(), "")
+    df["rut_holding"] = rng.choice(["76123456-7", "77654321-K"], n)
+    df["status"] = status
+    df["doc_type"] = rng.choice(["invoice", "credit_note"], n, p=[0.95, 0.05])
+    return df.astype(str)
+
+
+def legacy_clean_and_normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The version clean_and_normalize replaced, kept for comparison. It
+    raises on DST-ambiguous or skipped Santiago times, so it only gets
+    frames without them.
+    """
+    df = df.copy()
+
+    df = df[[
+        "supplier_id", "supplier_name", "number", "date", "date_accepted",
+        "type", "exent_total", "net_total", "iva", "other_tax",
+        "total", "rut_holding", "status", "doc_type"
+    ]]
+
+    cols = ["supplier_id", "supplier_name", "type", "status", "doc_type"]
+    df[cols] = (
+        df[cols]
+        .fillna("")
+        .apply(lambda s: s.str.replace(".", "", regex=False).str.lower())
+    )
+    df["supplier_id"] = df["supplier_id"].str.upper()
+    df["other_tax"] = df["other_tax"].fillna(0)
+    df["date"] = pd.to_datetime(df["date"], format="%d/%m/%Y")
+    df["date_accepted"] = pd.to_datetime(df["date_accepted"], format="%d/%m/%Y %H:%M:%S")
+    df["date"] = df["date"].dt.tz_localize("America/Santiago").dt.tz_convert("UTC")
+    df["date_accepted"] = df["date_accepted"].dt.tz_localize("America/Santiago").dt.tz_convert("UTC")
+    df["type"] = df["type"].map({"p": "contado"}).fillna("")
+
+    for col in ["exent_total", "net_total", "iva", "other_tax", "total"]:
+        df[col] = df[col].str.replace(".", "").fillna("0").replace("", "0").astype("int64")
+    return df
+
+
+def measure(fn, df: pd.DataFrame) -> tuple:
+    """
+    (seconds, peak traced bytes, result). tracemalloc slows allocations
+    down a lot, so time and memory come from two separate calls.
+    """
+    started = time.perf_counter()
+    out = fn(df)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    fn(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_and_normalize")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--no-legacy", action="store_true", help="skip the old implementation")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'impl':>8} {'seconds':>9} {'rows/s':>12} {'peak MiB':>9} {'out MiB':>8}")
+    for n in args.sizes:
+        runs = [("vector", clean_and_normalize, synthetic_frame(n))]
+        if not args.no_legacy:
+            safe = synthetic_frame(n, dst_edges=False)
+            runs.append(("vector*", clean_and_normalize, safe))
+            runs.append(("legacy*", legacy_clean_and_normalize, safe))
+
+        for name, fn, frame in runs:
+            elapsed, peak, out = measure(fn, frame)
+            size = out.memory_usage(deep=True).sum()
+            print(f"{n:>10} {name:>8} {elapsed:>9.3f} {n / elapsed:>12,.0f} "
+                  f"{peak / 2**20:>9.1f} {size / 2**20:>8.1f}")
+
+    if not args.no_legacy:
+        print("* same frames without DST edges, which the legacy code can't parse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+End to end timing of SiiScraper against tools/mock_sii_server.py: wall
+time, WebDriver commands sent and rows per second for scrape_all,
+scrape_one and scrape_many (first two RUTs), with the data volume and SII's slowness set from the command
+line. Needs Chrome / chromedriver like a real run, but no SII account.
+
+    python benchmarks/bench_scraper.py [--ruts 3] [--rows 250] [--dialog-ms 300]
+                                       [--latency 0.05] [--repeat 3] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sii_scraper.sii_scraper import SiiScraper
+from sii_scraper.browser import new_driver
+from tools.mock_sii_server import MockConfig, start_server
+
+
+LOGIN_PATH = "//AUT2000/InicioAutenticacion/IngresoRutClave.html"
+CERT_LOGIN_PATH = "/AUT2000/InicioAutenticacion/IngresoCertificado.html"
+
+
+def count_commands(driver) -> Counter:
+    """
+    Count every WebDriver command the driver sends from now on, by name.
+    """
+    calls = Counter()
+    execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        calls[driver_command] += 1
+        return execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return calls
+
+
+def run_once(scenario: str, base_url: str, ruts: list, headless: bool) -> dict:
+    driver = new_driver(headless)
+    try:
+        calls = count_commands(driver)
+        scraper = SiiScraper("11111111-1", "mock", driver=driver)
+        scraper.login_url = base_url + LOGIN_PATH
+        scraper.cert_login_url = base_url + CERT_LOGIN_PATH
+
+        started = time.perf_counter()
+        if scenario == "scrape_all":
+            df = scraper.scrape_all()
+        elif scenario == "scrape_one":
+            df = scraper.scrape_one(ruts[0])
+        else:
+            df = scraper.scrape_many(ruts[:2])
+        elapsed = time.perf_counter() - started
+
+        rows = 0 if df is None else len(df)
+        report = scraper.metrics.report()
+        return {
+            "scenario": scenario,
+            "seconds": elapsed,
+            "rows": rows,
+            "rows_per_s": rows / elapsed if elapsed else 0.0,
+            "webdriver_calls": sum(calls.values()),
+            "top_calls": calls.most_common(5),
+            "espera_dialog_s": report["phases"].get("espera_dialog", {}).get("total_s", 0.0),
+        }
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SiiScraper against the mock SII site")
+    parser.add_argument("--ruts", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=250, help="accepted invoices per RUT, see tools/mock_sii_server.py")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--dialog-ms", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", default=["scrape_all", "scrape_one", "scrape_many"],
+                        choices=["scrape_all", "scrape_one", "scrape_many"])
+    parser.add_argument("--show-browser", action="store_true")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    config = MockConfig(ruts=args.ruts, rows=args.rows, page_sizes=args.page_sizes,
+                        latency=args.latency, dialog_ms=args.dialog_ms)
+    server = start_server(config)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = []
+    print(f"{'scenario':>11} {'run':>3} {'seconds':>8} {'rows':>6} {'rows/s':>8} "
+          f"{'wd calls':>8} {'dialog s':>8}  top commands")
+    try:
+        for scenario in args.scenarios:
+            for run in range(1, args.repeat + 1):
+                r = run_once(scenario, base_url, config.ruts, headless=not args.show_browser)
+                results.append(r)
+                top = ", ".join(f"{name}={n}" for name, n in r["top_calls"])
+                print(f"{scenario:>11} {run:>3} {r['seconds']:>8.2f} {r['rows']:>6} "
+                      f"{r['rows_per_s']:>8.1f} {r['webdriver_calls']:>8} "
+                      f"{r['espera_dialog_s']:>8.2f}  {top}")
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
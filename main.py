@@ -1,85 +1,40 @@
 import os
 import re
 import argparse
+from datetime import datetime, timezone
+
 import pandas as pd
-from tqdm import tqdm
 from dotenv import load_dotenv
 from pymongo import MongoClient
-from selenium.common.exceptions import TimeoutException
 
-from sii_scraper.sii_scraper import SiiScraper
+from sii_scraper.sii_scraper import SiiScraper, tax_period, SECTION_NAMES
+from sii_scraper.records import invoice_frame
+from sii_scraper.sync import sync_invoices
+from sii_scraper.normalize import clean_and_normalize
+from sii_scraper import backend as backend_client
+from sii_scraper.parallel import scrape_user, scrape_users_parallel
+from sii_scraper.browser import BrowserPool
+from sii_scraper.session_cache import SessionCache
+from sii_scraper.fingerprints import FingerprintStore
+from sii_scraper.pipeline import StreamPipeline
+from sii_scraper.checkpoints import CheckpointStore
+from sii_scraper.metrics import Metrics, RUN_REPORT_FILE
+from sii_scraper.backfill import run_backfill, period_closed, Throughput
+from sii_scraper.snapshots import SnapshotCache, user_key
+from sii_scraper.indexes import ensure_indexes, find_duplicates, report_duplicates
+from sii_scraper.writer import WriteBehindSink
+from sii_scraper.resilience import CircuitBreaker
 
 load_dotenv()
 
-PROGRESS_FILE = "sii_progress.txt"
-
-
-def clean_and_normalize(df: pd.DataFrame) -> pd.DataFrame:
-
-    df = df.copy()
-
-    df = df[[
-        "supplier_id", "supplier_name", "number", "date", "date_accepted",
-        "type", "exent_total", "net_total", "iva", "other_tax",
-        "total", "rut_holding", "status", "doc_type"
-    ]]
-
-    cols = ["supplier_id", "supplier_name", "type", "status", "doc_type"]
-
-    df[cols] = (
-        df[cols]
-        .fillna("")
-        .apply(lambda s: s.str.replace(".", "", regex=False)
-               .str.lower())
-    )
-
-    df["supplier_id"] = df["supplier_id"].str.upper()
-
-    df["other_tax"] = df["other_tax"].fillna(0)
-
-    df["date"] = pd.to_datetime(df["date"], format="%d/%m/%Y")
-
-    df["date_accepted"] = pd.to_datetime(
-        df["date_accepted"], format="%d/%m/%Y %H:%M:%S")
-
-    df["date"] = (
-        df["date"]
-        .dt.tz_localize("America/Santiago")
-        .dt.tz_convert("UTC")
-    )
-
-    df["date_accepted"] = (
-        df["date_accepted"]
-        .dt.tz_localize("America/Santiago")
-        .dt.tz_convert("UTC")
-    )
-
-    df["type"] = df["type"].map({"p": "contado"}).fillna("")
-
-    int_cols = ["exent_total", "net_total", "iva", "other_tax", "total"]
-
-    for col in int_cols:
-        df[col] = (
-            df[col]
-            .str.replace(".", "")
-                .fillna("0")
-                .replace("", "0")
-                .astype("int64")
-        )
-
-    return df
-
-
-def load_completed_users():
-    if not os.path.exists(PROGRESS_FILE):
-        return set()
-    with open(PROGRESS_FILE) as f:
-        return set(line.strip() for line in f if line.strip())
-
-
-def mark_user_completed(user):
-    with open(PROGRESS_FILE, "a") as f:
-        f.write(f"{user}\n")
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "1000"))
+RCV_BASE_URL = os.getenv("RCV_BASE_URL", backend_client.RCV_BASE_URL)
+RCV_RECORD_DIR = os.getenv("RCV_RECORD_DIR")
+SII_WORKERS = int(os.getenv("SII_WORKERS", "1"))
+SII_TABS = int(os.getenv("SII_TABS", "1"))
+SII_BROWSER_POOL = int(os.getenv("SII_BROWSER_POOL", "0"))
+# connections shared by the write-behind sink's writer threads
+MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", "10"))
 
 
 def load_all_credentials() -> dict:
@@ -101,83 +56,389 @@ def load_all_credentials() -> dict:
     return creds
 
 
-def main():
+def sync_user(inv_supplier, user: str, df: pd.DataFrame, batch_size: int = SYNC_BATCH_SIZE,
+              checkpoints: CheckpointStore = None, metrics: Metrics = None,
+              writer: WriteBehindSink = None, on_synced=None):
+    """
+    Clean and sync one user's scrape. With a writer the rows are only
+    queued, and the user is checkpointed (and on_synced called) once
+    they're actually in Mongo.
+    """
+    def synced():
+        if checkpoints is not None:
+            checkpoints.mark_user(user)
+        if on_synced is not None:
+            on_synced()
+
+    if df is None:
+        print(f"No facturas para {user}")
+        synced()
+        return
+
+    df["sii_user"] = user
+    metrics = metrics if metrics is not None else Metrics()
+
+    with metrics.span("normalize"):
+        df_cleaned = clean_and_normalize(df)
+    print("Limpiando datos")
+
+    if writer is not None:
+        writer.submit(df_cleaned)
+        writer.after_written(synced)
+        print(f"{len(df_cleaned)} facturas de {user} en cola para la base de datos")
+        return
+
+    inserted, updated = timed_sync(metrics, inv_supplier, df_cleaned, batch_size=batch_size)
+    synced()
+
+    print(
+        f"\nFinalizado: {inserted} nuevas facturas insertadas, {updated} facturas actualizadas")
+
+
+def timed_sync(metrics: Metrics, inv_supplier, df: pd.DataFrame, **sync_kwargs) -> tuple:
+    with metrics.span("sync"):
+        inserted, updated = sync_invoices(inv_supplier, df, ordered=False, **sync_kwargs)
+    metrics.inc("rows_synced", len(df))
+    metrics.inc("inserted", inserted)
+    metrics.inc("updated", updated)
+    return inserted, updated
+
+
+def stream_user(inv_supplier, user: str, pwd: str, batch_size: int = SYNC_BATCH_SIZE,
+                fingerprint_store: FingerprintStore = None, checkpoints: CheckpointStore = None,
+                snapshots: SnapshotCache = None, metrics: Metrics = None,
+                writer: WriteBehindSink = None, **scraper_kwargs):
+    """
+    Scrape user and sync every page as soon as it comes out of the browser,
+    instead of holding the whole month in memory until the scrape ends.
+    Pages go through writer (one of its own if not given), and each section
+    is checkpointed once its rows are written, so a rerun after a crash
+    picks up at the first one that wasn't. Returns the sections that kept
+    failing; with any, the user isn't checkpointed as done.
+    """
+    print(f"Scraping facturas para {user} (streaming)…")
+    fingerprints = fingerprint_store.load(user) if fingerprint_store is not None else None
+    done_sections = checkpoints.sections_done(user) if checkpoints is not None else None
+    metrics = metrics if metrics is not None else Metrics()
+    scraper = SiiScraper(user, pwd, fingerprints=fingerprints, done_sections=done_sections,
+                         metrics=metrics, **scraper_kwargs)
+
+    def section_synced(chunk):
+        if checkpoints is not None:
+            checkpoints.mark_section(user, chunk.rut_value, scraper.period,
+                                     chunk.status, chunk.doc_type)
+
+    def user_synced():
+        if checkpoints is not None and not scraper.failures:
+            checkpoints.mark_user(user)
+        if fingerprint_store is not None:
+            fingerprint_store.save(user, scraper.seen_fingerprints)
+
+    def normalize(df):
+        with metrics.span("normalize"):
+            return clean_and_normalize(df)
+
+    own_writer = writer is None
+    if own_writer:
+        writer = WriteBehindSink(inv_supplier, batch_size=batch_size, metrics=metrics).start()
+
+    pipeline = StreamPipeline(
+        normalize=normalize,
+        sink=writer.submit,
+        on_section=lambda chunk: writer.after_written(lambda: section_synced(chunk)),
+    )
+    chunks = scraper.iter_rows()
+    if snapshots is not None:
+        chunks = _snapshot_chunks(snapshots, user, scraper.period, chunks)
+    try:
+        stats = pipeline.run(chunks)
+        writer.after_written(user_synced)
+    finally:
+        if own_writer:
+            report_writes(writer.close())
+
+    print(f"\nFinalizado: {stats['rows']} filas de {user} leídas")
+    return scraper.failures
+
+
+def report_writes(report: dict):
+    print(f"Base de datos: {report['inserted']} nuevas facturas insertadas, "
+          f"{report['updated']} actualizadas, {report['skipped_unchanged']} sin cambios, "
+          f"{report['batches']} lotes, {report['blocked_s']}s esperando a Mongo")
+    if report["errors"]:
+        print(f"→ {report['failed']} facturas sin escribir: {report['errors'][0]}")
+
+
+def _while_mongo_ok(writer: WriteBehindSink, items):
+    """
+    items, until a write to Mongo failed for good: from then on every sync
+    fails, so the next user isn't even scraped. The run's checkpoints
+    don't cover them and the next run scrapes them again.
+    """
+    for item in items:
+        yield item
+        if writer.broken:
+            print("Mongo falló, se detiene el scraping de los usuarios restantes")
+            if hasattr(items, "close"):
+                # scrape_users_parallel cancels the users not started yet
+                items.close()
+            return
+
+
+def _snapshot_chunks(snapshots: SnapshotCache, user: str, period: str, chunks):
+    # every section of the run lands in the same scraped_at partition, and
+    # only once read to the end: latest() takes a section from one snapshot
+    scraped_at = datetime.now(timezone.utc)
+    pages = {}
+    for chunk in chunks:
+        section = (chunk.rut_value, chunk.status, chunk.doc_type)
+        pages.setdefault(section, []).extend(chunk.rows)
+        if chunk.done:
+            rows = pages.pop(section)
+            snapshots.write(user, invoice_frame(rows) if rows else None, period, scraped_at,
+                            sections=[section])
+        yield chunk
+
+
+def main(batch_size: int = SYNC_BATCH_SIZE, backend: bool = False, workers: int = SII_WORKERS,
+         tabs: int = SII_TABS, pool_size: int = SII_BROWSER_POOL, full: bool = False,
+         stream: bool = False, snapshots: bool = True):
 
     atlas_uri = os.getenv("MONGODB_URI")
-    client = MongoClient(atlas_uri)
+    client = MongoClient(atlas_uri, maxPoolSize=MONGO_POOL_SIZE)
     db = client.arrocera_erp_db
     inv_supplier = db.invoices_supplier
     print("Conectado a base de datos")
+    ensure_indexes(inv_supplier)
 
-    completed_users = load_completed_users()
+    checkpoints = CheckpointStore().start()
+    completed_users = checkpoints.users_done()
 
     creds = load_all_credentials()
     if not creds:
         raise RuntimeError("No SII_USER_N / SII_PASS_N found in environment.")
 
-    all_dfs = []
-    print("Obteniendo datos de facturas desde SII")
+    pending = {}
     for user, pw in creds.items():
-
         if user in completed_users:
             print(f"Skipping {user}, already completed")
             continue
+        pending[user] = pw
 
-        print(f"Scraping facturas para {user}…")
-        try:
-            scraper = SiiScraper(user, pw, headless=True)
-            df = scraper.scrape_all()
-            df["sii_user"] = user
-
-            df_cleaned = clean_and_normalize(df)
-            print("Limpiando datos")
-
-            total = len(df_cleaned)
-            inserted = 0
-            updated = 0
-            for _, row in tqdm(df_cleaned.iterrows(), total=total,
-                               desc="Sicronizando facturas", unit="inv"):
-
-                # build your dedupe filter
-                filt = {
-                    "supplier_id": row["supplier_id"],
-                    "number": row["number"],
-                }
-
-                data = row.to_dict()
-
-                result = inv_supplier.update_one(
-                    filt,
-                    {"$set": {"status": data["status"]}}
-                )
-
-                if result.matched_count:
-                    # an existing document was found and updated
-                    updated += 1
-                    mark_user_completed(user)
-                else:
-                    # no existing doc → insert it
-                    inv_supplier.insert_one(data)
-                    inserted += 1
-
-            print(
-                f"\nFinalizado: {inserted} nuevas facturas insertadas, {updated} facturas actualizadas")
-        except TimeoutException:
-            print(f"Timeout while scraping {user}, continuing with next user")
+    snapshot_cache = SnapshotCache() if snapshots else None
+    period = tax_period()
+    metrics = Metrics()
+
+    print("Obteniendo datos de facturas desde SII")
+    # the JSON backend has no summary rows to fingerprint
+    fingerprint_store = None if (full or backend) else FingerprintStore()
+    run_kwargs = {
+        "backend": backend,
+        "backend_kwargs": {"base_url": RCV_BASE_URL, "record_dir": RCV_RECORD_DIR},
+        "tabs": tabs,
+        "headless": True,
+        "session_cache": SessionCache.from_env(),
+        "fingerprint_store": fingerprint_store,
+        # once SII is down, every user after it stops waiting on timeouts too.
+        # Only in this process: with --workers each user gets a pickled copy,
+        # so there it only spans that user's RUTs
+        "breaker": CircuitBreaker(),
+    }
+    # Mongo writes happen behind the scraping, users are checkpointed once written
+    writer = WriteBehindSink(inv_supplier, batch_size=batch_size, metrics=metrics).start()
+
+    if stream:
+        errors = {}
+        for user, pw in _while_mongo_ok(writer, pending.items()):
+            try:
+                failures = stream_user(inv_supplier, user, pw, batch_size, fingerprint_store,
+                                       checkpoints, snapshot_cache, metrics, writer=writer,
+                                       headless=True, session_cache=run_kwargs["session_cache"],
+                                       breaker=run_kwargs["breaker"])
+            except Exception as e:
+                print(f"Error scraping {user}: {type(e).__name__}: {e}")
+                errors[user] = str(e)
+                continue
+            if failures:
+                errors[user] = f"{len(failures)} secciones fallidas"
+        finish_run(writer, checkpoints, errors)
+        tidy_snapshots(snapshot_cache)
+        export_metrics(metrics)
+        return
+
+    pool = None
+    if workers > 1:
+        print(f"Scraping {len(pending)} usuarios con {workers} navegadores en paralelo…")
+        results = scrape_users_parallel(pending, max_workers=workers, **run_kwargs)
+    else:
+        if pool_size > 0 and pending:
+            pool = BrowserPool(size=pool_size, headless=True).warm()
+            print(f"Navegadores listos en {pool.report()['startup_total_s']}s")
+        results = (scrape_user(user, pw, pool=pool, **run_kwargs) for user, pw in pending.items())
+
+    errors = {}
+    for result in _while_mongo_ok(writer, results):
+        metrics.merge(result.metrics)
+        if result.error == "timeout":
+            print(f"Timeout while scraping {result.user}, continuing with next user")
+            errors[result.user] = result.error
             continue
+        if result.error:
+            print(f"Error scraping {result.user}: {result.error}")
+            errors[result.user] = result.error
+            continue
+        user_checkpoints = checkpoints
+        if result.failures:
+            # sync what was read, but leave the user for the next run to finish
+            print(f"{len(result.failures)} secciones fallidas para {result.user}, sincronizando el resto")
+            errors[result.user] = f"{len(result.failures)} secciones fallidas"
+            user_checkpoints = None
+        if snapshot_cache is not None:
+            # rows of sections that failed partway aren't in result.sections, so never replayed
+            snapshot_cache.write(result.user, result.df, period, sections=result.sections)
+        save_fingerprints = None
+        if fingerprint_store is not None:
+            save_fingerprints = lambda r=result: fingerprint_store.save(r.user, r.fingerprints)
+        try:
+            sync_user(inv_supplier, result.user, result.df, batch_size, user_checkpoints, metrics,
+                      writer=writer, on_synced=save_fingerprints)
         except Exception as e:
-            print(f"Error scraping {user}: {e}")
+            print(f"Error syncing {result.user}: {e}")
+            errors[result.user] = str(e)
+
+    finish_run(writer, checkpoints, errors)
+
+    if pool is not None:
+        print(f"Navegadores: {pool.report()}")
+        pool.close()
+    tidy_snapshots(snapshot_cache)
+    export_metrics(metrics)
+
+
+def finish_run(writer: WriteBehindSink, checkpoints: CheckpointStore, errors: dict):
+    """
+    Wait for the queued writes, report them and close the run's
+    checkpoints. Only a run that never got here (killed, crashed) is
+    resumed; after one that ended with errors the next run scrapes every
+    user again, so the ones that went through don't go stale.
+    """
+    report = writer.close()
+    report_writes(report)
+    if report["errors"]:
+        errors["mongo"] = report["errors"][0]
+    if errors:
+        print(f"{len(errors)} usuarios con errores: {', '.join(errors)}")
+    checkpoints.finish()
+
+
+def export_metrics(metrics: Metrics):
+    metrics.export()
+    report = metrics.report()
+    slowest = sorted(report["phases"].items(), key=lambda kv: kv[1]["total_s"], reverse=True)[:5]
+    print(f"Duración {report['duration_s']}s, filas/s {report['rows_per_s']}")
+    for phase, stats in slowest:
+        print(f"  {phase}: {stats['total_s']}s en {stats['count']} llamadas")
+    counters = report["counters"]
+    if counters.get("net_requests"):
+        print(f"Red: {counters['net_requests']} requests, {counters.get('net_blocked', 0)} bloqueados, "
+              f"{counters.get('net_from_cache', 0)} desde caché "
+              f"({counters.get('net_bytes_from_cache', 0) / 1e6:.1f} MB no descargados), "
+              f"{counters.get('net_bytes_downloaded', 0) / 1e6:.1f} MB descargados")
+    if report["failures"]:
+        print(f"{len(report['failures'])} secciones fallidas (detalle en {RUN_REPORT_FILE}):")
+        for failure in report["failures"]:
+            print(f"  {failure['user']} RUT {failure['rut']} {failure['period']} "
+                  f"{failure['status']}/{failure['doc_type']}: {failure['error']}")
+
+
+def tidy_snapshots(snapshot_cache: SnapshotCache):
+    if snapshot_cache is None:
+        return
+    merged = snapshot_cache.compact()
+    removed = snapshot_cache.prune()
+    if merged or removed:
+        print(f"Snapshots: {merged} particiones compactadas, {removed} eliminadas")
+
+
+def sync_from_snapshots(batch_size: int = SYNC_BATCH_SIZE, period: str = None):
+    """
+    Clean and sync the latest raw snapshot of every user again, without
+    opening a browser. Handy after changing clean_and_normalize or the sync.
+    """
+    client = MongoClient(os.getenv("MONGODB_URI"))
+    inv_supplier = client.arrocera_erp_db.invoices_supplier
+    print("Conectado a base de datos")
+    ensure_indexes(inv_supplier)
+
+    names = {user_key(user): user for user in load_all_credentials()}
+    frames = SnapshotCache().latest(period)
+    if not frames:
+        print("No hay snapshots guardados")
+        return
+
+    for key, df in frames.items():
+        print(f"Sincronizando snapshot de {names.get(key, key)} ({len(df)} filas)")
+        inserted, updated = sync_invoices(
+            inv_supplier, clean_and_normalize(df), batch_size=batch_size, ordered=False)
+        print(
+            f"\nFinalizado: {inserted} nuevas facturas insertadas, {updated} facturas actualizadas")
+
+def refresh(ruts: list, sections: list = None, period: str = None, user: str = None,
+            certificate: bool = False, batch_size: int = SYNC_BATCH_SIZE):
+    """
+    Scrape and sync only ruts (and only sections, if given), for when the
+    ERP flags a few companies as stale. One login per account; without
+    user, accounts are tried in turn until every RUT was found. No
+    snapshot is written.
+    """
+    client = MongoClient(os.getenv("MONGODB_URI"))
+    inv_supplier = client.arrocera_erp_db.invoices_supplier
+    print("Conectado a base de datos")
+    ensure_indexes(inv_supplier)
+
+    if certificate:
+        accounts = {user or "": ""}
+    else:
+        accounts = load_all_credentials()
+        if user:
+            if user not in accounts:
+                raise RuntimeError(f"No SII_USER_N / SII_PASS_N for {user} in environment.")
+            accounts = {user: accounts[user]}
+        if not accounts:
+            raise RuntimeError("No SII_USER_N / SII_PASS_N found in environment.")
+
+    remaining = list(ruts)
+    metrics = Metrics()
+    for account, pwd in accounts.items():
+        if not remaining:
+            break
+        print(f"Actualizando {', '.join(remaining)} con {account or 'certificado'}")
+        scraper = SiiScraper(account, pwd, use_certificate=certificate, headless=True,
+                             session_cache=SessionCache.from_env(), metrics=metrics)
+        try:
+            df = scraper.scrape_many(remaining, sections=sections, period=period)
+        except Exception as e:
+            print(f"Error scraping {account}: {type(e).__name__}: {e}")
+            continue
+        remaining = scraper.missing_ruts
+        if df is None:
+            print(f"No facturas para {account or 'certificado'}")
             continue
-    if os.path.exists(PROGRESS_FILE):
-        os.remove(PROGRESS_FILE)
+        sync_user(inv_supplier, account, df, batch_size, metrics=metrics)
+
+    if remaining:
+        print(f"RUTs no encontrados: {', '.join(remaining)}")
+    export_metrics(metrics)
+
 
-def debug_scraper():
+def debug_scraper(batch_size: int = SYNC_BATCH_SIZE):
 
     atlas_uri = os.getenv("MONGODB_URI")
     client = MongoClient(atlas_uri)
     db = client.arrocera_erp_db
     inv_supplier = db.invoices_supplier
     print("Conectado a base de datos")
+    ensure_indexes(inv_supplier)
 
     creds = load_all_credentials()
     if not creds:
@@ -200,37 +461,94 @@ def debug_scraper():
     df_cleaned = clean_and_normalize(df)
     print("Limpiando datos")
 
-    total = len(df_cleaned)
-    inserted = 0
-    updated = 0
-    for _, row in tqdm(df_cleaned.iterrows(), total=total,
-                       desc="Sicronizando facturas", unit="inv"):
-
-        # build your dedupe filter
-        filt = {
-            "supplier_id": row["supplier_id"],
-            "number":      row["number"],
-        }
-
-        data = row.to_dict()
-
-        result = inv_supplier.update_one(
-            filt,
-            {"$set": {"status": data["status"]}}
-        )
-
-        if result.matched_count:
-            # an existing document was found and updated
-            updated += 1
-        else:
-            # no existing doc → insert it
-            inv_supplier.insert_one(data)
-            inserted += 1
+    inserted, updated = sync_invoices(
+        inv_supplier, df_cleaned, batch_size=batch_size, ordered=False)
 
     print(
         f"\nFinalizado: {inserted} nuevas facturas insertadas, {updated} facturas actualizadas")
 
 
+def backfill(start: str, end: str, workers: int = SII_WORKERS, batch_size: int = SYNC_BATCH_SIZE,
+             snapshots: bool = True):
+    """
+    Load every month from start to end ("YYYY-MM") for every user and RUT,
+    skipping the periods a previous backfill already synced for good.
+    """
+    client = MongoClient(os.getenv("MONGODB_URI"), maxPoolSize=MONGO_POOL_SIZE)
+    inv_supplier = client.arrocera_erp_db.invoices_supplier
+    print("Conectado a base de datos")
+    ensure_indexes(inv_supplier)
+
+    creds = load_all_credentials()
+    if not creds:
+        raise RuntimeError("No SII_USER_N / SII_PASS_N found in environment.")
+
+    checkpoints = CheckpointStore()
+    snapshot_cache = SnapshotCache() if snapshots else None
+    throughput = Throughput()
+    errors = []
+    metrics = Metrics()
+    writer = WriteBehindSink(inv_supplier, batch_size=batch_size, metrics=metrics).start()
+
+    results = run_backfill(creds, start, end, workers=max(1, workers), checkpoints=checkpoints,
+                           headless=True, session_cache=SessionCache.from_env())
+    try:
+        for result in _while_mongo_ok(writer, results):
+            label = f"{result.user} RUT {result.rut_value} {result.period}"
+            if result.error:
+                # what the sections that worked read is still synced, the
+                # period just isn't final
+                print(f"Error scraping {label}: {result.error}")
+                errors.append(label)
+
+            rows = 0 if result.df is None else len(result.df)
+            if snapshot_cache is not None and not result.error:
+                # without errors every section of the period was read, empty or not
+                sections = [(result.rut_value, *name.split("/")) for name in SECTION_NAMES]
+                snapshot_cache.write(result.user, result.df, result.period, sections=sections)
+            if rows:
+                try:
+                    writer.submit(clean_and_normalize(result.df))
+                except Exception as e:
+                    print(f"Error syncing {label}: {e}")
+                    errors.append(label)
+                    continue
+
+            if period_closed(result.year, result.month) and not result.error:
+                # final only once its rows are in Mongo
+                writer.after_written(lambda r=result, n=rows: checkpoints.mark_final(
+                    r.user, r.rut_value, r.period, n))
+            throughput.add(rows)
+            print(f"{label}: {rows} facturas ({throughput})")
+    finally:
+        # also when a worker died: what's buffered still goes to Mongo
+        report = writer.close()
+        report_writes(report)
+        export_metrics(metrics)
+    if report["errors"]:
+        errors.append("mongo")
+    if errors:
+        print(f"{len(errors)} periodos con errores, se reintentan en el próximo backfill")
+    print(f"Backfill terminado: {throughput}")
+    tidy_snapshots(snapshot_cache)
+
+
+def migrate_indexes(apply: bool = False):
+    """
+    Report the invoices sharing an identity and, with apply, keep only the
+    newest of each and build the unique index.
+    """
+    client = MongoClient(os.getenv("MONGODB_URI"))
+    inv_supplier = client.arrocera_erp_db.invoices_supplier
+    print("Conectado a base de datos")
+
+    if not apply:
+        report_duplicates(find_duplicates(inv_supplier))
+        print("Nada modificado, agrega --apply para migrar")
+        return
+    ensure_indexes(inv_supplier, migrate=True)
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Run the SII scraper")
@@ -239,9 +557,113 @@ if __name__ == "__main__":
         action="store_true",
         help="run the debug_scraper() instead of main()"
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=SYNC_BATCH_SIZE,
+        help="number of upserts sent per bulk_write to Mongo"
+    )
+    parser.add_argument(
+        "--backend",
+        action="store_true",
+        help="fetch the RCV tables from its JSON endpoints instead of the browser UI"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=SII_WORKERS,
+        help="how many SII users to scrape at once, each in its own browser"
+    )
+    parser.add_argument(
+        "--tabs",
+        type=int,
+        default=SII_TABS,
+        help="how many RUTs of one user to scrape at once after a single login"
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=SII_BROWSER_POOL,
+        help="keep this many warm browsers and reuse them across users (sequential runs only)"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="scrape every section, even the ones unchanged since the last synced run"
+    )
+    parser.add_argument(
+        "--migrate-indexes",
+        action="store_true",
+        help="report invoices sharing an identity and, with --apply, remove them and build the unique index"
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="with --migrate-indexes, actually delete the duplicates"
+    )
+    parser.add_argument(
+        "--backfill",
+        nargs=2,
+        metavar=("FROM", "TO"),
+        help="load every month from FROM to TO (YYYY-MM), spread over --workers browsers"
+    )
+    parser.add_argument(
+        "--from-snapshots",
+        action="store_true",
+        help="clean and sync the latest stored raw snapshots again, without a browser"
+    )
+    parser.add_argument(
+        "--period",
+        default=None,
+        help="with --from-snapshots or --refresh, only this tax period (YYYYMM)"
+    )
+    parser.add_argument(
+        "--no-snapshots",
+        action="store_true",
+        help="don't store the raw scraped rows under SII_SNAPSHOT_DIR"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="sync each page while scraping instead of after each user (browser UI, one user at a time)"
+    )
+    parser.add_argument(
+        "--refresh",
+        nargs="+",
+        metavar="RUT",
+        help="scrape and sync only these RUTs, logging in once per account"
+    )
+    parser.add_argument(
+        "--sections",
+        nargs="+",
+        choices=SECTION_NAMES,
+        help="with --refresh, only these sections (default: all)"
+    )
+    parser.add_argument(
+        "--user",
+        default=None,
+        help="with --refresh, only log in as this SII user"
+    )
+    parser.add_argument(
+        "--certificate",
+        action="store_true",
+        help="with --refresh, log in with the browser's client certificate instead of a password"
+    )
     args = parser.parse_args()
 
-    if args.debug:
-        debug_scraper()
+    if args.migrate_indexes:
+        migrate_indexes(apply=args.apply)
+    elif args.backfill:
+        backfill(*args.backfill, workers=args.workers, batch_size=args.batch_size,
+                 snapshots=not args.no_snapshots)
+    elif args.refresh:
+        refresh(args.refresh, sections=args.sections, period=args.period, user=args.user,
+                certificate=args.certificate, batch_size=args.batch_size)
+    elif args.from_snapshots:
+        sync_from_snapshots(batch_size=args.batch_size, period=args.period)
+    elif args.debug:
+        debug_scraper(batch_size=args.batch_size)
     else:
-        main()
+        main(batch_size=args.batch_size, backend=args.backend, workers=args.workers,
+             tabs=args.tabs, pool_size=args.pool_size, full=args.full, stream=args.stream,
+             snapshots=not args.no_snapshots)
@@ -0,0 +1,251 @@
+import os
+import json
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .records import HEADERS, Invoice
+
+
+RCV_BASE_URL = "https://www4.sii.cl/consdcvinternetui/services/data/facadeService"
+RCV_NAMESPACE = "cl.sii.sdi.lob.diii.consdcv.data.api.interfaces.FacadeService"
+
+# Backend methods the Angular UI calls for the summary and detail tables.
+SUMMARY_METHOD = "getResumen"
+DETAIL_METHODS = {
+    "REGISTRO": "getDetalleCompra",
+    "PENDIENTE": "getDetalleCompraPendientes",
+}
+
+# (codTipoDoc, estadoContab, status, doc_type), in the same order scrape_all
+# walks the sections.
+SECTIONS = [
+    (33, "REGISTRO", "accepted", "invoice"),
+    (34, "REGISTRO", "accepted_exempt", "invoice"),
+    (61, "REGISTRO", "accepted", "credit_note"),
+    (33, "PENDIENTE", "pending", "invoice"),
+    (34, "PENDIENTE", "pending_exempt", "invoice"),
+    (61, "PENDIENTE", "pending", "credit_note"),
+]
+
+# JSON key for every scraped column, as seen in the recorded detail
+# responses. supplier_id is built from detRutDoc + detDvDoc.
+DETAIL_FIELDS = {
+    "type_purchase": "detTipoTransaccion",
+    "supplier_name": "detRznSoc",
+    "number": "detNroDoc",
+    "date": "detFchDoc",
+    "date_accepted": "detFecRecepcion",
+    "type": "detEventoReceptor",
+    "exent_total": "detMntExe",
+    "net_total": "detMntNeto",
+    "iva": "detMntIVA",
+    "other_tax": "detMntOtrosImp",
+    "iva_not": "detMntIVANoRec",
+    "code_iva_not": "detCodIVANoRec",
+    "total": "detMntTotal",
+    "total_activo": "detMntActFijo",
+    "iva_activo": "detMntIVAActFijo",
+    "iva_comun": "detIVAUsoComun",
+    "tax_no_credit": "detImpSinCredito",
+    "iva_no_retenido": "detIVANoRetenido",
+    "type_document_ref": "detTipoDocRef",
+    "folio_ref": "detFolioDocRef",
+    "tabaco_puro": "detTabPuros",
+    "tabaco_cigarrillos": "detTabCigarrillos",
+    "tabaco_elaborado": "detTabElaborados",
+    "nce_or_nde": "detNcNdFactCompra",
+}
+
+# Columns the pending tables don't show, filled the same way
+# build_pending_row does (their date_accepted is the reception date).
+PENDING_BLANKS = {
+    "exent_total": "",
+    "tabaco_puro": 0,
+    "tabaco_cigarrillos": 0,
+    "tabaco_elaborado": 0,
+}
+
+
+def _as_text(value) -> str:
+    if value is None:
+        return ""
+    return str(value).strip()
+
+
+def split_rut(rut: str) -> tuple:
+    """
+    "76.123.456-7" -> ("76123456", "7")
+    """
+    body, _, dv = rut.replace(".", "").strip().partition("-")
+    return body, dv.upper()
+
+
+def recording_name(data: dict) -> str:
+    """
+    File name a request is recorded / replayed under.
+    """
+    parts = [
+        data.get("rutEmisor", ""),
+        data.get("ptributario", ""),
+        data.get("estadoContab", ""),
+        str(data.get("codTipoDoc", "all")),
+    ]
+    return "_".join(parts) + ".json"
+
+
+def detail_to_row(item: dict, rut_value: str, status: str, doc_type: str) -> Invoice:
+    """
+    Shape one detail record into the 28 column layout of scrape_all.
+    """
+    values = {
+        col: _as_text(item.get(key))
+        for col, key in DETAIL_FIELDS.items()
+    }
+    values["supplier_id"] = f"{_as_text(item.get('detRutDoc'))}-{_as_text(item.get('detDvDoc'))}"
+
+    if status.startswith("pending"):
+        values.update(PENDING_BLANKS)
+
+    values["rut_holding"] = rut_value
+    values["status"] = status
+    values["doc_type"] = doc_type
+    return Invoice(*(values[col] for col in HEADERS))
+
+
+def session_from_driver(driver, pool_size: int = 10, retries: int = 3) -> requests.Session:
+    """
+    Build a pooled requests.Session carrying the cookies of an
+    authenticated webdriver session.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": driver.execute_script("return navigator.userAgent;"),
+        "Content-Type": "application/json",
+        "Accept": "application/json, text/plain, */*",
+    })
+
+    for cookie in driver.get_cookies():
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain"),
+            path=cookie.get("path", "/"),
+        )
+    return session
+
+
+class RcvBackendClient:
+    """
+    Talks to the JSON endpoints behind the Registro de Compras y Ventas UI
+    with an already authenticated session.
+
+    base_url can point at a local stand-in (see tools/rcv_replay_server.py),
+    and record_dir, when set, dumps every response so it can be replayed.
+    """
+
+    def __init__(self, session: requests.Session, base_url: str = RCV_BASE_URL,
+                 record_dir: str = None, timeout: int = 60):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.record_dir = record_dir
+        self.timeout = timeout
+
+    @property
+    def conversation_id(self) -> str:
+        # the UI sends the TOKEN cookie as conversationId
+        return self.session.cookies.get("TOKEN", "")
+
+    def _call(self, method: str, data: dict) -> dict:
+        payload = {
+            "metaData": {
+                "namespace": f"{RCV_NAMESPACE}/{method}",
+                "conversationId": self.conversation_id,
+                "transactionId": str(uuid.uuid4()),
+                "page": None,
+            },
+            "data": data,
+        }
+        resp = self.session.post(f"{self.base_url}/{method}", json=payload, timeout=self.timeout)
+        resp.raise_for_status()
+        body = resp.json()
+
+        if self.record_dir:
+            self._record(method, data, body)
+
+        return body
+
+    def _record(self, method: str, data: dict, body: dict):
+        folder = os.path.join(self.record_dir, method)
+        os.makedirs(folder, exist_ok=True)
+        name = recording_name(data)
+        with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+            json.dump(body, f, ensure_ascii=False)
+
+    def _query(self, rut_value: str, period: str, estado: str, cod_tipo_doc: int = None) -> dict:
+        rut, dv = split_rut(rut_value)
+        data = {
+            "rutEmisor": rut,
+            "dvEmisor": dv,
+            "ptributario": period,
+            "operacion": "COMPRA",
+            "estadoContab": estado,
+        }
+        if cod_tipo_doc is not None:
+            data["codTipoDoc"] = cod_tipo_doc
+        return data
+
+    def summary(self, rut_value: str, period: str, estado: str) -> dict:
+        """
+        {codTipoDoc: document count} for one RUT, period and estadoContab.
+        """
+        body = self._call(SUMMARY_METHOD, self._query(rut_value, period, estado))
+        counts = {}
+        for item in body.get("data") or []:
+            try:
+                counts[int(item.get("rsmnTipoDocInteger"))] = int(item.get("rsmnTotDoc") or 0)
+            except (TypeError, ValueError):
+                continue
+        return counts
+
+    def detail(self, rut_value: str, period: str, estado: str, cod_tipo_doc: int) -> list:
+        body = self._call(
+            DETAIL_METHODS[estado],
+            self._query(rut_value, period, estado, cod_tipo_doc),
+        )
+        return body.get("data") or []
+
+    def rows(self, rut_value: str, period: str) -> list:
+        """
+        Every section of one RUT and period as 28 column rows.
+        """
+        all_rows = []
+        summaries = {}
+        for cod, estado, status, doc_type in SECTIONS:
+            if estado not in summaries:
+                summaries[estado] = self.summary(rut_value, period, estado)
+
+            count = summaries[estado].get(cod, 0)
+            if count <= 0:
+                print(f"→ {doc_type} count is {count} for RUT {rut_value}, not scraping.")
+                continue
+
+            items = self.detail(rut_value, period, estado, cod)
+            if len(items) != count:
+                print(f"→ Read {len(items)} {status} - {doc_type} rows for RUT {rut_value}, expected {count}.")
+
+            all_rows.extend(
+                detail_to_row(item, rut_value, status, doc_type) for item in items
+            )
+        return all_rows
+
@@ -0,0 +1,175 @@
+import time
+import queue
+import multiprocessing
+from datetime import date
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .sii_scraper import SiiScraper, tax_period
+from .records import invoice_frame
+
+
+# SII keeps accepting / claiming a month's documents until the F29 of the
+# next month is filed, so a period is only final two months later
+FINAL_AFTER_MONTHS = 2
+
+
+class PeriodResult(NamedTuple):
+    user: str
+    rut_value: str
+    year: int
+    month: int
+    df: pd.DataFrame
+    error: str
+
+    @property
+    def period(self) -> str:
+        return tax_period(self.month, self.year)
+
+
+def month_range(start: str, end: str) -> list:
+    """
+    [(year, month), …] from start to end included, both "YYYY-MM".
+    """
+    y, m = (int(x) for x in start.split("-"))
+    end_y, end_m = (int(x) for x in end.split("-"))
+    if (y, m) > (end_y, end_m):
+        raise ValueError(f"backfill range {start}..{end} is empty")
+
+    months = []
+    while (y, m) <= (end_y, end_m):
+        months.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return months
+
+
+def period_closed(year: int, month: int, today: date = None) -> bool:
+    today = today or date.today()
+    elapsed = (today.year - year) * 12 + (today.month - month)
+    return elapsed >= FINAL_AFTER_MONTHS
+
+
+def _list_ruts(user: str, pwd: str, scraper_kwargs: dict) -> list:
+    scraper = SiiScraper(user, pwd, **scraper_kwargs)
+    try:
+        scraper._login()
+        return scraper._rut_values()
+    finally:
+        scraper._close()
+
+
+def _scrape_work(user: str, pwd: str, work: list, results, scraper_kwargs: dict):
+    """
+    Worker process: one login, then every (rut_value, year, month) of work.
+    Results go through the results queue one period at a time so the
+    parent can sync them while the rest is still being scraped.
+    """
+    done = set()
+    try:
+        scraper = SiiScraper(user, pwd, **scraper_kwargs)
+        for rut_value, year, month, rows, error in scraper.iter_periods(work):
+            df = invoice_frame(rows) if rows else None
+            results.put(PeriodResult(user, rut_value, year, month, df, error))
+            done.add((rut_value, year, month))
+    except Exception as e:
+        # login failed or the browser died, the rest of work is lost; the
+        # parent counts results, so every item is reported exactly once
+        error = f"{type(e).__name__}: {e}"
+        for rut_value, year, month in work:
+            if (rut_value, year, month) not in done:
+                results.put(PeriodResult(user, rut_value, year, month, None, error))
+
+
+def plan_backfill(creds: dict, months: list, ruts: dict, final: dict, workers: int) -> list:
+    """
+    [(user, [(rut_value, year, month), …]), …] slices for the workers:
+    every (RUT, year, month) not yet final, each user's items dealt
+    round-robin over at most workers slices so they all get a mix of
+    RUTs and years.
+    """
+    slices = []
+    for user in creds:
+        items = [
+            (rut_value, year, month)
+            for year, month in months
+            for rut_value in ruts.get(user, [])
+            if (rut_value, tax_period(month, year)) not in final.get(user, set())
+        ]
+        n = max(1, min(workers, len(items)))
+        slices += [(user, items[i::n]) for i in range(n) if items[i::n]]
+    return slices
+
+
+def run_backfill(creds: dict, start: str, end: str, workers: int = 2, checkpoints=None,
+                 queue_size: int = 8, **scraper_kwargs):
+    """
+    Scrape every (RUT, year, month) of creds from start to end ("YYYY-MM")
+    on up to workers browsers, each in its own process. Periods already
+    marked final in checkpoints are skipped. Yields a PeriodResult per
+    period as soon as it's scraped.
+    """
+    months = month_range(start, end)
+    final = {user: checkpoints.final_periods(user) for user in creds} if checkpoints else {}
+
+    workers = max(1, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool, multiprocessing.Manager() as manager:
+        ruts = {}
+        futures = {user: pool.submit(_list_ruts, user, pwd, scraper_kwargs) for user, pwd in creds.items()}
+        for user, future in futures.items():
+            try:
+                ruts[user] = future.result()
+            except Exception as e:
+                print(f"Error listing RUTs of {user}: {type(e).__name__}: {e}")
+
+        slices = plan_backfill(creds, months, ruts, final, workers)
+        total = sum(len(work) for _, work in slices)
+        skipped = len(months) * sum(len(r) for r in ruts.values()) - total
+        print(f"Backfill {start}..{end}: {total} periodos por RUT, {skipped} ya finales")
+
+        # bounded, so workers wait instead of piling months of rows in memory
+        results = manager.Queue(maxsize=queue_size)
+        running = [pool.submit(_scrape_work, user, creds[user], work, results, scraper_kwargs)
+                   for user, work in slices]
+
+        received = 0
+        try:
+            while received < total:
+                try:
+                    result = results.get(timeout=5)
+                except queue.Empty:
+                    failed = [f for f in running if f.done() and f.exception()]
+                    if failed:
+                        # the worker process itself died (OOM, chrome crash…)
+                        raise RuntimeError("backfill worker died") from failed[0].exception()
+                    continue
+                received += 1
+                yield result
+        finally:
+            # stopped early: don't start the slices still waiting for a worker
+            for future in running:
+                future.cancel()
+
+
+class Throughput:
+    """
+    Invoices synced per minute since the backfill started.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.periods = 0
+
+    def add(self, rows: int):
+        self.rows += rows
+        self.periods += 1
+
+    @property
+    def per_minute(self) -> float:
+        minutes = (time.monotonic() - self.started) / 60
+        return self.rows / minutes if minutes > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.rows} facturas en {self.periods} periodos, {self.per_minute:,.0f} facturas/min"
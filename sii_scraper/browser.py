@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import queue
+import threading
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import SessionNotCreatedException, WebDriverException
+from webdriver_manager.chrome import ChromeDriverManager
+
+try:
+    import fcntl
+except ImportError:    # Windows
+    fcntl = None
+    import msvcrt
+
+
+DRIVER_CACHE_FILE = os.getenv(
+    "CHROMEDRIVER_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "sii_scraper", "chromedriver.json"),
+)
+
+# Every browser starts from a fresh profile, so without this the SII's JS
+# bundles are downloaded again for every user. Chrome can't share one disk
+# cache between running instances, so the directory is split in slots and
+# each browser locks the first free one. Empty disables it.
+BROWSER_CACHE_DIR = os.getenv(
+    "SII_BROWSER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "sii_scraper", "chrome-cache"),
+)
+BROWSER_CACHE_MB = int(os.getenv("SII_BROWSER_CACHE_MB", "200"))
+BROWSER_CACHE_SLOTS = 32
+
+# Origins whose storage is wiped when a pooled browser changes hands.
+SII_ORIGINS = [
+    "https://zeusr.sii.cl",
+    "https://misiir.sii.cl",
+    "https://www.sii.cl",
+    "https://www1.sii.cl",
+    "https://www4.sii.cl",
+]
+
+_resolve_lock = threading.Lock()
+
+
+def resolve_driver_path(refresh: bool = False) -> str:
+    """
+    Path to a chromedriver binary. CHROMEDRIVER_PATH wins, then the path
+    cached by a previous run; only when neither exists (or refresh is set)
+    do we ask ChromeDriverManager, which goes to the network.
+    """
+    env_path = os.getenv("CHROMEDRIVER_PATH")
+    if env_path and os.path.exists(env_path):
+        return env_path
+
+    with _resolve_lock:
+        if not refresh and os.path.exists(DRIVER_CACHE_FILE):
+            with open(DRIVER_CACHE_FILE) as f:
+                cached = json.load(f).get("path")
+            if cached and os.path.exists(cached):
+                return cached
+
+        path = ChromeDriverManager().install()
+
+        os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+        with open(DRIVER_CACHE_FILE, "w") as f:
+            json.dump({"path": path, "resolved_at": time.time()}, f)
+        return path
+
+
+class CacheSlot:
+    """
+    Exclusive use of one directory under BROWSER_CACHE_DIR, held through a
+    lock on a file next to it. The OS drops the lock if we die, so a crashed
+    run never leaves a slot taken.
+    """
+
+    def __init__(self, path: str, lock_file):
+        self.path = path
+        self._lock_file = lock_file
+
+    @classmethod
+    def acquire(cls, base: str = BROWSER_CACHE_DIR, slots: int = BROWSER_CACHE_SLOTS):
+        if not base:
+            return None
+        os.makedirs(base, exist_ok=True)
+        for i in range(slots):
+            f = open(os.path.join(base, f"slot-{i}.lock"), "a+")
+            try:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                f.close()
+                continue
+            return cls(os.path.join(base, f"slot-{i}"), f)
+        return None
+
+    def release(self):
+        if self._lock_file is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            else:
+                self._lock_file.seek(0)
+                msvcrt.locking(self._lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        self._lock_file.close()
+        self._lock_file = None
+
+
+class SiiChrome(webdriver.Chrome):
+    """
+    Chrome that gives its disk cache slot back when it quits.
+    """
+
+    cache_slot = None
+
+    def quit(self):
+        try:
+            super().quit()
+        finally:
+            if self.cache_slot:
+                self.cache_slot.release()
+                self.cache_slot = None
+
+
+def chrome_options(headless: bool = False, cache_dir: str = None) -> Options:
+    options = Options()
+
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-gpu")               # recommended for Linux
+    options.add_argument("--no-sandbox")                # recommended in many CI systems
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--log-level=3")
+    if cache_dir:
+        options.add_argument(f"--disk-cache-dir={cache_dir}")
+        options.add_argument(f"--disk-cache-size={BROWSER_CACHE_MB * 1024 * 1024}")
+
+    # Network events end up in driver.get_log("performance"), see network.py
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+    prefs = {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.password_manager_leak_detection": False,
+        "credentials_enable_service": False,
+        "profile.password_manager_enabled": False,
+    }
+
+    auto_select = {
+        "pattern": "https://zeusr.sii.cl/*",
+        "filter": {"ISSUER": {"CN": "E-CERTCHILE CA FES 02"}}
+    }
+
+    prefs["ssl"] = {
+        "auto_select_certificate_for_urls": [auto_select]
+    }
+
+    options.add_experimental_option("prefs", prefs)
+    return options
+
+
+def new_driver(headless: bool = False):
+    """
+    Start Chrome with the cached driver. If Chrome was upgraded and the
+    cached driver no longer matches, resolve it again once.
+    """
+    slot = CacheSlot.acquire()
+    options = chrome_options(headless, slot.path if slot else None)
+    try:
+        try:
+            driver = SiiChrome(service=Service(resolve_driver_path()), options=options)
+        except SessionNotCreatedException:
+            driver = SiiChrome(service=Service(resolve_driver_path(refresh=True)), options=options)
+    except Exception:
+        if slot:
+            slot.release()
+        raise
+    driver.cache_slot = slot
+    return driver
+
+
+def reset_driver(driver):
+    """
+    Leave a browser as if it had just started: one blank tab, no cookies
+    and no storage for the SII origins.
+    """
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.get("about:blank")
+
+    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    for origin in SII_ORIGINS:
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+            "origin": origin,
+            "storageTypes": "cookies,local_storage,session_storage,indexeddb,service_workers,cache_storage",
+        })
+
+
+class BrowserPool:
+    """
+    Keeps up to size warm Chrome instances. acquire() hands out a browser
+    with a clean context, release() wipes it and puts it back, so users
+    after the first one skip the Chrome startup.
+    """
+
+    def __init__(self, size: int = 1, headless: bool = True):
+        self.size = size
+        self.headless = headless
+        self._idle = queue.Queue()
+        self._all = []
+        # browsers being started, counted against size with _all
+        self._starting = 0
+        self._lock = threading.Lock()
+        self.startup_times = []
+        self.reuses = 0
+
+    def _reserve(self, count: int = 1) -> int:
+        """
+        Take up to count of the free slots, returns how many were taken.
+        """
+        with self._lock:
+            count = max(0, min(count, self.size - len(self._all) - self._starting))
+            self._starting += count
+        return count
+
+    def _start(self):
+        """
+        Start a browser in a slot taken with _reserve. Chrome starts
+        outside the lock, so several can start at once.
+        """
+        started = time.monotonic()
+        try:
+            driver = new_driver(self.headless)
+        except BaseException:
+            with self._lock:
+                self._starting -= 1
+            raise
+        with self._lock:
+            self._starting -= 1
+            self.startup_times.append(time.monotonic() - started)
+            self._all.append(driver)
+        return driver
+
+    def warm(self, count: int = None) -> "BrowserPool":
+        """
+        Start count (default: size) browsers up front, in parallel.
+        """
+        count = self.size if count is None else min(count, self.size)
+        threads = [
+            threading.Thread(target=lambda: self._idle.put(self._start()))
+            for _ in range(self._reserve(count - len(self._all)))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self
+
+    def acquire(self, timeout: float = None):
+        try:
+            driver = self._idle.get_nowait()
+            self.reuses += 1
+            return driver
+        except queue.Empty:
+            pass
+
+        if self._reserve():
+            return self._start()
+
+        driver = self._idle.get(timeout=timeout)
+        self.reuses += 1
+        return driver
+
+    def release(self, driver):
+        try:
+            reset_driver(driver)
+        except WebDriverException:
+            # a browser we can't clean is a browser we don't reuse
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def close(self):
+        with self._lock:
+            drivers = list(self._all)
+            self._all.clear()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+    def report(self) -> dict:
+        times = self.startup_times
+        return {
+            "started": len(times),
+            "reused": self.reuses,
+            "startup_total_s": round(sum(times), 2),
+            "startup_avg_s": round(sum(times) / len(times), 2) if times else 0.0,
+        }
@@ -0,0 +1,146 @@
+import os
+import time
+import uuid
+import sqlite3
+from contextlib import closing
+
+from .fingerprints import section_key
+
+
+CHECKPOINT_DB = os.getenv("SII_CHECKPOINT_DB", "sii_checkpoints.db")
+# an unfinished run older than this is not resumed, SII data moved on
+CHECKPOINT_MAX_AGE = int(os.getenv("SII_CHECKPOINT_MAX_AGE", str(2 * 24 * 3600)))
+
+# section value of the row that marks a whole user as synced
+USER_DONE = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    started_at  REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    run_id   TEXT NOT NULL,
+    user     TEXT NOT NULL,
+    rut      TEXT NOT NULL,
+    period   TEXT NOT NULL,
+    section  TEXT NOT NULL,
+    rows     INTEGER NOT NULL DEFAULT 0,
+    done_at  REAL NOT NULL,
+    PRIMARY KEY (run_id, user, rut, period, section)
+);
+CREATE TABLE IF NOT EXISTS final_periods (
+    user      TEXT NOT NULL,
+    rut       TEXT NOT NULL,
+    period    TEXT NOT NULL,
+    rows      INTEGER NOT NULL DEFAULT 0,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (user, rut, period)
+);
+"""
+
+
+class CheckpointStore:
+    """
+    What a run already synced, per (user, RUT, period, section), in a SQLite
+    file. Every call opens its own connection and commits right away, so
+    the store can be pickled into worker processes and shared by them.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB, run_id: str = None,
+                 max_age: int = CHECKPOINT_MAX_AGE):
+        self.path = path
+        self.run_id = run_id
+        self.max_age = max_age
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def start(self) -> "CheckpointStore":
+        """
+        Resume the last run that never finished (the process died before
+        finish()) or open a new one. Runs too old to resume are dropped.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            stale = [r for (r,) in conn.execute(
+                "SELECT run_id FROM runs WHERE finished_at IS NULL AND started_at < ?",
+                (now - self.max_age,))]
+            for run_id in stale:
+                conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+                conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+            row = conn.execute(
+                "SELECT run_id FROM runs WHERE finished_at IS NULL "
+                "ORDER BY started_at DESC LIMIT 1").fetchone()
+            if row:
+                self.run_id = row[0]
+                print(f"Retomando ejecución {self.run_id}")
+            else:
+                self.run_id = uuid.uuid4().hex
+                conn.execute("INSERT INTO runs (run_id, started_at) VALUES (?, ?)",
+                             (self.run_id, now))
+        return self
+
+    def finish(self):
+        """
+        The run got to its end, errors or not: its checkpoints are no
+        longer needed and the next start() opens a new run.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (self.run_id,))
+            conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                         (time.time(), self.run_id))
+
+    def mark_section(self, user: str, rut: str, period: str, status: str, doc_type: str,
+                     rows: int = 0):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, user, rut, period, f"{status}|{doc_type}", rows, time.time()))
+
+    def mark_user(self, user: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, '', '', ?, 0, ?)",
+                (self.run_id, user, USER_DONE, time.time()))
+
+    def users_done(self) -> set:
+        with closing(self._connect()) as conn:
+            return {u for (u,) in conn.execute(
+                "SELECT user FROM checkpoints WHERE run_id = ? AND section = ?",
+                (self.run_id, USER_DONE))}
+
+    def sections_done(self, user: str) -> set:
+        """
+        section_key() of every section of user already synced in this run.
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT rut, period, section FROM checkpoints "
+                "WHERE run_id = ? AND user = ? AND section != ?",
+                (self.run_id, user, USER_DONE)).fetchall()
+        return {section_key(rut, period, *section.split("|", 1)) for rut, period, section in rows}
+
+    def mark_final(self, user: str, rut: str, period: str, rows: int = 0):
+        """
+        period of rut was synced after it closed, SII won't change it
+        anymore. Unlike checkpoints these outlive the run.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO final_periods VALUES (?, ?, ?, ?, ?)",
+                (user, rut, period, rows, time.time()))
+
+    def final_periods(self, user: str) -> set:
+        """
+        {(rut, period), …} of user that never need scraping again.
+        """
+        with closing(self._connect()) as conn:
+            return set(conn.execute(
+                "SELECT rut, period FROM final_periods WHERE user = ?", (user,)))
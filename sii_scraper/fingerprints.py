@@ -0,0 +1,60 @@
+import os
+import json
+import hashlib
+import threading
+
+
+FINGERPRINT_DIR = os.getenv("SII_FINGERPRINT_DIR", "sii_fingerprints")
+
+
+def section_key(rut_value: str, period: str, status: str, doc_type: str) -> str:
+    return f"{rut_value}|{period}|{status}|{doc_type}"
+
+
+class FingerprintStore:
+    """
+    Last seen summary row (document count + totals) of every
+    (RUT, period, status, doc_type) section, one JSON file per user.
+    """
+
+    def __init__(self, path: str = FINGERPRINT_DIR):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # handed to worker processes by scrape_users_parallel
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _file(self, user: str) -> str:
+        name = hashlib.sha256(user.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.path, f"{name}.json")
+
+    def load(self, user: str) -> dict:
+        path = self._file(user)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, user: str, updates: dict):
+        """
+        Merge updates into the stored fingerprints of user. Call it only
+        once the rows behind them are synced.
+        """
+        if not updates:
+            return
+        with self._lock:
+            data = self.load(user)
+            data.update(updates)
+
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._file(user) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self._file(user))
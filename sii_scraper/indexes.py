@@ -0,0 +1,116 @@
+from pymongo import ASCENDING, DeleteMany
+from pymongo.errors import OperationFailure
+
+
+# what makes an invoices_supplier document unique: the same folio can
+# exist as an invoice and as a credit note, and under different companies.
+# rut_holding leads so ChangeDetector's per-company lookup uses the index
+# too; an index built with the old order is dropped and rebuilt.
+IDENTITY_KEY = ("rut_holding", "doc_type", "supplier_id", "number")
+IDENTITY_INDEX = "invoice_identity"
+
+
+class DuplicateInvoicesError(RuntimeError):
+    def __init__(self, duplicates: list):
+        self.duplicates = duplicates
+        super().__init__(
+            f"{len(duplicates)} documentos repetidos en {', '.join(IDENTITY_KEY)}, "
+            f"corre main.py --migrate-indexes para limpiarlos")
+
+
+def _index_spec(key: tuple = IDENTITY_KEY) -> list:
+    return [(field, ASCENDING) for field in key]
+
+
+def find_duplicates(collection, key: tuple = IDENTITY_KEY, limit: int = None) -> list:
+    """
+    [{"key": {...}, "count": n, "ids": [_id, …]}, …] for every identity
+    shared by more than one document, ids oldest first.
+    """
+    pipeline = [
+        {"$sort": {"_id": 1}},
+        {"$group": {
+            "_id": {field: f"${field}" for field in key},
+            "count": {"$sum": 1},
+            "ids": {"$push": "$_id"},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+
+    return [
+        {"key": group["_id"], "count": group["count"], "ids": group["ids"]}
+        for group in collection.aggregate(pipeline, allowDiskUse=True)
+    ]
+
+
+def report_duplicates(duplicates: list, show: int = 10):
+    if not duplicates:
+        print("Sin documentos repetidos")
+        return
+    extra = sum(d["count"] - 1 for d in duplicates)
+    print(f"{len(duplicates)} identidades repetidas ({extra} documentos sobrantes):")
+    for d in duplicates[:show]:
+        key = ", ".join(f"{k}={v}" for k, v in d["key"].items())
+        print(f"  {key} x{d['count']}")
+    if len(duplicates) > show:
+        print(f"  … y {len(duplicates) - show} más")
+
+
+def remove_duplicates(collection, duplicates: list, batch_size: int = 1000) -> int:
+    """
+    Keep the newest document of every duplicated identity and delete the
+    rest. The sync never touched anything but status after the insert, so
+    the newest copy is also the most complete one.
+    """
+    stale = [_id for d in duplicates for _id in d["ids"][:-1]]
+    deleted = 0
+    for start in range(0, len(stale), batch_size):
+        batch = stale[start:start + batch_size]
+        result = collection.bulk_write([DeleteMany({"_id": {"$in": batch}})], ordered=False)
+        deleted += result.deleted_count
+    return deleted
+
+
+def identity_index_ok(collection, key: tuple = IDENTITY_KEY) -> bool:
+    spec = _index_spec(key)
+    for info in collection.index_information().values():
+        if [(f, int(d)) for f, d in info["key"]] == spec and info.get("unique"):
+            return True
+    return False
+
+
+def ensure_indexes(collection, migrate: bool = False) -> bool:
+    """
+    Make sure the unique IDENTITY_KEY index exists so every upsert of the
+    sync is an index lookup instead of a collection scan.
+
+    If duplicates keep the index from being built they are reported, and
+    removed first when migrate is set; otherwise DuplicateInvoicesError is
+    raised. Returns True when the index had to be created.
+    """
+    if identity_index_ok(collection):
+        return False
+
+    duplicates = find_duplicates(collection)
+    if duplicates:
+        report_duplicates(duplicates)
+        if not migrate:
+            raise DuplicateInvoicesError(duplicates)
+        print(f"Eliminados {remove_duplicates(collection, duplicates)} documentos repetidos")
+
+    try:
+        collection.create_index(_index_spec(), name=IDENTITY_INDEX, unique=True)
+    except OperationFailure as e:
+        if e.code == 11000:
+            # someone inserted a copy between the scan and the build
+            raise DuplicateInvoicesError(find_duplicates(collection)) from e
+        # a non-unique index with our name, left from before
+        if e.code not in (85, 86):  # IndexOptionsConflict / IndexKeySpecsConflict
+            raise
+        collection.drop_index(IDENTITY_INDEX)
+        collection.create_index(_index_spec(), name=IDENTITY_INDEX, unique=True)
+
+    print(f"Índice {IDENTITY_INDEX} creado en {collection.name}")
+    return True
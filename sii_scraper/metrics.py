@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+
+METRICS_PREFIX = "sii_scraper"
+METRICS_TEXTFILE = os.getenv("SII_METRICS_TEXTFILE", "sii_metrics.prom")
+RUN_REPORT_FILE = os.getenv("SII_RUN_REPORT", "sii_run_report.json")
+
+
+class Metrics:
+    """
+    Time spent per phase (count, total and max seconds) plus plain
+    counters, for one scraper or a whole run, and the sections that could
+    not be read. Scrapers in worker processes send theirs back to be
+    merge()d into the run's.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.failures = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def observe(self, phase: str, seconds: float):
+        with self._lock:
+            count, total, longest = self.phases.get(phase, (0, 0.0, 0.0))
+            self.phases[phase] = (count + 1, total + seconds, max(longest, seconds))
+
+    def inc(self, counter: str, n: int = 1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def fail(self, key: str, **info):
+        """
+        Record a section (or a whole RUT) that failed for good, once per key.
+        """
+        with self._lock:
+            self.failures[key] = info
+
+    @contextmanager
+    def span(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - started)
+
+    def timed_iter(self, phase: str, iterable):
+        """
+        Yield from iterable, timing only the time spent producing each
+        item, not what the consumer does with it in between.
+        """
+        it = iter(iterable)
+        total = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    total += time.perf_counter() - started
+                yield item
+        finally:
+            self.observe(phase, total)
+
+    def merge(self, other: "Metrics"):
+        if other is None:
+            return
+        with self._lock:
+            for phase, (count, total, longest) in other.phases.items():
+                c, t, m = self.phases.get(phase, (0, 0.0, 0.0))
+                self.phases[phase] = (c + count, t + total, max(m, longest))
+            for counter, value in other.counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+            self.failures.update(other.failures)
+
+    def rate(self, counter: str, phase: str) -> float:
+        seconds = self.phases.get(phase, (0, 0.0, 0.0))[1]
+        return self.counters.get(counter, 0) / seconds if seconds else 0.0
+
+    def report(self) -> dict:
+        return {
+            "started_at": self.started,
+            "duration_s": round(time.time() - self.started, 3),
+            "phases": {
+                phase: {"count": count, "total_s": round(total, 3), "max_s": round(longest, 3)}
+                for phase, (count, total, longest) in sorted(self.phases.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "failures": [self.failures[key] for key in sorted(self.failures)],
+            "rows_per_s": {
+                "extract": round(self.rate("rows_extracted", "extract"), 1),
+                "sync": round(self.rate("rows_synced", "sync"), 1),
+            },
+        }
+
+    def to_prometheus(self, prefix: str = METRICS_PREFIX) -> str:
+        lines = [
+            f"# HELP {prefix}_phase_seconds_total Seconds spent per phase.",
+            f"# TYPE {prefix}_phase_seconds_total counter",
+        ]
+        for phase, (_, total, _) in sorted(self.phases.items()):
+            lines.append(f'{prefix}_phase_seconds_total{{phase="{phase}"}} {total:.3f}')
+        lines += [
+            f"# HELP {prefix}_phase_calls_total Times each phase ran.",
+            f"# TYPE {prefix}_phase_calls_total counter",
+        ]
+        for phase, (count, _, _) in sorted(self.phases.items()):
+            lines.append(f'{prefix}_phase_calls_total{{phase="{phase}"}} {count}')
+        lines += [
+            f"# HELP {prefix}_phase_max_seconds Longest single run of each phase.",
+            f"# TYPE {prefix}_phase_max_seconds gauge",
+        ]
+        for phase, (_, _, longest) in sorted(self.phases.items()):
+            lines.append(f'{prefix}_phase_max_seconds{{phase="{phase}"}} {longest:.3f}')
+
+        for counter, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {prefix}_{counter}_total counter",
+                      f"{prefix}_{counter}_total {value}"]
+
+        report = self.report()
+        lines += [f"# HELP {prefix}_failed_sections Sections (or RUTs) left unread by the run.",
+                  f"# TYPE {prefix}_failed_sections gauge",
+                  f"{prefix}_failed_sections {len(self.failures)}"]
+        lines.append(f"# TYPE {prefix}_rows_per_second gauge")
+        for stage, value in report["rows_per_s"].items():
+            lines.append(f'{prefix}_rows_per_second{{stage="{stage}"}} {value}')
+        lines += [f"# TYPE {prefix}_run_duration_seconds gauge",
+                  f"{prefix}_run_duration_seconds {report['duration_s']}",
+                  f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+                  f"{prefix}_last_run_timestamp_seconds {time.time():.0f}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, textfile: str = METRICS_TEXTFILE, report_file: str = RUN_REPORT_FILE):
+        """
+        Write the Prometheus textfile (for node_exporter's textfile
+        collector) and the JSON run report, each replaced atomically.
+        """
+        for path, body in ((textfile, self.to_prometheus()),
+                           (report_file, json.dumps(self.report(), indent=2))):
+            if not path:
+                continue
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp, path)
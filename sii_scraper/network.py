@@ -0,0 +1,108 @@
+import os
+import json
+
+from selenium.common.exceptions import WebDriverException
+
+
+# Nothing the scraper reads comes from these. Matched by Chrome with * as
+# wildcard against the full url.
+BLOCKED_URL_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*facebook.com/tr*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*newrelic.com*",
+    "*nr-data.net*",
+    "*zendesk.com*",
+    "*zopim.com*",
+    "*tawk.to*",
+    "*livechatinc.com*",
+    "*youtube.com/embed*",
+    "*.woff", "*.woff2", "*.ttf", "*.eot",
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.mp4",
+]
+
+# comma separated, added to the defaults
+EXTRA_BLOCKED_URLS = [p.strip() for p in os.getenv("SII_BLOCKED_URLS", "").split(",") if p.strip()]
+
+
+class NetworkControl:
+    """
+    Per-browser request blocking through the DevTools protocol, plus the
+    accounting of what was blocked, what came from the disk cache and what
+    was downloaded, read from Chrome's performance log.
+    """
+
+    def __init__(self, driver, blocked: list = None):
+        self.driver = driver
+        self.blocked = list(blocked if blocked is not None else BLOCKED_URL_PATTERNS + EXTRA_BLOCKED_URLS)
+        self.requests = 0
+        self.blocked_requests = 0
+        self.cached_requests = 0
+        self.bytes_downloaded = 0
+        self.bytes_from_cache = 0
+
+    def apply(self) -> "NetworkControl":
+        """
+        Turn blocking on for the current tab. Keeps working across its
+        navigations; every other window / driver needs its own apply().
+        """
+        try:
+            self.driver.execute_cdp_cmd("Network.enable", {})
+            self.driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": False})
+            self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked})
+        except WebDriverException as e:
+            print(f"→ Couldn't set up request blocking ({e.msg}), loading everything.")
+        return self
+
+    def collect(self) -> dict:
+        """
+        Count the network events logged since the last call, return what
+        they added to the totals.
+        """
+        try:
+            entries = self.driver.get_log("performance")
+        except (WebDriverException, ValueError):
+            # performance logging not enabled for this driver
+            return {}
+
+        before = self.report()
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method, params = message.get("method"), message.get("params", {})
+
+            if method == "Network.requestWillBeSent":
+                self.requests += 1
+            elif method == "Network.responseReceived":
+                response = params.get("response", {})
+                if response.get("fromDiskCache") or response.get("fromPrefetchCache"):
+                    self.cached_requests += 1
+                    length = response.get("headers", {}).get("content-length") \
+                        or response.get("headers", {}).get("Content-Length")
+                    try:
+                        self.bytes_from_cache += int(length or 0)
+                    except ValueError:
+                        pass
+            elif method == "Network.loadingFinished":
+                self.bytes_downloaded += int(params.get("encodedDataLength") or 0)
+            elif method == "Network.loadingFailed":
+                if params.get("blockedReason"):
+                    self.blocked_requests += 1
+
+        after = self.report()
+        return {k: after[k] - before[k] for k in after}
+
+    def report(self) -> dict:
+        return {
+            "net_requests": self.requests,
+            "net_blocked": self.blocked_requests,
+            "net_from_cache": self.cached_requests,
+            "net_bytes_downloaded": self.bytes_downloaded,
+            "net_bytes_from_cache": self.bytes_from_cache,
+        }
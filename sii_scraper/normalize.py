@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+
+CLEAN_COLUMNS = [
+    "supplier_id", "supplier_name", "number", "date", "date_accepted",
+    "type", "exent_total", "net_total", "iva", "other_tax",
+    "total", "rut_holding", "status", "doc_type"
+]
+
+# few distinct values per column, cleaned once per category
+CATEGORY_COLUMNS = ["type", "status", "doc_type"]
+AMOUNT_COLUMNS = ["exent_total", "net_total", "iva", "other_tax", "total"]
+
+TYPE_NAMES = {"p": "contado"}
+
+SII_TZ = "America/Santiago"
+
+
+def _clean_category(s: pd.Series, mapping: dict = None) -> pd.Series:
+    """
+    Strip dots and lowercase a low-cardinality column through its
+    categories instead of through every row.
+    """
+    cat = s.fillna("").astype(str).astype("category")
+    names = cat.cat.categories.str.replace(".", "", regex=False).str.lower()
+    if mapping is not None:
+        names = names.map(lambda name: mapping.get(name, ""))
+
+    # cleaning can merge categories ("P." and "p"), so re-code them
+    merged = pd.CategoricalIndex(names)
+    codes = merged.codes[cat.cat.codes.to_numpy()]
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=merged.categories),
+        index=s.index,
+    )
+
+
+def _to_utc(s: pd.Series, fmt: str) -> pd.Series:
+    """
+    Parse SII local times and convert them to UTC. Times falling in the
+    DST gap are shifted forward, the repeated hour is read as standard time.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        # a month of invoices shares a few dozen dates, parse each once
+        codes, uniques = pd.factorize(s, use_na_sentinel=False)
+        parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=fmt)
+        s = pd.Series(parsed.to_numpy()[codes], index=s.index)
+    if s.dt.tz is None:
+        s = s.dt.tz_localize(
+            SII_TZ,
+            ambiguous=np.zeros(len(s), dtype=bool),
+            nonexistent="shift_forward",
+        )
+    return s.dt.tz_convert("UTC")
+
+
+def _parse_amount(value) -> int:
+    if isinstance(value, str):
+        return int(value.replace(".", "") or 0)
+    if value is None or value != value:  # None / NaN
+        return 0
+    return int(value)
+
+
+def _parse_amounts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    "1.234.567" style amounts of every AMOUNT_COLUMNS column, parsed in a
+    single pass straight into an int64 block, without the intermediate
+    string Series a .str chain would allocate per column.
+    """
+    block = df[AMOUNT_COLUMNS]
+    if all(pd.api.types.is_integer_dtype(dtype) for dtype in block.dtypes):
+        return block.astype("int64")
+
+    cells = block.to_numpy(dtype=object).ravel()
+    values = np.fromiter(map(_parse_amount, cells), dtype="int64", count=len(cells))
+    return pd.DataFrame(values.reshape(block.shape), columns=AMOUNT_COLUMNS, index=df.index)
+
+
+def clean_and_normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Scraped rows -> the documents we store: ids and names without dots,
+    UTC dates, integer amounts and categorical status / doc_type / type.
+    Only the CLEAN_COLUMNS are kept.
+    """
+    out = {}
+
+    supplier_id = df["supplier_id"].fillna("").astype(str)
+    out["supplier_id"] = supplier_id.str.replace(".", "", regex=False).str.upper()
+
+    supplier_name = df["supplier_name"].fillna("").astype(str)
+    out["supplier_name"] = supplier_name.str.replace(".", "", regex=False).str.lower()
+
+    out["number"] = df["number"]
+    out["date"] = _to_utc(df["date"], "%d/%m/%Y")
+    out["date_accepted"] = _to_utc(df["date_accepted"], "%d/%m/%Y %H:%M:%S")
+    out["type"] = _clean_category(df["type"], TYPE_NAMES)
+    out["rut_holding"] = df["rut_holding"]
+    out["status"] = _clean_category(df["status"])
+    out["doc_type"] = _clean_category(df["doc_type"])
+
+    amounts = _parse_amounts(df)
+    for col in AMOUNT_COLUMNS:
+        out[col] = amounts[col]
+
+    return pd.DataFrame(out, index=df.index)[CLEAN_COLUMNS]
@@ -0,0 +1,83 @@
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from selenium.common.exceptions import TimeoutException
+
+from .sii_scraper import SiiScraper
+from .metrics import Metrics
+
+
+class UserResult(NamedTuple):
+    user: str
+    df: pd.DataFrame
+    error: str
+    fingerprints: dict = None
+    metrics: Metrics = None
+    # sections that kept failing, df holds the rows of the others
+    failures: list = None
+    # (rut_value, status, doc_type) read to the end, see SnapshotCache.write
+    sections: set = None
+
+
+def scrape_user(user: str, pwd: str, backend: bool = False, backend_kwargs: dict = None,
+                tabs: int = 1, pool=None, fingerprint_store=None, **scraper_kwargs) -> UserResult:
+    """
+    Scrape one credential with its own browser, or one leased from pool.
+    Never raises, the error (if any) is returned so one user can't take
+    the others down.
+    """
+    print(f"Scraping facturas para {user}…")
+    driver = pool.acquire() if pool is not None else None
+    metrics = Metrics()
+    try:
+        fingerprints = fingerprint_store.load(user) if fingerprint_store is not None else None
+        scraper = SiiScraper(user, pwd, driver=driver, fingerprints=fingerprints, metrics=metrics,
+                             **scraper_kwargs)
+        if backend:
+            df = scraper.scrape_all_backend(**(backend_kwargs or {}))
+        elif tabs > 1:
+            df = scraper.scrape_all_concurrent(max_tabs=tabs)
+        else:
+            df = scraper.scrape_all()
+        return UserResult(user, df, None, scraper.seen_fingerprints, metrics, scraper.failures,
+                          scraper.read_sections)
+    except TimeoutException:
+        metrics.inc("timeouts")
+        return UserResult(user, None, "timeout", metrics=metrics)
+    except Exception as e:
+        metrics.inc("errors")
+        return UserResult(user, None, f"{type(e).__name__}: {e}", metrics=metrics)
+    finally:
+        if driver is not None:
+            pool.release(driver)
+
+
+def scrape_users_parallel(creds: dict, max_workers: int = 2, backend: bool = False,
+                          backend_kwargs: dict = None, tabs: int = 1, **scraper_kwargs):
+    """
+    Scrape every { user: password } in creds with at most max_workers
+    browsers at once, each in its own process. Yields a UserResult per
+    user as soon as it finishes.
+    """
+    if not creds:
+        return
+
+    workers = max(1, min(max_workers, len(creds)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(scrape_user, user, pwd, backend, backend_kwargs, tabs, **scraper_kwargs): user
+            for user, pwd in creds.items()
+        }
+        try:
+            for future in as_completed(futures):
+                user = futures[future]
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # the worker process itself died (OOM, chrome crash…)
+                    yield UserResult(user, None, f"{type(e).__name__}: {e}")
+        finally:
+            # closed early: don't start the users still waiting for a worker
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,117 @@
+import queue
+import threading
+
+from .records import invoice_frame
+from .sii_scraper import RowChunk
+
+
+_STOP = object()
+
+
+class PipelineError(RuntimeError):
+    pass
+
+
+class StreamPipeline:
+    """
+    Scrape -> normalize -> sink, each stage on its own thread and joined by
+    bounded queues, so Mongo writes overlap with the browser work and a
+    slow stage holds back the ones before it instead of piling up rows.
+
+    normalize takes a raw 28 column DataFrame (see records.py) and returns the cleaned one,
+    sink takes the cleaned DataFrame and returns (inserted, updated), or
+    None when it writes later (WriteBehindSink.submit) and counts itself.
+    on_section, if given, gets the done RowChunk of every section once all
+    its pages went through sink.
+    """
+
+    def __init__(self, normalize, sink, queue_size: int = 4, on_section=None):
+        self.normalize = normalize
+        self.sink = sink
+        self.on_section = on_section
+        self._raw = queue.Queue(maxsize=queue_size)
+        self._clean = queue.Queue(maxsize=queue_size)
+        self._errors = []
+
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+
+    def _put(self, q: queue.Queue, item):
+        # don't block forever on a queue nobody will drain anymore
+        while True:
+            if self._errors:
+                raise PipelineError("a pipeline stage failed") from self._errors[0]
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _normalizer(self):
+        while True:
+            chunk = self._raw.get()
+            if chunk is _STOP:
+                self._clean.put(_STOP)
+                return
+            if self._errors:
+                continue
+            try:
+                if chunk.done:
+                    # rides the same queue, so it reaches the sink after its pages
+                    self._put(self._clean, chunk)
+                    continue
+                if not chunk.rows:
+                    continue
+                df = invoice_frame(chunk.rows)
+                self._put(self._clean, self.normalize(df))
+            except Exception as e:
+                self._errors.append(e)
+
+    def _sinker(self):
+        while True:
+            df = self._clean.get()
+            if df is _STOP:
+                return
+            if self._errors:
+                continue
+            try:
+                if isinstance(df, RowChunk):
+                    if self.on_section is not None:
+                        self.on_section(df)
+                    continue
+                result = self.sink(df)
+                self.rows += len(df)
+                if result is not None:
+                    self.inserted += result[0]
+                    self.updated += result[1]
+            except Exception as e:
+                self._errors.append(e)
+
+    def run(self, chunks) -> dict:
+        """
+        Feed every RowChunk of chunks (e.g. SiiScraper.iter_rows()) through
+        the pipeline. Raises PipelineError if a stage failed; whatever was
+        synced before that stays synced.
+        """
+        threads = [
+            threading.Thread(target=self._normalizer, name="sii-normalize", daemon=True),
+            threading.Thread(target=self._sinker, name="sii-sink", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+
+        try:
+            for chunk in chunks:
+                self._put(self._raw, chunk)
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+            self._raw.put(_STOP)
+            for t in threads:
+                t.join()
+
+        if self._errors:
+            raise PipelineError("a pipeline stage failed") from self._errors[0]
+
+        return {"rows": self.rows, "inserted": self.inserted, "updated": self.updated}
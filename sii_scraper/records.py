@@ -0,0 +1,139 @@
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+HEADERS = [
+    "type_purchase", "supplier_id", "supplier_name", "number", "date", "date_accepted", "type", "exent_total", "net_total", "iva", "other_tax", "iva_not",
+    "code_iva_not", "total", "total_activo", "iva_activo", "iva_comun", "tax_no_credit", "iva_no_retenido", "type_document_ref", "folio_ref",
+    "tabaco_puro", "tabaco_cigarrillos", "tabaco_elaborado", "nce_or_nde", "rut_holding", "status", "doc_type"
+]
+
+AMOUNT_FIELDS = {
+    "exent_total", "net_total", "iva", "other_tax", "iva_not", "total", "total_activo", "iva_activo",
+    "iva_comun", "tax_no_credit", "iva_no_retenido", "tabaco_puro", "tabaco_cigarrillos", "tabaco_elaborado",
+}
+DATE_FORMATS = {"date": "%d/%m/%Y", "date_accepted": "%d/%m/%Y %H:%M:%S"}
+
+# rows kept as Invoice objects before they're packed into column arrays
+CHUNK_ROWS = 5000
+
+
+def parse_amount(value) -> int:
+    """
+    "1.234.567" -> 1234567, blanks are 0.
+    """
+    if isinstance(value, int):
+        return value
+    if value is None:
+        return 0
+    return int(str(value).replace(".", "").strip() or 0)
+
+
+@lru_cache(maxsize=8192)
+def parse_date(text: str, fmt: str):
+    """
+    SII local time as a naive datetime, None for blanks. A month of
+    invoices shares a few dozen dates, hence the cache.
+    """
+    if not text:
+        return None
+    return datetime.strptime(text, fmt)
+
+
+class Invoice:
+    """
+    One scraped row with its amounts already ints and its dates already
+    datetimes (local SII time), the rest as the page shows it.
+    """
+
+    __slots__ = tuple(HEADERS)
+
+    def __init__(self, *values):
+        if len(values) != len(HEADERS):
+            raise ValueError(f"{len(HEADERS)} columns expected, got {len(values)}")
+        for name, value in zip(HEADERS, values):
+            if name in AMOUNT_FIELDS:
+                value = parse_amount(value)
+            elif name in DATE_FORMATS:
+                value = value if isinstance(value, datetime) or value is None \
+                    else parse_date(value.strip(), DATE_FORMATS[name])
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"Invoice({self.rut_holding!r}, {self.status!r}, {self.doc_type!r}, {self.number!r})"
+
+
+def _dtype(name: str):
+    if name in AMOUNT_FIELDS:
+        return "int64"
+    if name in DATE_FORMATS:
+        return "datetime64[ns]"
+    return object
+
+
+class InvoiceColumns:
+    """
+    Collects Invoices and packs them into typed column arrays every
+    chunk_size rows, so a whole run is never held as row objects. frame()
+    hands the result over as a DataFrame with int64 amounts and
+    datetime64 dates, which clean_and_normalize takes as is.
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_ROWS):
+        self.chunk_size = chunk_size
+        self._pending = []
+        self._chunks = {name: [] for name in HEADERS}
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows + len(self._pending)
+
+    def extend(self, records) -> "InvoiceColumns":
+        for record in records:
+            self._pending.append(record)
+            if len(self._pending) >= self.chunk_size:
+                self._pack()
+        return self
+
+    def _pack(self):
+        if not self._pending:
+            return
+        records, self._pending = self._pending, []
+        for name in HEADERS:
+            values = [getattr(record, name) for record in records]
+            self._chunks[name].append(np.array(values, dtype=_dtype(name)))
+        self._rows += len(records)
+
+    def frame(self) -> pd.DataFrame:
+        self._pack()
+        data = {}
+        for name in HEADERS:
+            parts = self._chunks[name]
+            # free each chunk as soon as it's concatenated
+            data[name] = np.concatenate(parts) if parts else np.array([], dtype=_dtype(name))
+            self._chunks[name] = []
+        return pd.DataFrame(data, columns=HEADERS, copy=False)
+
+
+def invoice_frame(records) -> pd.DataFrame:
+    return InvoiceColumns().extend(records).frame()
+
+
+def as_text(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A typed frame back in the all-text layout of the page (amounts without
+    thousands dots), for stores that keep raw strings.
+    """
+    out = {}
+    for name in HEADERS:
+        col = df[name]
+        if name in DATE_FORMATS and pd.api.types.is_datetime64_any_dtype(col):
+            out[name] = col.dt.strftime(DATE_FORMATS[name]).fillna("")
+        elif name in AMOUNT_FIELDS:
+            out[name] = col.astype(str)
+        else:
+            out[name] = col
+    return pd.DataFrame(out, index=df.index)
@@ -0,0 +1,92 @@
+import os
+import time
+import threading
+
+from selenium.common.exceptions import WebDriverException
+
+
+SII_RETRIES = int(os.getenv("SII_RETRIES", "3"))
+SII_RETRY_DELAY = float(os.getenv("SII_RETRY_DELAY", "2"))
+SII_BREAKER_THRESHOLD = int(os.getenv("SII_BREAKER_THRESHOLD", "6"))
+SII_BREAKER_COOLDOWN = float(os.getenv("SII_BREAKER_COOLDOWN", "120"))
+
+# What selenium raises when SII didn't do what we expected in time:
+# timeouts, stale / intercepted / missing elements, a crashed tab.
+RETRYABLE = (WebDriverException,)
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class RetryPolicy:
+    """
+    attempts tries in total, waiting base_delay, 2 * base_delay, … (at most
+    max_delay) seconds between them.
+    """
+
+    def __init__(self, attempts: int = SII_RETRIES, base_delay: float = SII_RETRY_DELAY,
+                 max_delay: float = 60.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """
+        Seconds to wait after the attempt-th failed try.
+        """
+        return min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+
+
+class CircuitBreaker:
+    """
+    Opens after threshold failures in a row, when SII is down rather than
+    slow. While open, check() raises CircuitOpenError instead of letting
+    the scraper sit through more timeouts. After cooldown seconds one try
+    is let through again, its outcome closes or re-opens it.
+    """
+
+    def __init__(self, threshold: int = SII_BREAKER_THRESHOLD, cooldown: float = SII_BREAKER_COOLDOWN):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def check(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            waited = time.monotonic() - self.opened_at
+            if waited >= self.cooldown:
+                # half open: one more failure opens it again
+                self.opened_at = None
+                self.failures = self.threshold - 1
+                return
+            raise CircuitOpenError(
+                f"{self.failures} failures in a row, next try in {self.cooldown - waited:.0f}s")
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                print(f"→ SII failed {self.failures} times in a row, skipping the rest for {self.cooldown:.0f}s.")
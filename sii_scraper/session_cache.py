@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import hashlib
+
+from cryptography.fernet import Fernet, InvalidToken
+
+
+SESSION_CACHE_DIR = os.getenv(
+    "SII_SESSION_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "sii_scraper", "sessions"),
+)
+# SII drops idle sessions after a while, so don't trust a cache older
+# than this even if the cookies themselves claim to live longer. That's
+# well under the 4 hours between the Dockerfile's cron runs: the cache
+# saves the logins of back to back work (backfill listing the RUTs and
+# then scraping them, --refresh after a run, retrying a failed user), not
+# the one of the next scheduled run. A session SII already dropped is
+# caught and replaced with a fresh login anyway.
+SESSION_TTL = int(os.getenv("SII_SESSION_TTL", "1800"))
+
+
+class SessionCache:
+    """
+    Authenticated cookies per user, encrypted with Fernet (SII_SESSION_KEY)
+    and stored together with the RCV url they were captured on.
+    """
+
+    def __init__(self, key: bytes, path: str = SESSION_CACHE_DIR, ttl: int = SESSION_TTL):
+        # keep the raw key so the cache can be pickled into worker processes
+        self.key = key
+        self.path = path
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls):
+        """
+        A cache keyed with SII_SESSION_KEY, or None when it isn't set.
+        Generate a key with Fernet.generate_key().
+        """
+        key = os.getenv("SII_SESSION_KEY")
+        if not key:
+            return None
+        return cls(key.encode())
+
+    def _file(self, user: str) -> str:
+        name = hashlib.sha256(user.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{name}.bin")
+
+    def save(self, user: str, cookies: list, url: str):
+        now = time.time()
+        expiries = [c["expires"] for c in cookies if c.get("expires", -1) > 0]
+        expires_at = min([now + self.ttl, *expiries])
+
+        payload = json.dumps({
+            "cookies": cookies,
+            "url": url,
+            "saved_at": now,
+            "expires_at": expires_at,
+        }).encode("utf-8")
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._file(user) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(Fernet(self.key).encrypt(payload))
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, self._file(user))
+
+    def load(self, user: str) -> dict:
+        """
+        {"cookies": [...], "url": str} for user, or None when there is no
+        usable session (missing, expired or not readable with our key).
+        """
+        path = self._file(user)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(Fernet(self.key).decrypt(f.read()))
+        except (InvalidToken, ValueError):
+            self.drop(user)
+            return None
+
+        if data.get("expires_at", 0) <= time.time():
+            self.drop(user)
+            return None
+        return data
+
+    def drop(self, user: str):
+        try:
+            os.remove(self._file(user))
+        except FileNotFoundError:
+            pass
@@ -1,77 +1,199 @@
+import os
 import pandas as pd
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import queue
+from datetime import date, datetime, timezone
+from functools import partial
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import TimeoutException, ElementClickInterceptedException, NoSuchElementException
+from selenium.common.exceptions import (
+    TimeoutException, ElementClickInterceptedException, NoSuchElementException, WebDriverException
+)
+
+from .table_extractor import (
+    TableExtractor, build_section_row, build_pending_row, extract_summary, plan_sections
+)
+from .backend import RCV_BASE_URL, RcvBackendClient, session_from_driver, split_rut
+from .browser import new_driver
+from .fingerprints import section_key
+from .metrics import Metrics
+from .network import NetworkControl
+from .records import InvoiceColumns
+from .resilience import RETRYABLE, CircuitBreaker, CircuitOpenError, RetryPolicy
+from .waits import PageWaits
+
+
+class RowChunk(NamedTuple):
+    """
+    One page of scraped rows (Invoice records) of a single section. The
+    last chunk of a section that was read to the end, or that the summary
+    shows empty, has no rows and done set.
+    """
+    rut_value: str
+    status: str
+    doc_type: str
+    rows: list
+    done: bool = False
+
+
+# (label, link XPath, status, doc_type) of the sections read for every RUT
+ACCEPTED_SECTIONS = [
+    ("Factura Electrónica",
+     "//a[contains(text(),'Factura Electrónica') and @ui-sref]",
+     "accepted", "invoice"),
+    ("Factura no Afecta o Exenta Electrónica",
+     "//a[contains(text(),'Factura no Afecta o Exenta Electrónica') and @ui-sref]",
+     "accepted_exempt", "invoice"),
+    ("Nota de Crédito Electrónica",
+     "//a[contains(text(),'Nota de Crédito Electrónica') and @ui-sref]",
+     "accepted", "credit_note"),
+]
+
+PENDING_SECTIONS = [
+    ("Factura Electrónica",
+     "//a[@ui-sref and contains(normalize-space(.), 'Factura Electrónica')]",
+     "pending", "invoice"),
+    ("Factura no Afecta o Exenta Electrónica",
+     "//a[@ui-sref and contains(normalize-space(.), 'Factura no Afecta o Exenta Electrónica')]",
+     "pending_exempt", "invoice"),
+    ("Nota de Crédito Electrónica",
+     "//a[@ui-sref and contains(normalize-space(.), 'Nota de Crédito Electrónica')]",
+     "pending", "credit_note"),
+]
+
+# "status/doc_type" names of the sections above, what scrape_many takes
+SECTION_NAMES = [f"{status}/{doc_type}" for _, _, status, doc_type in ACCEPTED_SECTIONS + PENDING_SECTIONS]
+
+# where the login starts; point SII_AUTH_URL at tools/mock_sii_server.py to
+# run against the offline copy of the site
+SII_AUTH_URL = os.getenv("SII_AUTH_URL", "https://zeusr.sii.cl")
+LOGIN_URL = f"{SII_AUTH_URL}//AUT2000/InicioAutenticacion/IngresoRutClave.html?https://misiir.sii.cl/cgi_misii/siihome.cgi"
+CERT_LOGIN_URL = f"{SII_AUTH_URL}/AUT2000/InicioAutenticacion/IngresoCertificado.html?https://misiir.sii.cl/cgi_misii/siihome.cgi"
+
+RUT_OPTIONS = "select[name='rut'] option"
+
+# fields Network.setCookies accepts out of what Network.getAllCookies returns
+COOKIE_KEYS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+
+def tax_period(month: str = "", year: str = "") -> str:
+    """
+    Tax period ("YYYYMM") a scraper works on: month of year, the current
+    month / year when they're not given.
+    """
+    today = date.today()
+    month = int(month) if month else today.month
+    year = int(year) if year else today.year
+    return f"{year}{month:02d}"
+
+
+def section_filter(sections) -> set:
+    """
+    {(status, doc_type), …} out of SECTION_NAMES entries or (status,
+    doc_type) pairs; None (every section) stays None.
+    """
+    if sections is None:
+        return None
+    wanted = set()
+    for section in sections:
+        name = section if isinstance(section, str) else "/".join(section)
+        if name not in SECTION_NAMES:
+            raise ValueError(f"Unknown section {name!r}, expected one of {', '.join(SECTION_NAMES)}")
+        wanted.add(tuple(name.split("/")))
+    return wanted
+
+
+def rut_key(rut: str) -> str:
+    """
+    "76.123.456-7", "76123456-7" and "761234567" all -> "761234567".
+    """
+    return "".join(split_rut(rut))
 
 
 class SiiScraper: 
-    def __init__(self, user: str, pwd: str, headless:bool = False, use_certificate = False, month:str = ""):
-        options = Options()
+    login_url = LOGIN_URL
+    cert_login_url = CERT_LOGIN_URL
 
+    def __init__(self, user: str, pwd: str, headless:bool = False, use_certificate = False, month:str = "", year: str = "",
+                 driver = None, session_cache = None, fingerprints: dict = None,
+                 done_sections: set = None, metrics: Metrics = None,
+                 retry: RetryPolicy = None, breaker: CircuitBreaker = None):
         self.user = user
         self.pwd = pwd
+        self.headless = headless
 
         self.use_certificate = use_certificate
 
-        if headless:
-            options.add_argument("--headless")
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--disable-gpu")               # recommended for Linux
-        options.add_argument("--no-sandbox")                # recommended in many CI systems
-        options.add_argument("--disable-dev-shm-usage")  
-        options.add_argument("--log-level=3")
-        
-        prefs = {
-            "profile.managed_default_content_settings.images": 2,
-            "profile.managed_default_content_settings.fonts": 2,
-            "profile.managed_default_content_settings.stylesheets": 2,
-            "profile.password_manager_leak_detection": False,
-            "credentials_enable_service": False,
-            "profile.password_manager_enabled": False,
-        }
-
-        auto_select = {
-            "pattern": "https://zeusr.sii.cl/*",
-            "filter": {"ISSUER": {"CN": "E-CERTCHILE CA FES 02"}}
-        }
-
-        prefs["ssl"] = {
-            "auto_select_certificate_for_urls": [auto_select]
-        }
-        
-        options.add_experimental_option("prefs", prefs)
+        # a driver handed in (e.g. from a BrowserPool) belongs to the caller
+        self._owns_driver = driver is None
+        started = time.monotonic()
+        self.driver = driver if driver is not None else new_driver(headless)
+        self.startup_seconds = time.monotonic() - started
+
+        # phase timings and counters, read by the caller after the run
+        self.metrics = metrics if metrics is not None else Metrics()
+        if self._owns_driver:
+            self.metrics.observe("driver_startup", self.startup_seconds)
 
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=options)
         self.wait = WebDriverWait(self.driver, 30)
+        # page-signalled waits for everything that changes after a click
+        self.waits = PageWaits(self.driver, timeout=30)
+        # trackers / fonts / images never requested, see network.py
+        self.network = NetworkControl(self.driver).apply()
         self.month = month
+        self.year = year
+        self.session_cache = session_cache
+
+        # fingerprints of the last synced run (None = scrape everything) and
+        # the ones seen now, to be saved by the caller once synced
+        self.fingerprints = fingerprints
+        self.seen_fingerprints = {}
+        # section_key()s already synced by an interrupted run, never reopened
+        self.done_sections = done_sections or set()
+        # (rut_value, status, doc_type) of the sections read to the end (or
+        # seen empty) and the section_key()s skipped as unchanged
+        self.read_sections = set()
+        self._unchanged = set()
+
+        # scrape_many(close=False) keeps the session for the next call
+        self._logged_in = False
+        self.missing_ruts = []
+
+        # sections / RUTs are retried with backoff, the breaker (shared by
+        # every scraper of a run) stops all of them once SII is down
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        # the RCV page, reloaded to recover from a failed section
+        self._rcv_url = None
+
+    def _count_network(self):
+        for counter, n in self.network.collect().items():
+            self.metrics.inc(counter, n)
+
+    def _close(self):
+        self._count_network()
+        if self._owns_driver:
+            self.driver.quit()
+
+    def _wait_dialog(self, wait):
+        """
+        Wait for SII's “espere” dialog to go away, which is where most of
+        a run's time goes.
+        """
+        with self.metrics.span("espera_dialog"):
+            self.waits.dialog_closed(wait._timeout)
 
     def login_and_navigate(self):
-        self.driver.get("https://zeusr.sii.cl//AUT2000/InicioAutenticacion/IngresoRutClave.html?https://misiir.sii.cl/cgi_misii/siihome.cgi")
+        self.driver.get(self.login_url)
         
-        attempt = 1
-        max_retries = 3
-        for attempt in range(1, max_retries + 1):
-            try:
-                login_link = WebDriverWait(self.driver, self.wait._timeout).until(
-                    EC.element_to_be_clickable((By.ID, "myHref"))
-                )
-                # scroll into view just in case
-                login_link.click()
-                break  # success — exit the function
-            except TimeoutException:
-                print(f"→ Attempt {attempt}/{max_retries} to click login_link timed out.")
-                if attempt < max_retries:
-                    time.sleep(1)  # give it a moment before retrying
-                else:
-                    raise
+        # the login page can be slow to render the link, give it as long as
+        # the three attempts with a pause in between used to
+        login_link = self.waits.clickable(css="#myHref", timeout=3 * self.wait._timeout)
+        login_link.click()
 
         # self.wait.until(EC.alert_is_present())
 
@@ -131,7 +253,7 @@ class SiiScraper:
 
     def login_and_navigate_with_cert(self):
 
-        self.driver.get("https://zeusr.sii.cl/AUT2000/InicioAutenticacion/IngresoCertificado.html?https://misiir.sii.cl/cgi_misii/siihome.cgi")
+        self.driver.get(self.cert_login_url)
 
         self.wait.until(EC.alert_is_present())
 
@@ -172,134 +294,29 @@ class SiiScraper:
 
         print("Ingresando al registro de compras y ventas")
 
-    def _scrape_pending(self, wait, link_xpath: str, status: str, doc_type: str, rut_value: str, all_rows: list):
-        
-        try:
-            link_el = wait.until(
-                EC.element_to_be_clickable((By.XPATH, link_xpath))
-            )
-        except:
-            print(f"→ No {status} - {doc_type} link for RUT {rut_value}, skipping.")
-            return
-        
-        try:
-            count_td = link_el.find_element(
-                By.XPATH,
-                ".//ancestor::td/following-sibling::td[1]"
-            )
-            # strip dots and parse
-            count = int(count_td.text.replace(".", "").strip() or 0)
-        except (NoSuchElementException, ValueError):
-            print(f"→ Couldn't read count next to {doc_type} for RUT {rut_value}, skipping.")
-            return
-        
-        if count <= 0:
-            print(f"→ {doc_type} count is {count} for RUT {rut_value}, not scraping.")
-            return
-        
-        for attempt in range(2):
-            try:
-                # ensure no leftover backdrops
-                wait.until(EC.invisibility_of_element_located(
-                    (By.CSS_SELECTOR, "div.modal-backdrop")
-                ))
-                # scroll into view then click
-                self.driver.execute_script("arguments[0].scrollIntoView({block:'center'});", link_el)
-                link_el.click()
-                break
-            except ElementClickInterceptedException:
-                print("→ Click intercepted by backdrop, retrying…")
-                # try to dismiss any open alert-modal
-                try:
-                    modal = self.driver.find_element(By.ID, "alert-modal")
-                    modal.find_element(By.CSS_SELECTOR, ".modal-footer .btn-danger").click()
-                except NoSuchElementException:
-                    pass
-                # then wait a moment for backdrop to disappear
-                wait.until(EC.invisibility_of_element_located(
-                    (By.CSS_SELECTOR, "div.modal-backdrop")
-                ))
-        else:
-            print(f"→ Failed to click {doc_type} after retry, skipping.")
-            return
-        
-        length_sel = wait.until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "select[name='tableCompra_length']"))
-        )
-        self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", length_sel)
-        Select(length_sel).select_by_value("100")    
-
-        for tr in self.driver.find_elements(By.CSS_SELECTOR, "#tableCompra tbody tr"):
-            
-            tds = tr.find_elements(By.TAG_NAME, "td")
-
-            supplier_link = ""
-            try:
-                supplier_link = tds[1].find_element(By.TAG_NAME, "a")
-            except NoSuchElementException:
-                supplier_link = tds[2].find_element(By.TAG_NAME, "a")
-                
-            supplier_id   = supplier_link.text.strip()
-            supplier_name = supplier_link.get_attribute("data-original-title")
-
-            row = []
-
-            if (doc_type == "credit_note"):
-                row = [
-                    tds[0].text.strip(),
-                    supplier_id,
-                    supplier_name,
-                    *[td.text.strip() for td in tds[2:6]],
-                    "",
-                    *[td.text.strip() for td in tds[6:-1]],
-                    0,
-                    0,
-                    0,
-                    tds[-1].text.strip(),
-                    rut_value, 
-                    status,
-                    doc_type
-                ]
-            
-            else:
-
-                row = [
-                    tds[1].text.strip(),
-                    supplier_id,
-                    supplier_name,
-                    *[td.text.strip() for td in tds[3:7]],
-                    "",
-                    *[td.text.strip() for td in tds[7:-1]],
-                    0,
-                    0,
-                    0,
-                    tds[-1].text.strip(),
-                    rut_value, 
-                    status,
-                    doc_type
-                ]
-
-            all_rows.append(row)
-
-
-        volver_btn = wait.until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "button[ng-click='doTheBack()']"))
+    def _section_fingerprint(self, link_el, rut_value: str, status: str, doc_type: str) -> tuple:
+        """
+        (key, fingerprint) of a section: the whole summary row next to its
+        link, i.e. the document count and every total SII shows for it.
+        """
+        cells = self.driver.execute_script(
+            "const tr = arguments[0].closest('tr');"
+            "return tr ? Array.from(tr.cells).map(td => td.innerText.trim()) : [];",
+            link_el
         )
-        volver_btn.click()
+        key = section_key(rut_value, self.period, status, doc_type)
+        return key, "|".join(cells)
 
-    def _scrape_section(self, wait, link_xpath: str, status: str, doc_type: str, rut_value: str, all_rows: list):
+    def _iter_table(self, wait, link_xpath: str, status: str, doc_type: str, rut_value: str,
+                    build_row=build_section_row):
         """
-        Clicks the link identified by link_xpath, scrapes all rows into all_rows
-        tagging them with (rut_value, status, doc_type), then clicks “Volver” to go back.
+        Clicks the link identified by link_xpath, yields the rows of every page
+        built by build_row and tagged with (rut_value, status, doc_type), then
+        clicks “Volver” to go back. build_pending_row reads the Pendientes tables.
         """
 
-        try:
-            link_el = wait.until(
-                EC.element_to_be_clickable((By.XPATH, link_xpath))
-            )
-        except:
-            print(f"→ No {status} - {doc_type} link for RUT {rut_value}, skipping.")
-            return
+        # the summary listed documents for it, so a missing link gets retried
+        link_el = self.waits.clickable(xpath=link_xpath, timeout=wait._timeout)
         
         try:
             count_td = link_el.find_element(
@@ -315,292 +332,304 @@ class SiiScraper:
         if count <= 0:
             print(f"→ {doc_type} count is {count} for RUT {rut_value}, not scraping.")
             return
+
+        key, fingerprint = self._section_fingerprint(link_el, rut_value, status, doc_type)
+        if self.fingerprints is not None and self.fingerprints.get(key) == fingerprint:
+            print(f"→ {status} - {doc_type} unchanged for RUT {rut_value}, not scraping.")
+            self.metrics.inc("sections_unchanged")
+            self.seen_fingerprints[key] = fingerprint
+            self._unchanged.add(key)
+            return
         
         for attempt in range(2):
             try:
                 # ensure no leftover backdrops
-                wait.until(EC.invisibility_of_element_located(
-                    (By.CSS_SELECTOR, "div.modal-backdrop")
-                ))
+                self.waits.no_backdrop(wait._timeout)
                 # scroll into view then click
                 self.driver.execute_script("arguments[0].scrollIntoView({block:'center'});", link_el)
                 link_el.click()
                 break
             except ElementClickInterceptedException:
                 print("→ Click intercepted by backdrop, retrying…")
+                self.metrics.inc("click_intercepted")
+                self.metrics.inc("retries")
                 # try to dismiss any open alert-modal
                 try:
                     modal = self.driver.find_element(By.ID, "alert-modal")
                     modal.find_element(By.CSS_SELECTOR, ".modal-footer .btn-danger").click()
                 except NoSuchElementException:
                     pass
-                # then wait a moment for backdrop to disappear
-                wait.until(EC.invisibility_of_element_located(
-                    (By.CSS_SELECTOR, "div.modal-backdrop")
-                ))
+                # then wait for the backdrop to disappear
+                self.waits.no_backdrop(wait._timeout)
         else:
-            print(f"→ Failed to click {doc_type} after retry, skipping.")
-            return
-
-        length_sel = wait.until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "select[name='tableCompra_length']"))
-        )
-
-        self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", length_sel)
-        Select(length_sel).select_by_value("100")
-
-        wait.until(lambda d: len(
-            d.find_elements(By.CSS_SELECTOR, "#tableCompra tbody tr")
-        ) >= 1)
-
-        for tr in self.driver.find_elements(By.CSS_SELECTOR, "#tableCompra tbody tr"):
-            
-            tds = tr.find_elements(By.TAG_NAME, "td")
+            raise ElementClickInterceptedException(f"{status} - {doc_type} link still covered after retry")
 
-            supplier_link = tds[1].find_element(By.TAG_NAME, "a")
-            supplier_id   = supplier_link.text.strip()
-            supplier_name = supplier_link.get_attribute("data-original-title")
+        extractor = TableExtractor(self.driver, metrics=self.metrics, waits=self.waits)
+        extractor.use_largest_page_length(wait)
 
-            # row_values = [data_cells[0].text.strip()]                # type_purchase
-            row = []
-
-            row = [
-                tds[0].text.strip(),
-                supplier_id,
-                supplier_name,
-                *[td.text.strip() for td in tds[2:]],
-                rut_value, 
-                status,
-                doc_type
-            ]
-
-            all_rows.append(row)
-
-        volver_btn = wait.until(
-            EC.element_to_be_clickable(
-                (By.CSS_SELECTOR, "button[ng-click='doTheBack()']")
-            )
-        )
+        for page in extractor.iter_pages(wait, build_row, rut_value, status, doc_type,
+                                         expected=count):
+            yield page
 
+        volver_btn = self.waits.clickable(css="button[ng-click='doTheBack()']", timeout=wait._timeout)
         volver_btn.click()
 
+        self.seen_fingerprints[key] = fingerprint
+
     def _click_pendientes(self, wait):
         """
         Wait for the “Pendientes” tab to be clickable, then click it.
         """
 
-        wait.until(
-            EC.invisibility_of_element_located((By.ID, "esperaDialog"))
-        )
+        self._wait_dialog(wait)
 
-        pendientes_locator = (
-            By.XPATH,
-            "//a[@ui-sref='compraPendiente' and normalize-space(strong/text())='Pendientes']"
+        elem = self.waits.clickable(
+            xpath="//a[@ui-sref='compraPendiente' and normalize-space(strong/text())='Pendientes']",
+            timeout=wait._timeout,
         )
-
-        elem = wait.until(EC.presence_of_element_located(pendientes_locator))
         self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", elem)
-        
-        wait.until(EC.element_to_be_clickable(pendientes_locator))
+
         try:
             elem.click()
         except ElementClickInterceptedException:
             print("→ click intercepted—falling back to JS click")
+            self.metrics.inc("click_intercepted")
             self.driver.execute_script("arguments[0].click();", elem)
 
-        wait.until(
-            EC.invisibility_of_element_located((By.ID, "esperaDialog"))
-        )
-
-    def scrape_all(self) -> pd.DataFrame:
-        try:
-            if self.use_certificate: 
-                self.login_and_navigate_with_cert()
-            else: 
-                self.login_and_navigate()
-
-            try: 
-                self.wait.until(lambda d: len(
-                    d.find_elements(By.CSS_SELECTOR, "select[name='rut'] option")
-                ) > 2)
-
-            except TimeoutException:
-                self.wait.until(lambda d: len(
-                    d.find_elements(By.CSS_SELECTOR, "select[name='rut'] option")
-                ) > 2)
-
-            # Convertir esto a un for loop
-            rut_select = self.wait.until(EC.element_to_be_clickable((By.NAME, "rut")))
-            select = Select(rut_select)
-            option_count = len(select.options)
-
-            # ruts = [opt.text.strip() for opt in all_opts if opt.text.strip() and opt.text.strip() != "" and opt.text.strip() == "Empresa"]
-            # print("Will iterate RUTs:", ruts)
-            
-            all_rows = []
-            headers = [
-                "type_purchase", "supplier_id", "supplier_name", "number", "date", "date_accepted", "type", "exent_total", "net_total", "iva", "other_tax", "iva_not", 
-                "code_iva_not", "total", "total_activo", "iva_activo", "iva_comun", "tax_no_credit", "iva_no_retenido", "type_document_ref", "folio_ref",  
-                "tabaco_puro", "tabaco_cigarrillos", "tabaco_elaborado", "nce_or_nde", "rut_holding", "status", "doc_type"
-            ]
+        self._wait_dialog(wait)
 
-            wait = WebDriverWait(self.driver, 10)
+    def _login(self):
+        """
+        Get to the Registro de Compras y Ventas page with the RUT list
+        loaded, reusing a cached session when there is one.
+        """
+        # no point logging in while SII is down for everyone else
+        self.breaker.check()
+        with self.metrics.span("login"):
+            if self.session_cache is not None and self._restore_session():
+                self.metrics.inc("sessions_restored")
+                return
 
-            if (self.month):
-                periodoMes = self.wait.until(EC.element_to_be_clickable((By.ID, "periodoMes")))
-                month_sel = Select(periodoMes)
-                month_sel.select_by_value(self.month)
+            try:
+                if self.use_certificate: 
+                    self.login_and_navigate_with_cert()
+                else: 
+                    self.login_and_navigate()
 
-                # periodoAnyo = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'select[ng-model="periodoAnho"]')))
-                # year_sel = Select(periodoAnyo)
-                # year_sel.select_by_value("2025")
+                self._wait_rut_options()
+            except RETRYABLE:
+                self.breaker.failure()
+                raise
+            self._rcv_url = self.driver.current_url
 
-            for idx in range(1, option_count):
-                try: 
-                    sel = Select(rut_select)
-                    sel.select_by_index(idx)  # index 0 = placeholder, 1 = first RUT, 2 = second RUT
-                    # time.sleep(5)
+            if self.session_cache is not None:
+                self.session_cache.save(self.user, self._session_cookies(), self.driver.current_url)
 
-                    rut_value = sel.first_selected_option.get_attribute("value")
-                    # (or use .text if you prefer the visible text)
-                    print(f"Obteniendo facturas para RUT {rut_value!r}")
+    def _session_cookies(self) -> list:
+        """
+        Every cookie of the browser, not only the ones of the current host.
+        """
+        return self.driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
 
-                    wait.until(
-                        EC.invisibility_of_element_located((By.ID, "esperaDialog"))
-                    )
+    def _restore_session(self) -> bool:
+        cached = self.session_cache.load(self.user)
+        if not cached:
+            return False
 
-                    # 2) Click “Consultar”
-                    consult_btn = self.driver.find_element(
-                        By.CSS_SELECTOR,
-                        "form[name='formContribuyente'] button[type='submit']"
-                    )
+        try:
+            self._restore_cookies(cached["cookies"], cached["url"])
+            self.waits.min_count(RUT_OPTIONS, 3, timeout=10)
+        except WebDriverException as e:
+            # a timeout, or SII redirecting to the login while we wait
+            print(f"→ Cached session was rejected ({type(e).__name__}), logging in again.")
+            self.session_cache.drop(self.user)
+            self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            return False
+
+        print("Sesión restaurada, ingresando al registro de compras y ventas")
+        return True
+
+    def _wait_rut_options(self):
+        """
+        Wait for the placeholder plus at least two RUT options, as long as
+        the two back to back waits this replaced.
+        """
+        self.waits.min_count(RUT_OPTIONS, 3, timeout=2 * self.wait._timeout)
 
-                    try:
-                        consult_btn.click()
-                    except ElementClickInterceptedException:
-                        self.driver.execute_script("arguments[0].click();", consult_btn)
-
-                    self._scrape_section(
-                        wait,
-                        "//a[contains(text(),'Factura Electrónica') and @ui-sref]",
-                        status="accepted",
-                        doc_type="invoice",
-                        rut_value=rut_value,
-                        all_rows=all_rows
-                    )
-
-                    self._scrape_section(
-                        wait,
-                        "//a[contains(text(),'Factura no Afecta o Exenta Electrónica') and @ui-sref]",
-                        status="accepted_exempt",
-                        doc_type="invoice",
-                        rut_value=rut_value,
-                        all_rows=all_rows
-                    )
-                    
-                    self._scrape_section(
-                        wait,
-                        "//a[contains(text(),'Nota de Crédito Electrónica') and @ui-sref]",
-                        status="accepted",
-                        doc_type="credit_note",
-                        rut_value=rut_value,
-                        all_rows=all_rows
-                    )
-
-                    self._click_pendientes(wait)
+    def _rut_values(self) -> list:
+        """
+        Values of every RUT option, skipping the placeholder at index 0.
+        """
+        return self.driver.execute_script(
+            "return Array.from(document.querySelectorAll(\"select[name='rut'] option\"))"
+            ".slice(1).map(o => o.value);"
+        )
 
-                    try:
-                        wait.until(EC.presence_of_element_located(
-                            (By.XPATH, "//td[@ng-if=\"(row.rsmnLink)\"]")
-                        ))
-                    except TimeoutException:
-                        print(f"→ No pending‐documents table for RUT {rut_value}, skipping.")
-                        continue
-
-                    self._scrape_pending(
-                        wait,
-                        "//a[@ui-sref and contains(normalize-space(.), 'Factura Electrónica')]",
-                        status="pending",
-                        doc_type="invoice",
-                        rut_value=rut_value,
-                        all_rows=all_rows,
-                    )
-
-                    self._scrape_pending(
-                        wait,
-                        "//a[@ui-sref and contains(normalize-space(.), 'Factura no Afecta o Exenta Electrónica')]",
-                        status="pending_exempt",
-                        doc_type="invoice",
-                        rut_value=rut_value,
-                        all_rows=all_rows,
-                    )
-
-                    self._scrape_pending(
-                        wait,
-                        "//a[@ui-sref and contains(normalize-space(.), 'Nota de Crédito Electrónica')]",
-                        status="pending",
-                        doc_type="credit_note",
-                        rut_value=rut_value,
-                        all_rows=all_rows,
-                    )
-                except TimeoutException:
-                    print(f"Timeout processing RUT index {idx}, continuing")
-                    continue
+    def _select_period(self):
+        with self.metrics.span("navigation"):
+            self._select_period_options()
 
-            if all_rows:
-                df = pd.DataFrame(all_rows, columns=headers, dtype=str)
-                # print(df.head())
-                return df
-        finally:
-            self.driver.quit()
+    def _select_period_options(self):
+        # year first, the month options depend on it
+        if (self.year):
+            periodoAnyo = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'select[ng-model="periodoAnho"]')))
+            year_sel = Select(periodoAnyo)
+            year_sel.select_by_value(str(self.year))
 
-    def scrape_one(self, rut) -> pd.DataFrame: 
+        if (self.month):
+            periodoMes = self.wait.until(EC.element_to_be_clickable((By.ID, "periodoMes")))
+            month_sel = Select(periodoMes)
+            month_sel.select_by_value(self.month)
 
+    def _retrying(self, what: str, step, recover=None):
+        """
+        step(), tried again with backoff on selenium errors. recover() runs
+        before every new try to get the page back to where step expects it.
+        """
+        for attempt in range(1, self.retry.attempts + 1):
+            self.breaker.check()
+            try:
+                result = step()
+            except RETRYABLE as e:
+                self.breaker.failure()
+                if attempt == self.retry.attempts:
+                    raise
+                self._back_off(what, attempt, e, recover)
+                continue
+            self.breaker.success()
+            return result
+
+    def _back_off(self, what: str, attempt: int, error: Exception, recover=None):
+        delay = self.retry.delay(attempt)
+        print(f"→ {what} failed ({type(error).__name__}), retrying in {delay:.0f}s "
+              f"({attempt}/{self.retry.attempts - 1})")
+        self.metrics.inc("retries")
+        time.sleep(delay)
+        if recover is None:
+            return
         try:
-            self.login_and_navigate()
+            recover()
+        except RETRYABLE as e:
+            # the next try fails (and backs off) on its own
+            print(f"→ Couldn't get back to where {what} starts: {type(e).__name__}")
 
-            try: 
-                self.wait.until(lambda d: len(
-                    d.find_elements(By.CSS_SELECTOR, "select[name='rut'] option")
-                ) > 2)
+    def _reload_rcv(self):
+        """
+        Back to a fresh Registro de Compras y Ventas page, period selected.
+        """
+        with self.metrics.span("navigation"):
+            self.driver.get(self._rcv_url or self.driver.current_url)
+            self._wait_rut_options()
+            self._select_period_options()
+
+    def _reopen_rut(self, wait, rut_value: str, pending: bool = False):
+        self._reload_rcv()
+        self._open_rut(wait, rut_value)
+        if pending:
+            self._click_pendientes(wait)
 
-            except TimeoutException:
-                self.wait.until(lambda d: len(
-                    d.find_elements(By.CSS_SELECTOR, "select[name='rut'] option")
-                ) > 2)
+    def _section_failed(self, rut_value: str, status: str, doc_type: str, error: Exception):
+        """
+        Record a section that kept failing (a whole RUT when status is
+        None) in the run report.
+        """
+        status, doc_type = status or "*", doc_type or "*"
+        key = section_key(rut_value or "*", self.period, status, doc_type)
+        # selenium messages go on with a stacktrace, the first line is enough
+        lines = (getattr(error, "msg", None) or str(error)).strip().splitlines()
+        self.metrics.fail(
+            f"{self.user}|{key}",
+            user=self.user,
+            rut=rut_value,
+            period=self.period,
+            status=status,
+            doc_type=doc_type,
+            error=f"{type(error).__name__}: {lines[0] if lines else ''}".rstrip(": "),
+            at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        )
+        self.metrics.inc("sections_failed")
 
-            # Convertir esto a un for loop
-            rut_select = self.wait.until(EC.element_to_be_clickable((By.NAME, "rut")))
-            select = Select(rut_select)
-            option_count = len(select.options)
-
-            # ruts = [opt.text.strip() for opt in all_opts if opt.text.strip() and opt.text.strip() != "" and opt.text.strip() == "Empresa"]
-            # print("Will iterate RUTs:", ruts)
-            
-            all_rows = []
-            headers = [
-                "type_purchase", "supplier_id", "supplier_name", "number", "date", "date_accepted", "type", "exent_total", "net_total", "iva", "other_tax", "iva_not", 
-                "code_iva_not", "total", "total_activo", "iva_activo", "iva_comun", "tax_no_credit", "iva_no_retenido", "type_document_ref", "folio_ref",  
-                "tabaco_puro", "tabaco_cigarrillos", "tabaco_elaborado", "nce_or_nde", "rut_holding", "status", "doc_type"
-            ]
+    @property
+    def failures(self) -> list:
+        """
+        Failed sections of this scraper's user, as recorded in metrics.
+        """
+        return [info for info in self.metrics.failures.values() if info["user"] == self.user]
 
-            wait = WebDriverWait(self.driver, 10)
+    def _iter_ruts(self, wait, rut_values: list, sections: set = None):
+        """
+        _iter_rut for every RUT of rut_values. A RUT that keeps failing
+        outside its sections is recorded and the next one goes on; once the
+        circuit breaker opens, every RUT left is recorded and we stop.
+        """
+        for idx, rut_value in enumerate(rut_values):
+            try:
+                yield from self._iter_rut(wait, rut_value, sections)
+            except CircuitOpenError as e:
+                print(f"→ SII looks down ({e}), leaving {len(rut_values) - idx} RUTs for the next run.")
+                for left in rut_values[idx:]:
+                    self._section_failed(left, None, None, e)
+                return
+            except RETRYABLE as e:
+                print(f"→ Giving up on RUT {rut_value} ({type(e).__name__}), continuing")
+                self._section_failed(rut_value, None, None, e)
+                try:
+                    self._reload_rcv()
+                except RETRYABLE:
+                    # the next RUT retries (and recovers) on its own
+                    pass
 
-            # periodoMes = self.wait.until(EC.element_to_be_clickable((By.ID, "periodoMes")))
-            # month_sel = Select(periodoMes)
-            # month_sel.select_by_value("05")
+    def _iter_rut(self, wait, rut_value: str, sections: set = None):
+        """
+        Select rut_value, click “Consultar” and yield a RowChunk per page of
+        the accepted and pending sections of that RUT, or only of the
+        (status, doc_type) sections given. A section that keeps failing is
+        recorded and skipped, the others are still read.
+        """
+        accepted = [s for s in ACCEPTED_SECTIONS if sections is None or (s[2], s[3]) in sections]
+        pending = [s for s in PENDING_SECTIONS if sections is None or (s[2], s[3]) in sections]
 
+        self._retrying(f"RUT {rut_value}", lambda: self._open_rut(wait, rut_value), self._reload_rcv)
+        self.metrics.inc("ruts")
+        # drained per RUT so chromedriver doesn't sit on a whole run of events
+        self._count_network()
+
+        if accepted:
+            summary_plan = self._summary_plan(wait, accepted, rut_value)
+            yield from self._iter_planned(wait, accepted, summary_plan, rut_value,
+                                          self._iter_table, "section",
+                                          lambda: self._reopen_rut(wait, rut_value))
+
+        if not pending:
+            return
+        self._retrying(f"Pendientes of RUT {rut_value}", lambda: self._click_pendientes(wait),
+                       lambda: self._reopen_rut(wait, rut_value))
+
+        try:
+            self.waits.present(xpath="//td[@ng-if=\"(row.rsmnLink)\"]", timeout=wait._timeout)
+        except TimeoutException:
+            print(f"→ No pending‐documents table for RUT {rut_value}, skipping.")
+            for _, _, status, doc_type in pending:
+                yield self._section_read(rut_value, status, doc_type)
+            return
+
+        pending_plan = self._summary_plan(wait, pending, rut_value)
+        yield from self._iter_planned(wait, pending, pending_plan, rut_value,
+                                      partial(self._iter_table, build_row=build_pending_row), "pending",
+                                      lambda: self._reopen_rut(wait, rut_value, pending=True))
+
+    def _open_rut(self, wait, rut_value: str):
+        """
+        Select rut_value and click “Consultar”.
+        """
+        with self.metrics.span("navigation"):
+            rut_select = self.wait.until(EC.element_to_be_clickable((By.NAME, "rut")))
             sel = Select(rut_select)
-            sel.select_by_value(rut)  # index 0 = placeholder, 1 = first RUT, 2 = second RUT
-            # time.sleep(5)
+            sel.select_by_value(rut_value)
 
-            rut_value = sel.first_selected_option.get_attribute("value")
-            # (or use .text if you prefer the visible text)
             print(f"Obteniendo facturas para RUT {rut_value!r}")
 
-            self.wait.until(
-                EC.invisibility_of_element_located((By.ID, "esperaDialog"))
-            )
+            self._wait_dialog(wait)
 
             # 2) Click “Consultar”
             consult_btn = self.driver.find_element(
@@ -611,75 +640,321 @@ class SiiScraper:
             try:
                 consult_btn.click()
             except ElementClickInterceptedException:
+                self.metrics.inc("click_intercepted")
                 self.driver.execute_script("arguments[0].click();", consult_btn)
 
-            self._scrape_section(
-                wait,
-                "//a[contains(text(),'Factura Electrónica') and @ui-sref]",
-                status="accepted",
-                doc_type="invoice",
-                rut_value=rut_value,
-                all_rows=all_rows
-            )
+    def _iter_planned(self, wait, sections: list, plan: dict, rut_value: str, iter_section,
+                      phase: str, recover=None):
+        """
+        RowChunks of the sections plan says have documents, leaving out the
+        ones an earlier run already synced. Each section read to the end is
+        closed with a done chunk; one that keeps failing is recorded, gets
+        no done chunk, and recover() puts the page back for the next one.
+        """
+        for label, link_xpath, status, doc_type in sections:
+            key = section_key(rut_value, self.period, status, doc_type)
+            if plan.get((status, doc_type), 0) <= 0:
+                print(f"→ No {status} - {doc_type} documents for RUT {rut_value}, skipping.")
+                yield self._section_read(rut_value, status, doc_type)
+                continue
+            if key in self.done_sections:
+                print(f"→ {status} - {doc_type} already synced for RUT {rut_value}, skipping.")
+                self.metrics.inc("sections_checkpointed")
+                continue
+            pages = self.metrics.timed_iter(
+                f"{phase}:{status}/{doc_type}",
+                self._read_section(wait, iter_section, link_xpath, status, doc_type, rut_value, recover))
+            try:
+                for page in pages:
+                    yield RowChunk(rut_value, status, doc_type, page)
+            except RETRYABLE as e:
+                print(f"→ Giving up on {status} - {doc_type} for RUT {rut_value}, keeping what was read.")
+                self._section_failed(rut_value, status, doc_type, e)
+                if recover is not None:
+                    recover()
+                continue
+            if key not in self._unchanged:
+                yield self._section_read(rut_value, status, doc_type)
+
+    def _section_read(self, rut_value: str, status: str, doc_type: str) -> RowChunk:
+        """
+        The done chunk closing a section, also kept in read_sections.
+        """
+        self.read_sections.add((rut_value, status, doc_type))
+        return RowChunk(rut_value, status, doc_type, [], done=True)
 
-            self._scrape_section(
-                wait,
-                "//a[contains(text(),'Factura no Afecta o Exenta Electrónica') and @ui-sref]",
-                status="accepted_exempt",
-                doc_type="invoice",
-                rut_value=rut_value,
-                all_rows=all_rows
-            )
-            
-            self._scrape_section(
-                wait,
-                "//a[contains(text(),'Nota de Crédito Electrónica') and @ui-sref]",
-                status="accepted",
-                doc_type="credit_note",
-                rut_value=rut_value,
-                all_rows=all_rows
-            )
+    def _read_section(self, wait, iter_section, link_xpath: str, status: str, doc_type: str,
+                      rut_value: str, recover=None):
+        """
+        Pages of iter_section, retried with backoff. A retry reads the table
+        from the start, the rows already yielded are left out.
+        """
+        what = f"{status} - {doc_type} for RUT {rut_value}"
+        read = 0
+        for attempt in range(1, self.retry.attempts + 1):
+            self.breaker.check()
+            seen = 0
+            try:
+                for page in iter_section(wait, link_xpath, status, doc_type, rut_value):
+                    new = page[max(0, read - seen):]
+                    seen += len(page)
+                    if new:
+                        read += len(new)
+                        yield new
+            except RETRYABLE as e:
+                self.breaker.failure()
+                if attempt == self.retry.attempts:
+                    raise
+                self._back_off(what, attempt, e, recover)
+                continue
+            self.breaker.success()
+            return
 
-            self._click_pendientes(wait)
+    def _summary_plan(self, wait, sections: list, rut_value: str) -> dict:
+        """
+        Read the summary on screen once and return {(status, doc_type): count}
+        for the sections it lists, so we never wait on links that aren't there.
+        """
+        try:
+            self._wait_dialog(wait)
+            self.waits.present(css="table td a[ui-sref]", timeout=wait._timeout)
+            summary = extract_summary(self.driver)
+        except TimeoutException:
+            print(f"→ No summary table for RUT {rut_value}.")
+            return {}
+        return plan_sections(summary, sections)
+
+    def iter_rows(self):
+        """
+        Log in and yield a RowChunk for every page of every section of
+        every RUT as soon as it is read. The browser is closed when the
+        generator is exhausted or closed.
+        """
+        try:
+            self._login()
 
-            try:
-                wait.until(EC.presence_of_element_located(
-                    (By.XPATH, "//td[@ng-if=\"(row.rsmnLink)\"]")
-                ))
-            except TimeoutException:
-                print(f"→ No pending‐documents table for RUT {rut_value}, skipping.")
-                return
+            wait = WebDriverWait(self.driver, 10)
 
-            self._scrape_pending(
-                wait,
-                    "//a[@ui-sref and contains(normalize-space(.), 'Factura Electrónica')]",
-                status="pending",
-                doc_type="invoice",
-                rut_value=rut_value,
-                all_rows=all_rows,
-            )
+            self._select_period()
 
-            self._scrape_pending(
-                wait,
-                "//a[@ui-sref and contains(normalize-space(.), 'Factura no Afecta o Exenta Electrónica')]",
-                status="pending_exempt",
-                doc_type="invoice",
-                rut_value=rut_value,
-                all_rows=all_rows,
-            )
+            yield from self._iter_ruts(wait, self._rut_values())
+        finally:
+            self._close()
 
-            self._scrape_pending(
-                wait,
-                "//a[@ui-sref and contains(normalize-space(.), 'Nota de Crédito Electrónica')]",
-                status="pending",
-                doc_type="credit_note",
-                rut_value=rut_value,
-                all_rows=all_rows,
-            )
+    def scrape_all(self) -> pd.DataFrame:
+        # packed into column arrays as pages come in, never one big list of rows
+        columns = InvoiceColumns()
+        rut_value = None
+        try:
+            for chunk in self.iter_rows():
+                rut_value = chunk.rut_value
+                columns.extend(chunk.rows)
+        except Exception as e:
+            # whatever was read before is still good, the rest goes in the report
+            if not len(columns):
+                raise
+            print(f"→ Scrape of {self.user} stopped ({type(e).__name__}: {e}), keeping {len(columns)} rows.")
+            self._section_failed(rut_value, None, None, e)
+
+        if len(columns):
+            df = columns.frame()
+            # print(df.head())
+            return df
+
+    def _restore_cookies(self, cookies: list, url: str):
+        """
+        Plant cookies read with _session_cookies() (from this or another
+        browser), then open url (the RCV page).
+        """
+        params = [{k: v for k, v in c.items() if k in COOKIE_KEYS} for c in cookies]
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+        self.driver.get(url)
+        self._rcv_url = url
+
+    def _sibling(self) -> "SiiScraper":
+        # no session_cache: siblings get their cookies from this scraper
+        sibling = SiiScraper(self.user, self.pwd, headless=self.headless,
+                             use_certificate=self.use_certificate, month=self.month, year=self.year,
+                             fingerprints=self.fingerprints, done_sections=self.done_sections,
+                             metrics=self.metrics, retry=self.retry, breaker=self.breaker)
+        sibling.seen_fingerprints = self.seen_fingerprints
+        sibling.read_sections = self.read_sections
+        sibling._unchanged = self._unchanged
+        return sibling
+
+    def scrape_all_concurrent(self, max_tabs: int = 3) -> pd.DataFrame:
+        """
+        Like scrape_all, but after a single login the RUTs are spread over
+        up to max_tabs browser windows that share the session cookies.
+        A webdriver session only runs one command at a time, even across
+        tabs, so every extra window gets its own driver.
+        """
+        try:
+            self._login()
+
+            rut_values = self._rut_values()
+            cookies = self._session_cookies()
+            rcv_url = self.driver.current_url
+
+            ruts = queue.Queue()
+            for rut_value in rut_values:
+                ruts.put(rut_value)
 
-            if all_rows:
-                df = pd.DataFrame(all_rows, columns=headers, dtype=str)
-                # print(df.head())
-                return df
+            rows_by_rut = {}
+
+            def work(scraper):
+                wait = WebDriverWait(scraper.driver, 10)
+                scraper._select_period()
+                while True:
+                    try:
+                        rut_value = ruts.get_nowait()
+                    except queue.Empty:
+                        return
+                    rows = []
+                    for chunk in scraper._iter_ruts(wait, [rut_value]):
+                        rows.extend(chunk.rows)
+                    rows_by_rut[rut_value] = rows
+
+            def sibling_work():
+                scraper = None
+                try:
+                    scraper = self._sibling()
+                    scraper._restore_cookies(cookies, rcv_url)
+                    scraper._wait_rut_options()
+                    work(scraper)
+                except Exception as e:
+                    print(f"→ Extra window failed ({type(e).__name__}: {e}), leaving its RUTs to the others.")
+                finally:
+                    if scraper is not None:
+                        scraper._close()
+
+            tabs = max(1, min(max_tabs, len(rut_values)))
+            with ThreadPoolExecutor(max_workers=tabs) as pool:
+                futures = [pool.submit(work, self)]
+                futures += [pool.submit(sibling_work) for _ in range(tabs - 1)]
+                for future in futures:
+                    future.result()
+
+            columns = InvoiceColumns()
+            for rut_value in rut_values:
+                columns.extend(rows_by_rut.pop(rut_value, []))
+
+            if len(columns):
+                return columns.frame()
         finally:
-            self.driver.quit()
\ No newline at end of file
+            self._close()
+
+    @property
+    def period(self) -> str:
+        """
+        The YYYYMM tax period being scraped.
+        """
+        return tax_period(self.month, self.year)
+
+    def iter_periods(self, work: list):
+        """
+        Log in once and scrape every (rut_value, year, month) of work,
+        yielding (rut_value, year, month, rows, error) per item. An item
+        with failed sections comes with the rows of the others and an
+        error, it only loses what failed.
+        """
+        try:
+            self._login()
+            wait = WebDriverWait(self.driver, 10)
+
+            for rut_value, year, month in work:
+                self.year, self.month = str(year), f"{int(month):02d}"
+                failed = len(self.metrics.failures)
+                rows = []
+                try:
+                    self._retrying(f"Period {self.period}", self._select_period, self._reload_rcv)
+                    for chunk in self._iter_ruts(wait, [rut_value]):
+                        rows.extend(chunk.rows)
+                except (CircuitOpenError, *RETRYABLE) as e:
+                    print(f"Couldn't process RUT {rut_value} {self.period} ({type(e).__name__}), continuing")
+                    self._section_failed(rut_value, None, None, e)
+                error = None
+                if len(self.metrics.failures) > failed:
+                    error = f"{len(self.metrics.failures) - failed} secciones fallidas"
+                yield rut_value, year, month, rows, error
+        finally:
+            self._close()
+
+    def scrape_all_backend(self, base_url: str = RCV_BASE_URL, record_dir: str = None) -> pd.DataFrame:
+        """
+        Log in through the browser, then fetch every RUT straight from the
+        RCV JSON endpoints with the session cookies. The browser is closed
+        as soon as the cookies and the RUT list are read.
+        """
+        try:
+            self._login()
+
+            rut_values = self._rut_values()
+            session = session_from_driver(self.driver)
+        finally:
+            self._close()
+
+        client = RcvBackendClient(session, base_url=base_url, record_dir=record_dir)
+        period = self.period
+
+        columns = InvoiceColumns()
+        for rut_value in rut_values:
+            print(f"Obteniendo facturas para RUT {rut_value!r}")
+            columns.extend(client.rows(rut_value, period))
+
+        if len(columns):
+            return columns.frame()
+
+    def iter_many(self, ruts: list, sections=None, period: str = None, close: bool = True):
+        """
+        Like iter_rows, but after a single login (password or certificate)
+        only for ruts, in any format, and only for sections (SECTION_NAMES
+        entries, every section when None). period is "YYYYMM", the
+        scraper's month / year when not given. RUTs the account doesn't
+        have are left in missing_ruts. With close=False the browser stays
+        logged in for the next call.
+        """
+        wanted = section_filter(sections)
+        if period:
+            if len(period) != 6 or not period.isdigit():
+                raise ValueError(f"period must be YYYYMM, got {period!r}")
+            self.year, self.month = period[:4], period[4:]
+
+        try:
+            if not self._logged_in:
+                self._login()
+                self._logged_in = True
+
+            wait = WebDriverWait(self.driver, 10)
+            self._select_period()
+
+            available = {rut_key(value): value for value in self._rut_values()}
+            self.missing_ruts = []
+            rut_values = []
+            for rut in ruts:
+                rut_value = available.get(rut_key(rut))
+                if rut_value is None:
+                    print(f"→ RUT {rut} not available for {self.user}, skipping.")
+                    self.missing_ruts.append(rut)
+                    continue
+                rut_values.append(rut_value)
+            yield from self._iter_ruts(wait, rut_values, wanted)
+        finally:
+            if close:
+                self._logged_in = False
+                self._close()
+
+    def scrape_many(self, ruts: list, sections=None, period: str = None, close: bool = True) -> pd.DataFrame:
+        """
+        Refresh a few RUTs without scraping the whole account, see
+        iter_many. None when nothing was found.
+        """
+        columns = InvoiceColumns()
+        for chunk in self.iter_many(ruts, sections, period, close):
+            columns.extend(chunk.rows)
+
+        if len(columns):
+            return columns.frame()
+
+    def scrape_one(self, rut) -> pd.DataFrame:
+        return self.scrape_many([rut])
\ No newline at end of file
@@ -0,0 +1,236 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .records import HEADERS, as_text
+
+
+SNAPSHOT_DIR = os.getenv("SII_SNAPSHOT_DIR", "sii_snapshots")
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SII_SNAPSHOT_RETENTION_DAYS", "90"))
+STAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# user=<key>/rut=<rut>/period=<YYYYMM>/scraped_at=<stamp>/part-*.parquet
+LEVELS = ("user", "rut", "period", "scraped_at")
+# a scrape only has the sections it read (unchanged, checkpointed and
+# failed ones are skipped), so the latest rows are picked per section.
+# Every partition lists the sections its scrape read, empty ones included,
+# in MANIFEST; older partitions without one go by the rows they hold.
+SECTION_COLUMNS = ["status", "doc_type"]
+MANIFEST = "sections.json"
+
+SCHEMA = pa.schema([(col, pa.string()) for col in HEADERS])
+
+
+def user_key(user: str) -> str:
+    return hashlib.sha256(user.encode("utf-8")).hexdigest()[:16]
+
+
+class SnapshotCache:
+    """
+    The raw 28 column rows of every scrape, as Parquet files partitioned
+    by user, RUT, period and scrape time, so cleaning and sync can be
+    re-run without going back to SII.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_DIR, retention_days: int = SNAPSHOT_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+
+    def _dir(self, user_k: str, rut: str, period: str, stamp: str) -> str:
+        return os.path.join(self.path, *(f"{level}={value}" for level, value
+                                         in zip(LEVELS, (user_k, rut, period, stamp))))
+
+    def write(self, user: str, df: pd.DataFrame, period: str, scraped_at: datetime = None,
+              sections=None) -> str:
+        """
+        Store df (scrape_all's output, or a page of it) under every RUT it
+        has rows for. sections are the (rut_value, status, doc_type) the
+        scrape read to the end, empty or not (SiiScraper.read_sections):
+        latest() only takes those from this snapshot, and an empty one
+        hides the older rows of its section. Calls sharing scraped_at add
+        to the same partitions. Returns the scraped_at stamp used.
+        """
+        scraped_at = scraped_at or datetime.now(timezone.utc)
+        stamp = scraped_at.astimezone(timezone.utc).strftime(STAMP_FORMAT)
+
+        by_rut = {}
+        if sections is not None:
+            # a RUT with rows but nothing read to the end gets an empty list
+            if df is not None and not df.empty:
+                by_rut = {rut: set() for rut in df["rut_holding"].unique()}
+            for rut, status, doc_type in sections:
+                by_rut.setdefault(rut, set()).add((status, doc_type))
+        for rut, read in by_rut.items():
+            self._add_sections(self._dir(user_key(user), rut, period, stamp), read)
+
+        if df is None or df.empty:
+            return stamp
+        for rut, part in df.groupby("rut_holding", sort=False):
+            folder = self._dir(user_key(user), rut, period, stamp)
+            os.makedirs(folder, exist_ok=True)
+            table = pa.Table.from_pandas(as_text(part).astype(object), schema=SCHEMA,
+                                         preserve_index=False)
+            self._write_table(table, folder)
+        return stamp
+
+    def _add_sections(self, folder: str, sections: set):
+        os.makedirs(folder, exist_ok=True)
+        name = os.path.join(folder, MANIFEST)
+        listed = self._manifest(folder) or set()
+        tmp = name + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(sorted(listed | sections), f)
+        os.replace(tmp, name)
+
+    @staticmethod
+    def _manifest(folder: str) -> set:
+        name = os.path.join(folder, MANIFEST)
+        if not os.path.exists(name):
+            return None
+        with open(name, encoding="utf-8") as f:
+            return {tuple(section) for section in json.load(f)}
+
+    def _write_table(self, table: pa.Table, folder: str) -> str:
+        name = os.path.join(folder, f"part-{uuid.uuid4().hex[:12]}.parquet")
+        tmp = name + ".tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, name)
+        return name
+
+    def partitions(self) -> list:
+        """
+        [({"user", "rut", "period", "scraped_at"}, folder), …] of every
+        snapshot partition on disk.
+        """
+        found = []
+        if not os.path.isdir(self.path):
+            return found
+
+        def walk(folder, depth, values):
+            for entry in sorted(os.listdir(folder)):
+                level, sep, value = entry.partition("=")
+                child = os.path.join(folder, entry)
+                if not sep or level != LEVELS[depth] or not os.path.isdir(child):
+                    continue
+                if depth == len(LEVELS) - 1:
+                    found.append(({**values, level: value}, child))
+                else:
+                    walk(child, depth + 1, {**values, level: value})
+
+        walk(self.path, 0, {})
+        return found
+
+    @staticmethod
+    def _files(folder: str) -> list:
+        return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".parquet"))
+
+    def _read(self, folder: str) -> pd.DataFrame:
+        tables = [pq.read_table(f, schema=SCHEMA) for f in self._files(folder)]
+        if not tables:
+            return pd.DataFrame(columns=HEADERS, dtype=str)
+        return pa.concat_tables(tables).to_pandas()
+
+    def _groups(self, period: str = None) -> dict:
+        """
+        {(user, rut, period): [(scraped_at, folder), …] newest first}.
+        """
+        groups = {}
+        for values, folder in self.partitions():
+            if period and values["period"] != period:
+                continue
+            key = (values["user"], values["rut"], values["period"])
+            groups.setdefault(key, []).append((values["scraped_at"], folder))
+        for snapshots in groups.values():
+            snapshots.sort(reverse=True)
+        return groups
+
+    def _sections(self, folder: str) -> set:
+        listed = self._manifest(folder)
+        if listed is not None:
+            return listed
+        sections = set()
+        for f in self._files(folder):
+            table = pq.read_table(f, columns=SECTION_COLUMNS)
+            sections.update(zip(*(table.column(c).to_pylist() for c in SECTION_COLUMNS)))
+        return sections
+
+    def _current(self, snapshots: list) -> list:
+        """
+        [(folder, sections), …] out of one (user, RUT, period)'s snapshots:
+        the newest one that read each (status, doc_type) section.
+        """
+        seen = set()
+        current = []
+        for _, folder in snapshots:
+            sections = self._sections(folder) - seen
+            if sections:
+                current.append((folder, sections))
+                seen |= sections
+        return current
+
+    def latest(self, period: str = None) -> dict:
+        """
+        {user key: DataFrame} with the most recent rows of every (user,
+        RUT, period, status, doc_type) section, optionally only for one
+        period. A section whose latest read was empty is left out.
+        """
+        frames = {}
+        for (user_k, _, _), snapshots in sorted(self._groups(period).items()):
+            for folder, sections in self._current(snapshots):
+                df = self._read(folder)
+                keep = (df["status"] + "|" + df["doc_type"]).isin({f"{s}|{d}" for s, d in sections})
+                frames.setdefault(user_k, []).append(df[keep])
+        return {user_k: pd.concat(dfs, ignore_index=True) for user_k, dfs in frames.items()}
+
+    def compact(self) -> int:
+        """
+        Merge the part files of every partition (e.g. one per page in
+        streaming runs) into a single file. Returns how many partitions
+        were rewritten.
+        """
+        merged = 0
+        for _, folder in self.partitions():
+            files = self._files(folder)
+            if len(files) < 2:
+                continue
+            table = pa.concat_tables([pq.read_table(f, schema=SCHEMA) for f in files])
+            self._write_table(table, folder)
+            for f in files:
+                os.remove(f)
+            merged += 1
+        return merged
+
+    def prune(self, keep_last: int = 1) -> int:
+        """
+        Drop partitions older than retention_days, always keeping the
+        keep_last newest of every (user, RUT, period) and the ones latest()
+        still reads a section from. Returns how many were removed.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime(STAMP_FORMAT)
+
+        removed = 0
+        for snapshots in self._groups().values():
+            old = [(stamp, folder) for stamp, folder in snapshots[keep_last:] if stamp < cutoff]
+            if not old:
+                continue
+            current = {folder for folder, _ in self._current(snapshots)}
+            for stamp, folder in old:
+                if folder not in current:
+                    shutil.rmtree(folder)
+                    removed += 1
+        self._drop_empty_dirs()
+        return removed
+
+    def _drop_empty_dirs(self):
+        if not os.path.isdir(self.path):
+            return
+        for folder, dirs, files in os.walk(self.path, topdown=False):
+            if folder != self.path and not os.listdir(folder):
+                os.rmdir(folder)
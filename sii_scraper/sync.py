@@ -0,0 +1,126 @@
+import json
+import hashlib
+
+import pandas as pd
+from tqdm import tqdm
+from pymongo import UpdateOne
+
+from .indexes import IDENTITY_KEY
+
+
+# upserts match on the same fields as the unique index ensure_indexes builds
+DEDUPE_KEY = IDENTITY_KEY
+HASH_FIELD = "content_hash"
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def content_hash(data: dict) -> str:
+    """
+    Hash of everything in a cleaned record but its identity, so a revised
+    date_accepted or amount changes it and a re-scraped copy doesn't.
+    """
+    body = {k: v for k, v in data.items() if k not in DEDUPE_KEY and k != HASH_FIELD}
+    raw = json.dumps(body, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _identity(data: dict) -> tuple:
+    return tuple(data.get(k) for k in DEDUPE_KEY)
+
+
+class ChangeDetector:
+    """
+    Stored content hashes of collection, loaded with one query per set of
+    rut_holding values the first time they show up (a scan of the identity
+    index, which leads with rut_holding) and kept up to date as
+    documents are written, so it can be shared by every batch of a user.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.hashes = {}
+        self._loaded = set()
+
+    def preload(self, rut_holdings):
+        missing = sorted(set(rut_holdings) - self._loaded)
+        if not missing:
+            return
+        projection = {k: 1 for k in DEDUPE_KEY}
+        projection[HASH_FIELD] = 1
+        projection["_id"] = 0
+        for doc in self.collection.find({"rut_holding": {"$in": missing}}, projection):
+            self.hashes[_identity(doc)] = doc.get(HASH_FIELD)
+        self._loaded.update(missing)
+
+    def split(self, records: list) -> tuple:
+        """
+        (new, changed, unchanged) records. Every record gets its content
+        hash under HASH_FIELD. Documents synced before hashes existed count
+        as changed once.
+        """
+        self.preload(data["rut_holding"] for data in records)
+
+        new, changed, unchanged = [], [], []
+        for data in records:
+            data[HASH_FIELD] = content_hash(data)
+            identity = _identity(data)
+            if identity not in self.hashes:
+                new.append(data)
+            elif self.hashes[identity] != data[HASH_FIELD]:
+                changed.append(data)
+            else:
+                unchanged.append(data)
+        return new, changed, unchanged
+
+    def written(self, records: list):
+        for data in records:
+            self.hashes[_identity(data)] = data[HASH_FIELD]
+
+
+def build_upserts(records: list) -> list:
+    """
+    One UpdateOne(upsert=True) per record, keyed on DEDUPE_KEY, setting
+    every other field (the content hash included).
+    """
+    ops = []
+    for data in records:
+        filt = {k: data[k] for k in DEDUPE_KEY}
+        fields = {k: v for k, v in data.items() if k not in DEDUPE_KEY}
+        ops.append(UpdateOne(filt, {"$set": fields}, upsert=True))
+    return ops
+
+
+def sync_invoices(collection, df: pd.DataFrame, batch_size: int = 1000,
+                  ordered: bool = False, progress: bool = True,
+                  detector: ChangeDetector = None) -> tuple:
+    """
+    Sync the cleaned invoices in df into collection with batched
+    bulk_write upserts, skipping the ones whose content hash didn't change.
+    Returns (inserted, updated) like the old update_one / insert_one loop
+    did. Pass the same detector to every call of a run to load the stored
+    hashes only once.
+    """
+    if df is None or df.empty:
+        return 0, 0
+
+    if detector is None:
+        detector = ChangeDetector(collection)
+    new, changed, _ = detector.split(df.to_dict("records"))
+
+    inserted = 0
+    updated = 0
+    pending = new + changed
+    with tqdm(total=len(pending), desc="Sicronizando facturas", unit="inv",
+              disable=not progress) as bar:
+        for batch in _chunks(pending, batch_size):
+            result = collection.bulk_write(build_upserts(batch), ordered=ordered)
+            inserted += result.upserted_count
+            updated += result.modified_count
+            detector.written(batch)
+            bar.update(len(batch))
+
+    return inserted, updated
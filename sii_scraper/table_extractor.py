@@ -0,0 +1,239 @@
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import Select
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from .waits import PageWaits
+from .records import Invoice
+
+
+TABLE_SELECTOR = "#tableCompra"
+TABLE_ID = "tableCompra"
+
+# Reads every rendered row of the table in one round trip. For each row we
+# get the trimmed cell texts plus the supplier link (first <a> in the second
+# cell, falling back to the third one like the pending tables need).
+EXTRACT_ROWS_JS = """
+const table = document.querySelector(arguments[0]);
+if (!table) { return []; }
+const rows = [];
+for (const tr of table.querySelectorAll("tbody tr")) {
+    const tds = Array.from(tr.children).filter(el => el.tagName === "TD");
+    if (tds.length < 2 || tr.querySelector("td.dataTables_empty")) {
+        continue;
+    }
+    let link = null;
+    for (const idx of [1, 2]) {
+        if (tds[idx]) {
+            link = tds[idx].querySelector("a");
+            if (link) { break; }
+        }
+    }
+    rows.push({
+        cells: tds.map(td => td.innerText.trim()),
+        link_text: link ? link.innerText.trim() : "",
+        link_title: link ? link.getAttribute("data-original-title") : null,
+    });
+}
+return rows;
+"""
+
+
+# DataTables renders "#<id>_info" and a "#<id>_next" button (an <a> or an
+# <li> wrapping one, depending on the theme). The info text changes on every
+# redraw, so together with the first row it tells us a new page is in.
+PAGE_STATE_JS = """
+const id = arguments[0];
+const info = document.getElementById(id + "_info");
+const first = document.querySelector("#" + id + " tbody tr");
+const next = document.getElementById(id + "_next");
+const disabled = !next
+    || next.classList.contains("disabled")
+    || next.getAttribute("aria-disabled") === "true";
+return {
+    signature: (info ? info.innerText : "") + "|" + (first ? first.innerText : ""),
+    has_next: !disabled,
+};
+"""
+
+NEXT_PAGE_JS = """
+const next = document.getElementById(arguments[0] + "_next");
+const target = next.querySelector("a") || next;
+target.click();
+"""
+
+
+# Every section link (a[ui-sref] inside a table cell) of the resumen or
+# Pendientes summary on screen, with the document count of the next cell.
+SUMMARY_JS = """
+const out = [];
+for (const a of document.querySelectorAll("table td a[ui-sref]")) {
+    const td = a.closest("td");
+    const next = td.nextElementSibling;
+    out.push({
+        label: a.innerText.replace(/\\s+/g, " ").trim(),
+        count: next ? next.innerText.trim() : "",
+    });
+}
+return out;
+"""
+
+
+def extract_summary(driver) -> list:
+    """
+    [{"label": str, "count": str}, …] for the summary table on screen,
+    read in one execute_script call.
+    """
+    return driver.execute_script(SUMMARY_JS) or []
+
+
+def plan_sections(summary: list, sections: list) -> dict:
+    """
+    {(status, doc_type): count} for the sections found in summary. A label
+    matches exactly, or else by containment like the section XPaths do.
+    """
+    plan = {}
+    for label, _, status, doc_type in sections:
+        matches = [s for s in summary if s["label"] == label] or \
+                  [s for s in summary if label in s["label"]]
+        if not matches:
+            continue
+        try:
+            plan[(status, doc_type)] = int(matches[0]["count"].replace(".", "").strip() or 0)
+        except ValueError:
+            # unreadable count: let the section scraper have a look
+            plan[(status, doc_type)] = 1
+    return plan
+
+
+def extract_rows(driver, selector: str = TABLE_SELECTOR) -> list:
+    """
+    Return the rendered rows of selector as
+    [{"cells": [...], "link_text": str, "link_title": str | None}, …]
+    using a single execute_script call.
+    """
+    return driver.execute_script(EXTRACT_ROWS_JS, selector) or []
+
+
+def build_section_row(raw: dict, rut_value: str, status: str, doc_type: str) -> Invoice:
+    """
+    Accepted sections: cells line up with the headers, the supplier cell
+    is split into id + name.
+    """
+    cells = raw["cells"]
+    return Invoice(
+        cells[0],
+        raw["link_text"],
+        raw["link_title"],
+        *cells[2:],
+        rut_value,
+        status,
+        doc_type
+    )
+
+
+def build_pending_row(raw: dict, rut_value: str, status: str, doc_type: str) -> Invoice:
+    """
+    Pending sections have no exento and no tabaco columns (blank / 0
+    here), and for anything but credit notes an extra leading column.
+    Their date_accepted column holds the reception date.
+    """
+    cells = raw["cells"]
+    offset = 0 if doc_type == "credit_note" else 1
+    return Invoice(
+        cells[offset],
+        raw["link_text"],
+        raw["link_title"],
+        *cells[offset + 2:offset + 6],
+        "",
+        *cells[offset + 6:-1],
+        0,
+        0,
+        0,
+        cells[-1],
+        rut_value,
+        status,
+        doc_type
+    )
+
+
+class TableExtractor:
+    """
+    Reads #tableCompra in one script execution and shapes every row into
+    an Invoice of the 28 column layout scrape_all uses.
+    """
+
+    def __init__(self, driver, selector: str = TABLE_SELECTOR, table_id: str = TABLE_ID,
+                 metrics=None, waits: PageWaits = None):
+        self.driver = driver
+        self.selector = selector
+        self.table_id = table_id
+        self.metrics = metrics
+        self.waits = waits if waits is not None else PageWaits(driver)
+
+    def use_largest_page_length(self, wait):
+        """
+        Pick the biggest entry of the DataTables length selector ("-1"
+        means "all") so we need as few pages as possible.
+        """
+        length_sel = wait.until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, f"select[name='{self.table_id}_length']"))
+        )
+        self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", length_sel)
+
+        select = Select(length_sel)
+        values = []
+        for opt in select.options:
+            try:
+                values.append(int(opt.get_attribute("value")))
+            except (TypeError, ValueError):
+                continue
+        if not values:
+            return
+        largest = -1 if -1 in values else max(values)
+        select.select_by_value(str(largest))
+
+    def _page_state(self) -> dict:
+        return self.driver.execute_script(PAGE_STATE_JS, self.table_id)
+
+    def iter_pages(self, wait, build_row, rut_value: str, status: str, doc_type: str,
+                   expected: int = None):
+        """
+        Yield the shaped rows of every DataTables page, one page at a time,
+        and warn when the total doesn't match the expected count.
+        """
+        self.waits.min_count(f"{self.selector} tbody tr", 1, timeout=wait._timeout)
+
+        total = 0
+        while True:
+            started = time.perf_counter()
+            page = self.rows(build_row, rut_value, status, doc_type)
+            total += len(page)
+            if self.metrics is not None:
+                self.metrics.observe("extract", time.perf_counter() - started)
+                self.metrics.inc("pages")
+                self.metrics.inc("rows_extracted", len(page))
+            yield page
+
+            state = self._page_state()
+            if not state["has_next"] or (expected is not None and total >= expected):
+                break
+
+            self.driver.execute_script(NEXT_PAGE_JS, self.table_id)
+            try:
+                self.waits.page_changed(self.table_id, state["signature"], timeout=wait._timeout)
+            except TimeoutException:
+                # the caller retries the section, skipping the pages already read
+                print(f"→ Next page of {status} - {doc_type} for RUT {rut_value} never loaded.")
+                raise
+
+        if expected is not None and total != expected:
+            print(f"→ Read {total} {status} - {doc_type} rows for RUT {rut_value}, expected {expected}.")
+
+    def rows(self, build_row, rut_value: str, status: str, doc_type: str) -> list:
+        return [
+            build_row(raw, rut_value, status, doc_type)
+            for raw in extract_rows(self.driver, self.selector)
+        ]
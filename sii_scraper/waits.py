@@ -0,0 +1,119 @@
+import time
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+
+
+# One async script per wait: check the condition right away and, if it
+# doesn't hold yet, re-check it on every DOM mutation (the SII spinner and
+# modals toggle a style / class, the tables re-render their rows) until it
+# does or the timeout runs out. A slow interval covers changes that only
+# show up in computed styles. Conditions are named instead of passed as
+# source so the page's CSP never has to allow eval.
+WAIT_JS = """
+const [name, args, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+
+const visible = el => !!el && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+const byXPath = xpath => document.evaluate(
+    xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const find = a => a.xpath ? byXPath(a.xpath) : document.querySelector(a.css);
+const dialogClosed = () => !visible(document.getElementById("esperaDialog"));
+const noBackdrop = () => !Array.from(document.querySelectorAll("div.modal-backdrop")).some(visible);
+
+const conditions = {
+    dialog_closed: dialogClosed,
+    no_backdrop: noBackdrop,
+    idle: () => dialogClosed() && noBackdrop(),
+    present: a => find(a) || false,
+    clickable: a => {
+        const el = find(a);
+        return visible(el) && !el.disabled ? el : false;
+    },
+    min_count: a => document.querySelectorAll(a.css).length >= a.count,
+    page_changed: a => {
+        const info = document.getElementById(a.table_id + "_info");
+        const first = document.querySelector("#" + a.table_id + " tbody tr");
+        const signature = (info ? info.innerText : "") + "|" + (first ? first.innerText : "");
+        return signature !== a.signature;
+    },
+};
+
+const check = () => {
+    try { return conditions[name](args); } catch (e) { return false; }
+};
+
+const first = check();
+if (first) { done(first); return; }
+
+let finished = false;
+const finish = value => {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    clearInterval(poll);
+    clearTimeout(timer);
+    done(value);
+};
+const recheck = () => { const value = check(); if (value) { finish(value); } };
+const observer = new MutationObserver(recheck);
+observer.observe(document.documentElement,
+                 {subtree: true, childList: true, attributes: true, characterData: true});
+const poll = setInterval(recheck, 250);
+const timer = setTimeout(() => finish(false), timeoutMs);
+"""
+
+# the page-side timer is what times out, this only has to be longer
+SCRIPT_TIMEOUT = 600
+
+
+class PageWaits:
+    """
+    Waits that are signalled by the page instead of polled over WebDriver.
+    Each one is a single execute_async_script round trip that returns as
+    soon as the condition holds. Raises TimeoutException like WebDriverWait.
+    A wait started while the page is still navigating (right after a click
+    on a link) is unloaded with it; it's started again on the new page.
+    """
+
+    def __init__(self, driver, timeout: float = 10):
+        self.driver = driver
+        self.timeout = timeout
+        driver.set_script_timeout(SCRIPT_TIMEOUT)
+
+    def until(self, name: str, timeout: float = None, message: str = "", **args):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            try:
+                result = self.driver.execute_async_script(WAIT_JS, name, args, int(remaining * 1000))
+                break
+            except JavascriptException as e:
+                # "document unloaded while waiting for result"
+                if time.monotonic() >= deadline:
+                    raise TimeoutException(message or f"{name} {args} not met after {timeout}s: {e.msg}")
+                time.sleep(0.1)
+        if not result:
+            raise TimeoutException(message or f"{name} {args} not met after {timeout}s")
+        return result
+
+    def dialog_closed(self, timeout: float = None):
+        self.until("dialog_closed", timeout, "esperaDialog still open")
+
+    def no_backdrop(self, timeout: float = None):
+        self.until("no_backdrop", timeout, "modal backdrop still open")
+
+    def present(self, xpath: str = None, css: str = None, timeout: float = None):
+        return self.until("present", timeout, xpath=xpath, css=css)
+
+    def clickable(self, xpath: str = None, css: str = None, timeout: float = None):
+        """
+        The first visible, enabled element matching xpath or css.
+        """
+        return self.until("clickable", timeout, xpath=xpath, css=css)
+
+    def min_count(self, css: str, count: int, timeout: float = None):
+        self.until("min_count", timeout, css=css, count=count)
+
+    def page_changed(self, table_id: str, signature: str, timeout: float = None):
+        self.until("page_changed", timeout, table_id=table_id, signature=signature)
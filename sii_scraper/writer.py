@@ -0,0 +1,282 @@
+import os
+import time
+import queue
+import threading
+
+import pandas as pd
+from pymongo.errors import AutoReconnect
+
+from .sync import ChangeDetector, build_upserts
+from .metrics import Metrics
+
+
+SINK_MAX_DELAY = float(os.getenv("SII_SINK_MAX_DELAY", "2"))
+SINK_MAX_PENDING = int(os.getenv("SII_SINK_MAX_PENDING", "4"))
+SINK_WRITERS = int(os.getenv("SII_SINK_WRITERS", "2"))
+# bulk_write is retried on dropped connections / elections, upserts are idempotent
+SINK_RETRIES = 3
+
+_STOP = object()
+
+
+class SinkError(RuntimeError):
+    pass
+
+
+class WriteBehindSink:
+    """
+    Takes cleaned invoices from the scraping side and upserts them into
+    collection from background threads, so the caller never waits on Mongo
+    unless Mongo falls behind.
+
+    Documents are written in batches of batch_size, or whatever is buffered
+    once the oldest of it waited max_delay seconds. At most max_pending
+    full batches wait for a writer; past that submit() blocks until one is
+    written (backpressure, instead of buffering a whole backlog in memory).
+    Unchanged documents are skipped like in sync_invoices.
+
+    after_written() runs a callback once everything submitted before it is
+    in Mongo, which is when checkpoints can be marked. A failed batch holds
+    back every later callback, so nothing after it is marked as synced.
+    """
+
+    def __init__(self, collection, batch_size: int = 1000, max_delay: float = SINK_MAX_DELAY,
+                 max_pending: int = SINK_MAX_PENDING, writers: int = SINK_WRITERS,
+                 detector: ChangeDetector = None, metrics: Metrics = None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.writers = max(1, writers)
+        self.detector = detector if detector is not None else ChangeDetector(collection)
+        self.metrics = metrics if metrics is not None else Metrics()
+
+        self._batches = queue.Queue(maxsize=max(1, max_pending))
+        self._lock = threading.Lock()
+        self._settled_cond = threading.Condition(self._lock)
+        self._buffer = []
+        self._buffer_since = None
+        self._seq = 0            # batches cut so far, numbered from 1
+        self._finished = set()   # written batches past _done_upto
+        self._done_upto = 0      # every batch up to this one is written
+        self._settled = 0        # written or failed
+        self._callbacks = []     # (seq, fn), run once _done_upto reaches seq
+        self._errors = []
+        self._threads = []
+
+        self.submitted = 0
+        self.skipped = 0
+        self.batches = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.blocked_s = 0.0
+        self.max_queued = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self) -> "WriteBehindSink":
+        for i in range(self.writers - len(self._threads)):
+            t = threading.Thread(target=self._writer, name=f"sii-sink-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    @property
+    def broken(self) -> bool:
+        """
+        A batch (or a callback) failed for good. Nothing submitted from now
+        on would be marked as synced, see after_written().
+        """
+        return bool(self._errors)
+
+    def _raise_if_failed(self):
+        if self._errors:
+            raise SinkError("writing to Mongo failed") from self._errors[0]
+
+    def submit(self, df: pd.DataFrame):
+        """
+        Queue the cleaned invoices of df. Returns right away unless
+        max_pending batches are already waiting for Mongo.
+        """
+        self._raise_if_failed()
+        if df is None or df.empty:
+            return
+
+        new, changed, unchanged = self.detector.split(df.to_dict("records"))
+        with self._lock:
+            self.skipped += len(unchanged)
+            self.submitted += len(new) + len(changed)
+            self._buffer.extend(new)
+            self._buffer.extend(changed)
+            if self._buffer and self._buffer_since is None:
+                self._buffer_since = time.monotonic()
+            batches = self._cut(full_only=True)
+
+        for batch in batches:
+            self._enqueue(batch)
+
+    def after_written(self, fn):
+        """
+        Call fn (from a writer thread) once every document submitted so far
+        is written, or right away if it already is.
+        """
+        with self._lock:
+            # what's buffered goes out in the very next batch
+            seq = self._seq + (1 if self._buffer else 0)
+            if self._done_upto < seq:
+                self._callbacks.append((seq, fn))
+                return
+        fn()
+
+    def flush(self, timeout: float = None):
+        """
+        Send what's buffered and wait for every batch to be written. Raises
+        SinkError if any of them failed.
+        """
+        with self._lock:
+            batches = self._cut(full_only=False)
+        for batch in batches:
+            self._enqueue(batch)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._settled_cond:
+            while self._settled < self._seq:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise SinkError(f"{self._seq - self._settled} batches still unwritten after {timeout}s")
+                self._settled_cond.wait(remaining)
+        self._raise_if_failed()
+
+    def close(self) -> dict:
+        """
+        Flush, stop the writers and return report(). Errors are in the
+        report instead of raised, the caller decides what they mean.
+        """
+        try:
+            self.flush()
+        except SinkError:
+            pass
+        for _ in self._threads:
+            self._batches.put(_STOP)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        return self.report()
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "skipped_unchanged": self.skipped,
+                "batches": self.batches,
+                "inserted": self.inserted,
+                "updated": self.updated,
+                "failed": self.failed,
+                "blocked_s": round(self.blocked_s, 3),
+                "max_queued_batches": self.max_queued,
+                "errors": [f"{type(e).__name__}: {e}" for e in self._errors],
+            }
+
+    def _cut(self, full_only: bool) -> list:
+        # caller holds the lock
+        batches = []
+        while len(self._buffer) >= self.batch_size or (not full_only and self._buffer):
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._seq += 1
+            batches.append((self._seq, batch))
+        if not self._buffer:
+            self._buffer_since = None
+        return batches
+
+    def _enqueue(self, item):
+        try:
+            self._batches.put_nowait(item)
+        except queue.Full:
+            # Mongo is behind: hold the producer here until a writer frees a slot
+            started = time.perf_counter()
+            while True:
+                self._raise_if_failed()
+                try:
+                    self._batches.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            waited = time.perf_counter() - started
+            self.metrics.observe("sink_backpressure", waited)
+            with self._lock:
+                self.blocked_s += waited
+        with self._lock:
+            self.max_queued = max(self.max_queued, self._batches.qsize())
+
+    def _stale_batch(self):
+        with self._lock:
+            if self._buffer_since is None or time.monotonic() - self._buffer_since < self.max_delay:
+                return None
+            batches = self._cut(full_only=False)
+        return batches[0] if batches else None
+
+    def _writer(self):
+        while True:
+            try:
+                item = self._batches.get(timeout=self.max_delay / 2)
+            except queue.Empty:
+                # nothing full came in for a while, write what's buffered
+                item = self._stale_batch()
+                if item is None:
+                    continue
+            if item is _STOP:
+                return
+            self._write(*item)
+
+    def _write(self, seq: int, batch: list):
+        started = time.perf_counter()
+        try:
+            for attempt in range(SINK_RETRIES):
+                try:
+                    result = self.collection.bulk_write(build_upserts(batch), ordered=False)
+                    break
+                except AutoReconnect:
+                    if attempt == SINK_RETRIES - 1:
+                        raise
+                    time.sleep(2 ** attempt)
+        except Exception as e:
+            # not only Mongo: a value bson can't encode fails the batch the
+            # same way, the writer thread has to live on and settle it
+            print(f"→ Couldn't write {len(batch)} invoices to Mongo: {type(e).__name__}: {e}")
+            with self._settled_cond:
+                self._errors.append(e)
+                self.failed += len(batch)
+                self._settled += 1
+                self._settled_cond.notify_all()
+            return
+
+        self.detector.written(batch)
+        self.metrics.observe("sync", time.perf_counter() - started)
+        self.metrics.inc("rows_synced", len(batch))
+        self.metrics.inc("inserted", result.upserted_count)
+        self.metrics.inc("updated", result.modified_count)
+
+        with self._settled_cond:
+            self.batches += 1
+            self.inserted += result.upserted_count
+            self.updated += result.modified_count
+            self._finished.add(seq)
+            while self._done_upto + 1 in self._finished:
+                self._done_upto += 1
+                self._finished.remove(self._done_upto)
+            ready = [fn for s, fn in self._callbacks if s <= self._done_upto]
+            self._callbacks = [(s, fn) for s, fn in self._callbacks if s > self._done_upto]
+            self._settled += 1
+            self._settled_cond.notify_all()
+
+        for fn in ready:
+            try:
+                fn()
+            except Exception as e:
+                print(f"→ Callback after write failed: {type(e).__name__}: {e}")
+                with self._lock:
+                    self._errors.append(e)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# run from anywhere, the package lives next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+from sii_scraper.backend import detail_to_row
+from sii_scraper.records import HEADERS
+from sii_scraper.table_extractor import build_pending_row, build_section_row
+
+
+def values(invoice) -> dict:
+    return {name: getattr(invoice, name) for name in HEADERS}
+
+
+def test_pending_detail_matches_pending_table_row():
+    item = {
+        "detTipoTransaccion": "1", "detRutDoc": "76123456", "detDvDoc": "7",
+        "detRznSoc": "Proveedor SpA", "detNroDoc": "1234", "detFchDoc": "02/05/2026",
+        "detFecRecepcion": "03/05/2026 10:15:00", "detEventoReceptor": "",
+        "detMntExe": 500, "detMntNeto": 1000, "detMntIVA": 190, "detMntOtrosImp": 0,
+        "detMntIVANoRec": 0, "detCodIVANoRec": "", "detMntTotal": 1190,
+        "detMntActFijo": 0, "detMntIVAActFijo": 0, "detIVAUsoComun": 0,
+        "detImpSinCredito": 0, "detIVANoRetenido": 0, "detTipoDocRef": "", "detFolioDocRef": "",
+        "detTabPuros": 0, "detTabCigarrillos": 0, "detTabElaborados": 0,
+        "detNcNdFactCompra": "",
+    }
+    # what the Pendientes table shows for the same document (credit notes
+    # have no leading column): no exento, no tabaco columns
+    raw = {
+        "cells": ["1", "76123456-7", "1234", "02/05/2026", "03/05/2026 10:15:00", "",
+                  "1.000", "190", "0", "0", "", "1.190", "0", "0", "0", "0", "0", "", "", ""],
+        "link_text": "76123456-7",
+        "link_title": "Proveedor SpA",
+    }
+
+    backend = detail_to_row(item, "77777777-7", "pending", "credit_note")
+    table = build_pending_row(raw, "77777777-7", "pending", "credit_note")
+
+    assert values(backend) == values(table)
+    assert backend.date_accepted is not None
+    assert backend.exent_total == 0
+
+
+def test_accepted_detail_matches_section_table_row():
+    item = {
+        "detTipoTransaccion": "Del Giro", "detRutDoc": "76123456", "detDvDoc": "7",
+        "detRznSoc": "Proveedor SpA", "detNroDoc": "99", "detFchDoc": "02/05/2026",
+        "detFecRecepcion": "03/05/2026 10:15:00", "detEventoReceptor": "P",
+        "detMntExe": 0, "detMntNeto": 1000000, "detMntIVA": 190000, "detMntOtrosImp": 0,
+        "detMntIVANoRec": 0, "detCodIVANoRec": "", "detMntTotal": 1190000,
+        "detMntActFijo": 0, "detMntIVAActFijo": 0, "detIVAUsoComun": 0,
+        "detImpSinCredito": 0, "detIVANoRetenido": 0, "detTipoDocRef": "", "detFolioDocRef": "",
+        "detTabPuros": 0, "detTabCigarrillos": 0, "detTabElaborados": 0,
+        "detNcNdFactCompra": "",
+    }
+    raw = {
+        "cells": ["Del Giro", "76123456-7", "99", "02/05/2026", "03/05/2026 10:15:00", "P",
+                  "0", "1.000.000", "190.000", "0", "0", "", "1.190.000", "0", "0", "0", "0",
+                  "0", "", "", "0", "0", "0", ""],
+        "link_text": "76123456-7",
+        "link_title": "Proveedor SpA",
+    }
+
+    backend = detail_to_row(item, "77777777-7", "accepted", "invoice")
+    table = build_section_row(raw, "77777777-7", "accepted", "invoice")
+
+    assert values(backend) == values(table)
+    assert backend.total == 1190000
@@ -0,0 +1,33 @@
+import queue
+
+from sii_scraper import backfill
+from sii_scraper.backfill import _scrape_work
+
+
+class BrokenScraper:
+    """
+    Yields the first period of work, then the browser dies.
+    """
+
+    def __init__(self, user, pwd, **kwargs):
+        pass
+
+    def iter_periods(self, work):
+        rut_value, year, month = work[0]
+        yield rut_value, year, month, [], None
+        raise RuntimeError("chrome crashed")
+
+
+def test_scrape_work_reports_each_period_once_when_failing_partway(monkeypatch):
+    monkeypatch.setattr(backfill, "SiiScraper", BrokenScraper)
+    work = [("76123456-7", 2026, 1), ("76123456-7", 2026, 2), ("76123456-7", 2026, 3)]
+    results = queue.Queue()
+
+    _scrape_work("a", "pa", work, results, {})
+
+    got = []
+    while not results.empty():
+        got.append(results.get_nowait())
+    assert [(r.rut_value, r.year, r.month) for r in got] == work
+    assert got[0].error is None
+    assert all(r.error == "RuntimeError: chrome crashed" for r in got[1:])
@@ -0,0 +1,57 @@
+import time
+import threading
+
+from sii_scraper import browser
+from sii_scraper.browser import BrowserPool
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+def test_concurrent_acquires_never_start_more_than_size(monkeypatch):
+    def slow_driver(headless):
+        time.sleep(0.05)
+        return FakeDriver()
+
+    monkeypatch.setattr(browser, "new_driver", slow_driver)
+    monkeypatch.setattr(browser, "reset_driver", lambda driver: None)
+    pool = BrowserPool(size=2)
+    drivers = []
+
+    def user():
+        driver = pool.acquire(timeout=5)
+        drivers.append(driver)
+        time.sleep(0.05)
+        pool.release(driver)
+
+    threads = [threading.Thread(target=user) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(drivers) == 6
+    assert pool.report()["started"] == 2
+    assert len({id(d) for d in drivers}) == 2
+
+
+def test_failed_start_gives_its_slot_back(monkeypatch):
+    calls = []
+
+    def flaky_driver(headless):
+        calls.append(headless)
+        if len(calls) == 1:
+            raise RuntimeError("chrome didn't start")
+        return FakeDriver()
+
+    monkeypatch.setattr(browser, "new_driver", flaky_driver)
+    pool = BrowserPool(size=1)
+
+    try:
+        pool.acquire(timeout=1)
+    except RuntimeError:
+        pass
+
+    assert isinstance(pool.acquire(timeout=1), FakeDriver)
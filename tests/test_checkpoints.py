@@ -0,0 +1,24 @@
+from sii_scraper.checkpoints import CheckpointStore
+
+
+def test_finished_run_is_not_resumed(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    first = CheckpointStore(path).start()
+    first.mark_user("a")
+    first.finish()
+
+    second = CheckpointStore(path).start()
+    assert second.run_id != first.run_id
+    assert second.users_done() == set()
+
+
+def test_unfinished_run_is_resumed(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    first = CheckpointStore(path).start()
+    first.mark_user("a")
+    first.mark_section("b", "76123456-7", "202605", "accepted", "invoice")
+
+    second = CheckpointStore(path).start()
+    assert second.run_id == first.run_id
+    assert second.users_done() == {"a"}
+    assert second.sections_done("b") == {"76123456-7|202605|accepted|invoice"}
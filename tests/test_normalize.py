@@ -0,0 +1,64 @@
+import pandas as pd
+
+from sii_scraper.normalize import CLEAN_COLUMNS, clean_and_normalize
+from sii_scraper.records import HEADERS
+
+
+def scraped(**columns) -> pd.DataFrame:
+    rows = len(next(iter(columns.values())))
+    df = pd.DataFrame({col: [""] * rows for col in HEADERS})
+    for col, values in columns.items():
+        df[col] = values
+    return df
+
+
+def test_repeated_hour_of_the_april_change_is_read_as_standard_time():
+    # 2024-04-07 00:00 -03 went back to 2024-04-06 23:00 -04
+    df = scraped(date=["06/04/2024"], date_accepted=["06/04/2024 23:30:00"])
+
+    out = clean_and_normalize(df)
+
+    assert out["date_accepted"][0] == pd.Timestamp("2024-04-07 03:30", tz="UTC")
+
+
+def test_skipped_hour_of_the_september_change_is_shifted_forward():
+    # 2024-09-08 00:00 -04 jumped to 01:00 -03, midnight itself doesn't exist
+    df = scraped(date=["08/09/2024"], date_accepted=["08/09/2024 00:30:00"])
+
+    out = clean_and_normalize(df)
+
+    assert out["date"][0] == pd.Timestamp("2024-09-08 04:00", tz="UTC")
+    assert out["date_accepted"][0] == pd.Timestamp("2024-09-08 04:00", tz="UTC")
+
+
+def test_pending_rows_without_date_accepted_stay_empty():
+    df = scraped(date=["15/01/2024", "15/01/2024"], date_accepted=["15/01/2024 12:00:00", ""])
+
+    out = clean_and_normalize(df)
+
+    assert out["date_accepted"][0] == pd.Timestamp("2024-01-15 15:00", tz="UTC")
+    assert pd.isna(out["date_accepted"][1])
+
+
+def test_ids_categories_and_amounts_are_cleaned():
+    df = scraped(
+        supplier_id=["76.123.456-k", "76.123.456-k"],
+        supplier_name=["Arrocera S.A.", "Molino Ltda."],
+        date=["15/01/2024", "15/01/2024"],
+        date_accepted=["15/01/2024 12:00:00", "15/01/2024 12:00:00"],
+        type=["P.", "C"],
+        net_total=["1.234.567", ""],
+        total=["1.469.135", "0"],
+        status=["Accepted", "accepted"],
+        doc_type=["invoice", "credit_note"],
+    )
+
+    out = clean_and_normalize(df)
+
+    assert list(out.columns) == CLEAN_COLUMNS
+    assert out["supplier_id"].tolist() == ["76123456-K", "76123456-K"]
+    assert out["supplier_name"].tolist() == ["arrocera sa", "molino ltda"]
+    assert out["type"].tolist() == ["contado", ""]
+    assert out["status"].tolist() == ["accepted", "accepted"]
+    assert out["net_total"].tolist() == [1234567, 0]
+    assert out["total"].dtype == "int64"
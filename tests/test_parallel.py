@@ -0,0 +1,32 @@
+from sii_scraper import parallel
+from sii_scraper.fingerprints import FingerprintStore
+from sii_scraper.parallel import scrape_users_parallel
+
+
+class FakeScraper:
+    """
+    Stands in for SiiScraper in the worker processes (forked, so the
+    monkeypatch is inherited): reports how many fingerprints it was given.
+    """
+
+    def __init__(self, user, pwd, driver=None, fingerprints=None, metrics=None, **kwargs):
+        self.seen_fingerprints = {f"{user}|seen": str(len(fingerprints))}
+        self.failures = []
+        self.read_sections = set()
+
+    def scrape_all(self):
+        return None
+
+
+def test_scrape_users_parallel_with_fingerprint_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel, "SiiScraper", FakeScraper)
+    store = FingerprintStore(str(tmp_path))
+    store.save("a", {"rut|202605|accepted|invoice": "3|1.000"})
+
+    results = {r.user: r for r in scrape_users_parallel(
+        {"a": "pa", "b": "pb"}, max_workers=2, fingerprint_store=store)}
+
+    assert results["a"].error is None
+    assert results["b"].error is None
+    assert results["a"].fingerprints == {"a|seen": "1"}
+    assert results["b"].fingerprints == {"b|seen": "0"}
@@ -0,0 +1,65 @@
+import pytest
+
+from sii_scraper.pipeline import PipelineError, StreamPipeline
+from sii_scraper.records import HEADERS, Invoice
+from sii_scraper.sii_scraper import RowChunk
+
+
+def page(status: str, rows: int = 2) -> RowChunk:
+    return RowChunk("76123456-7", status, "invoice", [Invoice(*[""] * len(HEADERS))] * rows)
+
+
+def done(status: str) -> RowChunk:
+    return RowChunk("76123456-7", status, "invoice", [], done=True)
+
+
+def test_sections_are_reported_after_their_pages_are_synced():
+    events = []
+
+    def sink(df):
+        events.append(("sink", len(df)))
+        return len(df), 0
+
+    pipeline = StreamPipeline(lambda df: df, sink,
+                              on_section=lambda chunk: events.append(("done", chunk.status)))
+
+    result = pipeline.run([page("accepted"), page("accepted"), done("accepted"), done("pending")])
+
+    assert events == [("sink", 2), ("sink", 2), ("done", "accepted"), ("done", "pending")]
+    assert result == {"rows": 4, "inserted": 4, "updated": 0}
+
+
+def test_a_failing_stage_stops_the_scrape_and_is_raised():
+    closed = []
+
+    def chunks():
+        try:
+            for _ in range(1000):
+                yield page("accepted")
+        finally:
+            closed.append(True)
+
+    def normalize(df):
+        raise ValueError("bad date")
+
+    pipeline = StreamPipeline(normalize, lambda df: (len(df), 0), queue_size=1)
+
+    with pytest.raises(PipelineError) as failed:
+        pipeline.run(chunks())
+
+    assert isinstance(failed.value.__cause__, ValueError)
+    assert closed == [True]
+
+
+def test_no_section_is_reported_after_the_sink_failed():
+    sections = []
+
+    def sink(df):
+        raise RuntimeError("mongo down")
+
+    pipeline = StreamPipeline(lambda df: df, sink, on_section=sections.append)
+
+    with pytest.raises(PipelineError):
+        pipeline.run([page("accepted"), done("accepted")])
+
+    assert sections == []
@@ -0,0 +1,50 @@
+from cryptography.fernet import Fernet
+from selenium.common.exceptions import JavascriptException
+
+from sii_scraper.metrics import Metrics
+from sii_scraper.resilience import CircuitBreaker
+from sii_scraper.session_cache import SessionCache
+from sii_scraper.sii_scraper import SiiScraper
+
+
+class Driver:
+    current_url = "https://www4.sii.cl/consdcvinternetui/"
+
+    def __init__(self):
+        self.cdp = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp.append(cmd)
+        return {"cookies": []}
+
+    def get(self, url):
+        pass
+
+
+class RedirectingWaits:
+    def min_count(self, css, count, timeout=None):
+        raise JavascriptException("javascript error: document unloaded while waiting for result")
+
+
+def scraper(cache: SessionCache) -> SiiScraper:
+    s = object.__new__(SiiScraper)
+    s.user, s.use_certificate, s.session_cache = "a", False, cache
+    s.driver, s.waits = Driver(), RedirectingWaits()
+    s.metrics, s.breaker = Metrics(), CircuitBreaker()
+    s.logins = 0
+    s.login_and_navigate = lambda: setattr(s, "logins", s.logins + 1)
+    s._wait_rut_options = lambda: None
+    return s
+
+
+def test_rejected_session_falls_back_to_a_fresh_login(tmp_path):
+    cache = SessionCache(Fernet.generate_key(), path=str(tmp_path))
+    cache.save("a", [{"name": "TOKEN", "value": "old"}], "https://www4.sii.cl/consdcvinternetui/")
+    s = scraper(cache)
+
+    s._login()
+
+    assert s.logins == 1
+    assert "Network.clearBrowserCookies" in s.driver.cdp
+    # the bad entry was replaced by the session of the fresh login
+    assert cache.load("a")["cookies"] == []
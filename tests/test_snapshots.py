@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+
+from sii_scraper.records import invoice_frame, Invoice, HEADERS
+from sii_scraper.snapshots import SnapshotCache, user_key
+
+
+def rows(number: str, status: str, doc_type: str, rut: str = "76123456-7") -> list:
+    values = dict.fromkeys(HEADERS, "")
+    values.update(number=number, date="01/05/2026", rut_holding=rut, status=status, doc_type=doc_type)
+    for field in ("exent_total", "net_total", "iva", "total"):
+        values[field] = "0"
+    return [Invoice(*(values[h] for h in HEADERS))]
+
+
+def test_latest_takes_each_section_from_its_newest_snapshot(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    before = datetime(2026, 5, 10, tzinfo=timezone.utc)
+    full = rows("1", "accepted", "invoice") + rows("2", "pending", "invoice")
+    cache.write("a", invoice_frame(full), "202605", before)
+    # a later scrape that only re-read the accepted invoices
+    cache.write("a", invoice_frame(rows("3", "accepted", "invoice")), "202605",
+                before + timedelta(hours=4))
+
+    df = cache.latest("202605")[user_key("a")]
+
+    assert sorted(zip(df["number"], df["status"])) == [("2", "pending"), ("3", "accepted")]
+
+
+def test_prune_keeps_snapshots_latest_still_reads(tmp_path):
+    cache = SnapshotCache(str(tmp_path), retention_days=1)
+    old = datetime.now(timezone.utc) - timedelta(days=10)
+    cache.write("a", invoice_frame(rows("1", "pending", "invoice")), "202605", old)
+    cache.write("a", invoice_frame(rows("2", "accepted", "invoice")), "202605", old + timedelta(days=1))
+    cache.write("a", invoice_frame(rows("3", "accepted", "invoice")), "202605", old + timedelta(days=2))
+
+    assert cache.prune() == 1
+    df = cache.latest()[user_key("a")]
+    assert sorted(df["number"]) == ["1", "3"]
+
+
+def test_empty_read_hides_older_rows_of_its_section(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    rut = "76123456-7"
+    before = datetime(2026, 5, 10, tzinfo=timezone.utc)
+    cache.write("a", invoice_frame(rows("1", "pending", "invoice")), "202605", before,
+                sections=[(rut, "pending", "invoice"), (rut, "accepted", "invoice")])
+    # the invoice got accepted: the pending section was read and came out empty
+    cache.write("a", invoice_frame(rows("1", "accepted", "invoice")), "202605",
+                before + timedelta(hours=4),
+                sections=[(rut, "pending", "invoice"), (rut, "accepted", "invoice")])
+
+    df = cache.latest("202605")[user_key("a")]
+
+    assert list(zip(df["number"], df["status"])) == [("1", "accepted")]
+
+
+def test_rows_of_sections_not_read_to_the_end_are_not_replayed(tmp_path):
+    cache = SnapshotCache(str(tmp_path))
+    rut = "76123456-7"
+    before = datetime(2026, 5, 10, tzinfo=timezone.utc)
+    cache.write("a", invoice_frame(rows("1", "pending", "invoice") + rows("2", "pending", "invoice")),
+                "202605", before, sections=[(rut, "pending", "invoice")])
+    # a later scrape whose pending section failed after its first page
+    cache.write("a", invoice_frame(rows("3", "pending", "invoice")), "202605",
+                before + timedelta(hours=4), sections=[])
+
+    df = cache.latest("202605")[user_key("a")]
+
+    assert sorted(df["number"]) == ["1", "2"]
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import PyMongoError
+
+from sii_scraper.indexes import IDENTITY_INDEX, ensure_indexes
+from sii_scraper.sync import HASH_FIELD, ChangeDetector, build_upserts, content_hash
+
+# a throwaway mongod, e.g. docker run -p 27017:27017 mongo
+MONGODB_TEST_URI = os.getenv("MONGODB_TEST_URI")
+
+
+def _stages(plan: dict):
+    yield plan
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+@pytest.fixture
+def collection():
+    if not MONGODB_TEST_URI:
+        pytest.skip("MONGODB_TEST_URI not set")
+    client = MongoClient(MONGODB_TEST_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"no MongoDB at MONGODB_TEST_URI: {e}")
+    coll = client.sii_scraper_tests.invoices_supplier
+    coll.drop()
+    yield coll
+    coll.drop()
+    client.close()
+
+
+def test_preload_query_uses_identity_index(collection):
+    ensure_indexes(collection)
+    collection.insert_many([
+        {"rut_holding": f"7612345{i % 3}-7", "doc_type": "invoice", "supplier_id": "1-9",
+         "number": str(i), "content_hash": "x"}
+        for i in range(30)
+    ])
+    detector = ChangeDetector(collection)
+    projection = {"_id": 0, "rut_holding": 1, "doc_type": 1, "supplier_id": 1, "number": 1,
+                  "content_hash": 1}
+
+    plan = collection.find({"rut_holding": {"$in": ["76123450-7"]}}, projection).explain()
+    stages = list(_stages(plan["queryPlanner"]["winningPlan"]))
+
+    assert not [s for s in stages if s.get("stage") == "COLLSCAN"]
+    assert [s for s in stages if s.get("stage") == "IXSCAN" and s.get("indexName") == IDENTITY_INDEX]
+
+    detector.preload(["76123450-7"])
+    assert len(detector.hashes) == 10
+
+
+class StoredCollection:
+    """
+    find() over a fixed list of stored documents, counting the queries.
+    """
+
+    def __init__(self, docs: list):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        ruts = query["rut_holding"]["$in"]
+        return [dict(doc) for doc in self.docs if doc["rut_holding"] in ruts]
+
+
+def invoice(number: str, total: int = 100, **fields) -> dict:
+    return {"rut_holding": "76123456-7", "doc_type": "invoice", "supplier_id": "1-9",
+            "number": number, "total": total, **fields}
+
+
+def test_content_hash_ignores_identity_and_the_stored_hash():
+    data = invoice("1")
+
+    assert content_hash(data) == content_hash({**data, "number": "2", HASH_FIELD: "old"})
+    assert content_hash(data) != content_hash({**data, "total": 101})
+
+
+def test_split_sorts_records_by_their_stored_hash():
+    stored = [
+        {**invoice("1"), HASH_FIELD: content_hash(invoice("1"))},
+        {**invoice("2"), HASH_FIELD: content_hash(invoice("2"))},
+        # synced before content hashes existed
+        invoice("3"),
+    ]
+    collection = StoredCollection(stored)
+    detector = ChangeDetector(collection)
+
+    new, changed, unchanged = detector.split(
+        [invoice("1"), invoice("2", total=200), invoice("3"), invoice("4")])
+
+    assert [d["number"] for d in new] == ["4"]
+    assert [d["number"] for d in changed] == ["2", "3"]
+    assert [d["number"] for d in unchanged] == ["1"]
+    assert all(HASH_FIELD in d for d in new + changed + unchanged)
+
+    detector.written(changed)
+    detector.split([invoice("2", total=200)])
+    assert len(collection.queries) == 1
+
+
+def test_build_upserts_match_on_the_identity_and_set_the_rest():
+    data = {**invoice("7"), HASH_FIELD: "abc"}
+
+    assert build_upserts([data]) == [UpdateOne(
+        {"rut_holding": "76123456-7", "doc_type": "invoice", "supplier_id": "1-9", "number": "7"},
+        {"$set": {"total": 100, HASH_FIELD: "abc"}},
+        upsert=True,
+    )]
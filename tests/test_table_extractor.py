@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from sii_scraper.table_extractor import build_pending_row, build_section_row
+
+
+def pending_cells() -> list:
+    # a Pendientes row as credit notes show it: no exento, no tabaco columns
+    return ["Del Giro", "76123456-7", "1234", "02/05/2026", "03/05/2026 10:15:00", "",
+            "1.000", "190", "0", "0", "", "1.190", "0", "0", "0", "0", "0", "33", "55", "x"]
+
+
+def test_section_row_splits_the_supplier_cell():
+    raw = {
+        "cells": ["Del Giro", "76123456-7\nProveedor", "99", "02/05/2026", "03/05/2026 10:15:00",
+                  "P", "500", "1.000", "190", "0", "0", "", "1.690", "0", "0", "0", "0", "0",
+                  "", "", "1", "2", "3", ""],
+        "link_text": "76123456-7",
+        "link_title": "Proveedor SpA",
+    }
+
+    row = build_section_row(raw, "77777777-7", "accepted", "invoice")
+
+    assert (row.supplier_id, row.supplier_name, row.number) == ("76123456-7", "Proveedor SpA", "99")
+    assert row.date == datetime(2026, 5, 2)
+    assert (row.exent_total, row.net_total, row.total) == (500, 1000, 1690)
+    assert (row.tabaco_puro, row.tabaco_cigarrillos, row.tabaco_elaborado) == (1, 2, 3)
+    assert (row.rut_holding, row.status, row.doc_type) == ("77777777-7", "accepted", "invoice")
+
+
+def test_pending_invoice_row_skips_the_leading_column():
+    raw = {
+        "cells": ["☐"] + pending_cells(),
+        "link_text": "76123456-7",
+        "link_title": "Proveedor SpA",
+    }
+
+    row = build_pending_row(raw, "77777777-7", "pending", "invoice")
+
+    assert row.type_purchase == "Del Giro"
+    assert row.number == "1234"
+    assert row.date_accepted == datetime(2026, 5, 3, 10, 15)
+    assert (row.exent_total, row.net_total, row.iva, row.total) == (0, 1000, 190, 1190)
+    assert (row.type_document_ref, row.folio_ref, row.nce_or_nde) == ("33", "55", "x")
+    assert (row.tabaco_puro, row.tabaco_cigarrillos, row.tabaco_elaborado) == (0, 0, 0)
+
+
+def test_pending_credit_note_row_has_no_leading_column():
+    raw = {"cells": pending_cells(), "link_text": "76123456-7", "link_title": "Proveedor SpA"}
+
+    row = build_pending_row(raw, "77777777-7", "pending", "credit_note")
+
+    assert row.number == "1234"
+    assert row.total == 1190
+    assert row.nce_or_nde == "x"
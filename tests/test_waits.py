@@ -0,0 +1,37 @@
+import pytest
+from selenium.common.exceptions import JavascriptException, TimeoutException
+
+from sii_scraper.waits import PageWaits
+
+
+class NavigatingDriver:
+    """
+    The first unloads scripts run while the page is still navigating.
+    """
+
+    def __init__(self, unloads: int, result=True):
+        self.unloads = unloads
+        self.result = result
+        self.calls = 0
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, *args):
+        self.calls += 1
+        if self.calls <= self.unloads:
+            raise JavascriptException("javascript error: document unloaded while waiting for result")
+        return self.result
+
+
+def test_wait_started_during_navigation_is_retried_on_the_new_page():
+    driver = NavigatingDriver(unloads=2)
+
+    PageWaits(driver).min_count("select[name='rut'] option", 3, timeout=5)
+
+    assert driver.calls == 3
+
+
+def test_wait_that_keeps_getting_unloaded_times_out():
+    with pytest.raises(TimeoutException):
+        PageWaits(NavigatingDriver(unloads=10 ** 6)).dialog_closed(timeout=0.3)
@@ -0,0 +1,117 @@
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+from pymongo.errors import OperationFailure
+
+import main
+from sii_scraper.writer import SinkError, WriteBehindSink
+
+
+class FailingCollection:
+    name = "invoices_supplier"
+
+    def find(self, *args, **kwargs):
+        return []
+
+    def bulk_write(self, ops, ordered=True):
+        raise OperationFailure("not authorized")
+
+
+def invoices(rut: str, number: str = "1") -> pd.DataFrame:
+    return pd.DataFrame([{"rut_holding": rut, "doc_type": "invoice", "supplier_id": "1-9",
+                          "number": number, "total": 100}])
+
+
+def test_scraping_stops_once_mongo_failed():
+    writer = WriteBehindSink(FailingCollection(), batch_size=1, writers=1).start()
+    scraped = []
+
+    def scrape(users):
+        for user in users:
+            scraped.append(user)
+            yield user
+
+    for user in main._while_mongo_ok(writer, scrape(["a", "b", "c"])):
+        writer.submit(invoices(user))
+        try:
+            writer.flush()
+        except SinkError:
+            pass
+
+    report = writer.close()
+    assert writer.broken
+    assert report["failed"] == 1
+    assert scraped == ["a"]
+
+
+class UnencodableCollection(FailingCollection):
+    def bulk_write(self, ops, ordered=True):
+        raise ValueError("NaTType does not support utcoffset")
+
+
+def test_close_returns_when_a_batch_fails_outside_mongo():
+    writer = WriteBehindSink(UnencodableCollection(), batch_size=1, writers=1).start()
+    writer.submit(invoices("76123456-7"))
+
+    report = writer.close()
+
+    assert writer.broken
+    assert report["failed"] == 1
+    assert report["errors"] == ["ValueError: NaTType does not support utcoffset"]
+
+
+class HeldCollection(FailingCollection):
+    """
+    Writes every batch but the one of invoice number "1", which waits for
+    release (or fails, with fail set).
+    """
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.release = threading.Event()
+        self.others_written = threading.Event()
+
+    def bulk_write(self, ops, ordered=True):
+        if ops[0]._filter["number"] == "1":
+            self.release.wait(5)
+            if self.fail:
+                raise OperationFailure("not authorized")
+        else:
+            self.others_written.set()
+        return SimpleNamespace(upserted_count=len(ops), modified_count=0)
+
+
+def test_callbacks_wait_for_every_earlier_batch():
+    collection = HeldCollection()
+    writer = WriteBehindSink(collection, batch_size=1, writers=2).start()
+    called = []
+
+    writer.submit(invoices("76123456-7", "1"))
+    writer.after_written(lambda: called.append("first"))
+    writer.submit(invoices("76123456-7", "2"))
+    writer.after_written(lambda: called.append("second"))
+
+    assert collection.others_written.wait(5)
+    assert called == []
+
+    collection.release.set()
+    writer.flush(timeout=5)
+    writer.close()
+    assert called == ["first", "second"]
+
+
+def test_a_failed_batch_holds_back_later_callbacks():
+    collection = HeldCollection(fail=True)
+    writer = WriteBehindSink(collection, batch_size=1, writers=2).start()
+    called = []
+
+    writer.submit(invoices("76123456-7", "1"))
+    writer.submit(invoices("76123456-7", "2"))
+    writer.after_written(lambda: called.append("second"))
+    collection.release.set()
+
+    report = writer.close()
+    assert report["failed"] == 1
+    assert report["inserted"] == 1
+    assert called == []
@@ -0,0 +1,420 @@
+"""
+Offline stand-in for the parts of the SII site SiiScraper walks through:
+the RUT / clave and certificate logins, the "Servicios online" and
+"Factura electrónica" menus, and the Registro de Compras y Ventas with its
+RUT and period selectors, the resumen and Pendientes summaries and a
+paginated #tableCompra per section with its length selector and Volver
+(doTheBack) button.
+
+Documents are generated deterministically per RUT, period and section, so
+runs are comparable. Every request can be slowed down with --latency and
+every esperaDialog spinner kept on screen for --dialog-ms.
+
+    python tools/mock_sii_server.py --port 8766 --ruts 3 --rows 500
+    SII_AUTH_URL=http://127.0.0.1:8766 python main.py --debug
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# (tab, codTipoDoc, label, share of --rows)
+SECTIONS = [
+    ("registro", 33, "Factura Electrónica", 1.0),
+    ("registro", 34, "Factura no Afecta o Exenta Electrónica", 0.1),
+    ("registro", 61, "Nota de Crédito Electrónica", 0.05),
+    ("pendiente", 33, "Factura Electrónica", 0.2),
+    ("pendiente", 34, "Factura no Afecta o Exenta Electrónica", 0.02),
+    ("pendiente", 61, "Nota de Crédito Electrónica", 0.01),
+]
+
+SUPPLIERS = [
+    "ARROCERA DEL SUR S.A.", "MOLINO SAN JOSE LTDA.", "TRANSPORTES ANDES S.P.A.",
+    "ENVASES DEL PACIFICO S.A.", "AGRICOLA LOS ROBLES LTDA.", "COMERCIAL NORTE S.A.",
+]
+
+
+class MockConfig:
+
+    def __init__(self, ruts: int = 3, rows: int = 250, page_sizes: tuple = (10, 25, 50, 100),
+                 latency: float = 0.0, dialog_ms: int = 300, rut_load_ms: int = 200,
+                 years: tuple = (2023, 2024, 2025), seed: int = 0):
+        if ruts < 2:
+            # the scraper waits for more than two options (placeholder + RUTs)
+            raise ValueError("the mock needs at least 2 RUTs")
+        self.ruts = [self.make_rut(76_000_000 + 111_111 * i) for i in range(1, ruts + 1)]
+        self.rows = rows
+        self.page_sizes = list(page_sizes)
+        self.latency = latency
+        self.dialog_ms = dialog_ms
+        self.rut_load_ms = rut_load_ms
+        self.years = list(years)
+        self.seed = seed
+
+    @staticmethod
+    def make_rut(number: int) -> str:
+        total, factor = 0, 2
+        for digit in reversed(str(number)):
+            total += int(digit) * factor
+            factor = 2 if factor == 7 else factor + 1
+        dv = 11 - total % 11
+        check = {10: "K", 11: "0"}.get(dv, str(dv))
+        return f"{number}-{check}"
+
+    def count(self, tab: str, code: int) -> int:
+        share = next(s for t, c, _, s in SECTIONS if t == tab and c == code)
+        return max(1, int(self.rows * share))
+
+
+def _dots(value: int) -> str:
+    return f"{value:,}".replace(",", ".")
+
+
+def documents(config: MockConfig, rut: str, period: str, tab: str, code: int) -> list:
+    """
+    The <td> contents of every row of a section, shaped like the real
+    tables: 24 cells for the registro, 21 for pending invoices (leading
+    checkbox column) and 20 for pending credit notes.
+    """
+    rng = random.Random(f"{config.seed}|{rut}|{period}|{tab}|{code}")
+    year, month = int(period[:4]), int(period[4:])
+    docs = []
+    for i in range(config.count(tab, code)):
+        supplier_rut = config.make_rut(rng.randint(1_000_000, 99_999_999))
+        number, dv = supplier_rut.split("-")
+        supplier = (f"{_dots(int(number))}-{dv}", rng.choice(SUPPLIERS))
+        day = rng.randint(1, 28)
+        date = f"{day:02d}/{month:02d}/{year}"
+        received = f"{min(day + rng.randint(0, 2), 28):02d}/{month:02d}/{year} " \
+                   f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+        folio = str(rng.randint(1, 9_999_999))
+        net = 0 if code == 34 else rng.randint(1_000, 50_000_000)
+        exent = rng.randint(1_000, 5_000_000) if code == 34 else 0
+        iva = round(net * 0.19)
+        other = rng.choice([0, 0, 0, rng.randint(100, 100_000)])
+        total = net + exent + iva + other
+        kind = rng.choice(["", "", "P"])
+        ref = ("33", str(rng.randint(1, 9_999_999))) if code == 61 else ("", "")
+
+        if tab == "registro":
+            cells = ["Del Giro", supplier, folio, date, received, kind,
+                     _dots(exent), _dots(net), _dots(iva), _dots(other), "0", "",
+                     _dots(total), "0", "0", "0", "0", "0", ref[0], ref[1],
+                     "0", "0", "0", "0"]
+        else:
+            cells = ["Del Giro", supplier, folio, date, received, kind,
+                     _dots(net), _dots(iva), _dots(other), "0", "",
+                     _dots(total), "0", "0", "0", "0", "0", ref[0], ref[1], "0"]
+            if code != 61:
+                cells.insert(0, "")
+        docs.append(cells)
+    return docs
+
+
+def summary(config: MockConfig, rut: str, period: str, tab: str) -> list:
+    out = []
+    for t, code, label, _ in SECTIONS:
+        if t != tab:
+            continue
+        docs = documents(config, rut, period, tab, code)
+        total_col = 12 if tab == "registro" else (11 if code == 61 else 12)
+        total = sum(int(d[total_col].replace(".", "")) for d in docs)
+        out.append({"code": code, "label": label, "count": _dots(len(docs)), "total": _dots(total)})
+    return out
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+  .hidden {{ display: none; }}
+  #esperaDialog {{ position: fixed; inset: 0; background: rgba(0,0,0,.3); }}
+  td, th {{ border: 1px solid #ccc; padding: 2px 4px; font-size: 12px; }}
+  .disabled a {{ color: #aaa; }}
+</style></head>
+<body>{body}</body></html>
+"""
+
+LOGIN_BODY = """
+<h1>Autenticación</h1>
+<a id="myHref" href="#" onclick="document.getElementById('loginForm').classList.remove('hidden'); return false;">Ingresar con RUT y Clave</a>
+<form id="loginForm" class="hidden" method="post" action="/mock/login">
+  <input id="uname" name="uname" type="text" placeholder="RUT">
+  <input id="pword" name="pword" type="password" placeholder="Clave">
+  <button id="login-submit" type="submit">Ingresar</button>
+</form>
+"""
+
+CERT_BODY = """
+<h1>Autenticación con certificado digital</h1>
+<script>
+  alert("Se usará el certificado digital instalado en este equipo");
+  document.cookie = "MOCK_SII_SESSION=cert; path=/";
+  location.href = "/cgi_misii/siihome.cgi";
+</script>
+"""
+
+HOME_BODY = """
+<h1>Mi SII</h1>
+<ul>
+  <li><a id="servicios" href="#" onclick="document.getElementById('serviciosMenu').classList.remove('hidden'); return false;">Servicios online</a>
+    <ul id="serviciosMenu" class="hidden">
+      <li><a href="/factura_electronica.html">Factura electrónica</a></li>
+    </ul>
+  </li>
+</ul>
+"""
+
+FACTURA_BODY = """
+<h1>Factura electrónica</h1>
+<p class="accordion_special"><a href="1039-3256.html">Registro de compras y ventas</a></p>
+"""
+
+REGISTRO_MENU_BODY = """
+<h1>Registro de compras y ventas</h1>
+<a href="/registro/">Ingresar al Registro de Compras y Ventas</a>
+"""
+
+RCV_BODY = """
+<div id="esperaDialog" style="display:none">Espere por favor…</div>
+<h1>Registro de Compras y Ventas</h1>
+<form name="formContribuyente" onsubmit="consultar(); return false;">
+  <select name="rut"><option value="">Seleccione RUT</option></select>
+  <select id="periodoMes">{months}</select>
+  <select ng-model="periodoAnho">{years}</select>
+  <button type="submit">Consultar</button>
+</form>
+<ul class="nav nav-tabs">
+  <li><a ui-sref="compraRegistro" href="#" onclick="showTab('registro'); return false;"><strong>Registro</strong></a></li>
+  <li><a ui-sref="compraPendiente" href="#" onclick="showTab('pendiente'); return false;"><strong>Pendientes</strong></a></li>
+</ul>
+<div id="view"></div>
+<script>
+const MOCK = {config};
+const state = {{rut: null, period: null, tab: "registro", rows: [], length: MOCK.page_sizes[0], page: 0}};
+const $ = sel => document.querySelector(sel);
+
+function esc(text) {{
+  return String(text).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/"/g, "&quot;");
+}}
+
+// the spinner stays up until the request is back and dialog_ms went by
+function busy(url) {{
+  $("#esperaDialog").style.display = "block";
+  const delay = new Promise(resolve => setTimeout(resolve, MOCK.dialog_ms));
+  return Promise.all([fetch(url).then(r => r.json()), delay]).then(([data]) => {{
+    $("#esperaDialog").style.display = "none";
+    return data;
+  }});
+}}
+
+setTimeout(() => {{
+  const sel = $("select[name='rut']");
+  for (const rut of MOCK.ruts) {{
+    const opt = document.createElement("option");
+    opt.value = rut;
+    opt.textContent = rut;
+    sel.appendChild(opt);
+  }}
+}}, MOCK.rut_load_ms);
+
+function consultar() {{
+  state.rut = $("select[name='rut']").value;
+  state.period = $("select[ng-model='periodoAnho']").value + $("#periodoMes").value;
+  showTab("registro");
+}}
+
+function showTab(tab) {{
+  state.tab = tab;
+  if (!state.rut) {{ return; }}
+  busy(`/mock/api/resumen?rut=${{state.rut}}&period=${{state.period}}&tab=${{tab}}`).then(renderSummary);
+}}
+
+function renderSummary(sections) {{
+  const linkAttr = state.tab === "pendiente" ? ' ng-if="(row.rsmnLink)"' : "";
+  const rows = sections.map(s =>
+    `<tr><td${{linkAttr}}><a ui-sref="detalle" href="#" onclick="openSection(${{s.code}}); return false;">${{esc(s.label)}}</a></td>` +
+    `<td>${{s.count}}</td><td>${{s.total}}</td></tr>`).join("");
+  $("#view").innerHTML =
+    `<table class="table resumen"><thead><tr><th>Tipo Documento</th><th>Total Documentos</th><th>Monto Total</th></tr></thead>` +
+    `<tbody>${{rows}}</tbody></table>`;
+}}
+
+function openSection(code) {{
+  busy(`/mock/api/detalle?rut=${{state.rut}}&period=${{state.period}}&tab=${{state.tab}}&code=${{code}}`).then(rows => {{
+    state.rows = rows;
+    state.page = 0;
+    state.length = MOCK.page_sizes[0];
+    const options = MOCK.page_sizes.map(n => `<option value="${{n}}">${{n}}</option>`).join("");
+    $("#view").innerHTML =
+      `<button type="button" ng-click="doTheBack()" onclick="showTab(state.tab)">Volver</button>` +
+      `<div class="dataTables_length"><select name="tableCompra_length" onchange="setLength(this.value)">${{options}}</select></div>` +
+      `<table id="tableCompra"><tbody></tbody></table>` +
+      `<div id="tableCompra_info"></div>` +
+      `<ul class="pagination"><li id="tableCompra_previous" class="paginate_button previous"><a href="#" onclick="goPage(-1); return false;">Anterior</a></li>` +
+      `<li id="tableCompra_next" class="paginate_button next"><a href="#" onclick="goPage(1); return false;">Siguiente</a></li></ul>`;
+    drawTable();
+  }});
+}}
+
+function setLength(value) {{
+  state.length = parseInt(value, 10);
+  state.page = 0;
+  drawTable();
+}}
+
+function goPage(step) {{
+  const pages = state.length < 0 ? 1 : Math.ceil(state.rows.length / state.length);
+  const page = state.page + step;
+  if (page < 0 || page >= pages) {{ return; }}
+  state.page = page;
+  drawTable();
+}}
+
+function cell(value) {{
+  if (Array.isArray(value)) {{
+    return `<td><a href="#" data-original-title="${{esc(value[1])}}">${{esc(value[0])}}</a></td>`;
+  }}
+  return `<td>${{esc(value)}}</td>`;
+}}
+
+function drawTable() {{
+  const size = state.length < 0 ? state.rows.length : state.length;
+  const start = state.page * size;
+  const page = state.rows.slice(start, start + size);
+  $("#tableCompra tbody").innerHTML = page.length
+    ? page.map(row => `<tr>${{row.map(cell).join("")}}</tr>`).join("")
+    : `<tr><td class="dataTables_empty" colspan="24">Sin registros</td></tr>`;
+  $("#tableCompra_info").textContent =
+    `Mostrando ${{page.length ? start + 1 : 0}} a ${{start + page.length}} de ${{state.rows.length}} registros`;
+  $("#tableCompra_previous").classList.toggle("disabled", state.page === 0);
+  $("#tableCompra_next").classList.toggle("disabled", start + size >= state.rows.length);
+}}
+</script>
+"""
+
+
+def render(title: str, body: str) -> bytes:
+    return PAGE.format(title=title, body=body).encode("utf-8")
+
+
+def make_handler(config: MockConfig):
+
+    months = "".join(f'<option value="{m:02d}">{m:02d}</option>' for m in range(1, 13))
+    years = "".join(f'<option value="{y}">{y}</option>' for y in config.years)
+    client_config = json.dumps({
+        "ruts": config.ruts,
+        "page_sizes": config.page_sizes,
+        "dialog_ms": config.dialog_ms,
+        "rut_load_ms": config.rut_load_ms,
+    })
+
+    pages = {
+        "/AUT2000/InicioAutenticacion/IngresoRutClave.html": ("Ingreso RUT y Clave", LOGIN_BODY),
+        "/AUT2000/InicioAutenticacion/IngresoCertificado.html": ("Ingreso con certificado", CERT_BODY),
+        "/cgi_misii/siihome.cgi": ("Mi SII", HOME_BODY),
+        "/factura_electronica.html": ("Factura electrónica", FACTURA_BODY),
+        "/1039-3256.html": ("Registro de compras y ventas", REGISTRO_MENU_BODY),
+    }
+
+    class MockSiiHandler(BaseHTTPRequestHandler):
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8",
+                  headers: dict = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, body):
+            self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+
+        def _logged_in(self) -> bool:
+            return "MOCK_SII_SESSION=" in (self.headers.get("Cookie") or "")
+
+        def do_GET(self):
+            if config.latency:
+                time.sleep(config.latency)
+
+            url = urlparse(self.path)
+            path = re.sub(r"/{2,}", "/", url.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            if path in pages:
+                title, body = pages[path]
+                self._send(200, render(title, body))
+            elif path == "/registro/":
+                if not self._logged_in():
+                    self._send(302, b"", headers={"Location": "/AUT2000/InicioAutenticacion/IngresoRutClave.html"})
+                    return
+                body = RCV_BODY.format(months=months, years=years, config=client_config)
+                self._send(200, render("Registro de Compras y Ventas", body))
+            elif path == "/mock/api/resumen":
+                self._json(summary(config, query["rut"], query["period"], query["tab"]))
+            elif path == "/mock/api/detalle":
+                self._json(documents(config, query["rut"], query["period"], query["tab"],
+                                     int(query["code"])))
+            else:
+                self._send(404, render("No encontrado", "<h1>404</h1>"))
+
+        def do_POST(self):
+            if config.latency:
+                time.sleep(config.latency)
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            if urlparse(self.path).path != "/mock/login":
+                self._send(404, render("No encontrado", "<h1>404</h1>"))
+            elif not form.get("uname") or not form.get("pword"):
+                self._send(200, render("Ingreso RUT y Clave", "<p>RUT o clave incorrectos</p>" + LOGIN_BODY))
+            else:
+                self._send(303, b"", headers={
+                    "Location": "/cgi_misii/siihome.cgi",
+                    "Set-Cookie": "MOCK_SII_SESSION=rut; Path=/",
+                })
+
+    return MockSiiHandler
+
+
+def start_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Serve config on a background thread; port 0 picks a free one. The
+    base url is f"http://{host}:{server.server_port}".
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    threading.Thread(target=server.serve_forever, name="mock-sii", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an offline copy of the SII pages the scraper uses")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--ruts", type=int, default=3, help="RUTs in the selector (at least 2)")
+    parser.add_argument("--rows", type=int, default=250, help="accepted invoices per RUT and period, the other sections are a share of it")
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 25, 50, 100], help="options of the tableCompra length selector (-1 = all)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--dialog-ms", type=int, default=300, help="how long esperaDialog stays up on every query")
+    args = parser.parse_args()
+
+    config = MockConfig(ruts=args.ruts, rows=args.rows, page_sizes=args.page_sizes,
+                        latency=args.latency, dialog_ms=args.dialog_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Mock SII on http://{args.host}:{args.port} with RUTs {', '.join(config.ruts)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Local stand-in for the RCV JSON backend. Replays the responses recorded
+with RcvBackendClient(record_dir=...):
+
+    <recordings>/<method>/<rut>_<period>_<estado>_<codTipoDoc>.json
+
+falling back to <recordings>/<method>/default.json when there's no exact
+recording. Point the scraper at it with
+
+    python tools/rcv_replay_server.py recordings/ --port 8765
+    RCV_BASE_URL=http://127.0.0.1:8765 python main.py --backend
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sii_scraper.backend import recording_name
+
+
+def make_handler(recordings: str, latency: float):
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+
+        def _send_json(self, status: int, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": "invalid json"})
+                return
+
+            method = self.path.rstrip("/").rsplit("/", 1)[-1]
+            folder = os.path.join(recordings, method)
+            candidates = [
+                os.path.join(folder, recording_name(request.get("data") or {})),
+                os.path.join(folder, "default.json"),
+            ]
+
+            if latency:
+                time.sleep(latency)
+
+            for path in candidates:
+                if os.path.exists(path):
+                    with open(path, encoding="utf-8") as f:
+                        self._send_json(200, json.load(f))
+                    return
+
+            self._send_json(200, {"data": [], "respEstado": {"codRespuesta": 99}})
+
+        def log_message(self, fmt, *args):
+            print(f"[replay] {self.address_string()} {fmt % args}")
+
+    return ReplayHandler
+
+
+def serve(recordings: str, host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0):
+    server = ThreadingHTTPServer((host, port), make_handler(recordings, latency))
+    print(f"Replaying {recordings} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Replay recorded RCV backend responses")
+    parser.add_argument("recordings", help="folder written by RcvBackendClient(record_dir=...)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+
+    serve(args.recordings, args.host, args.port, args.latency)